@@ -0,0 +1,32 @@
+"""Add catalog_version table (single-row catalog version stamp)
+
+Revision ID: 0004_catalog_version
+Revises: 0003_wide_search_sql
+Create Date: 2025-11-12
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_catalog_version"
+down_revision = "0003_wide_search_sql"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalog_version",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+    )
+    op.execute("INSERT INTO catalog_version (id, version, updated_at) VALUES (1, 1, now())")
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_version")
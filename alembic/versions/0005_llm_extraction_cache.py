@@ -0,0 +1,36 @@
+"""Add llm_extraction_cache table
+
+Revision ID: 0005_llm_extraction_cache
+Revises: 0004_catalog_version
+Create Date: 2025-11-12
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_llm_extraction_cache"
+down_revision = "0004_catalog_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_extraction_cache",
+        sa.Column("query_key", sa.String(length=64), primary_key=True),
+        sa.Column("normalized_query", sa.Text(), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("hit_count", sa.Integer(), server_default="0", nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("idx_llm_cache_expires", "llm_extraction_cache", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_llm_cache_expires", table_name="llm_extraction_cache")
+    op.drop_table("llm_extraction_cache")
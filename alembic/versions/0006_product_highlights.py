@@ -0,0 +1,42 @@
+"""Add product_highlights table (precomputed screenshot boxes)
+
+Revision ID: 0006_product_highlights
+Revises: 0005_llm_extraction_cache
+Create Date: 2025-11-13
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_product_highlights"
+down_revision = "0005_llm_extraction_cache"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_highlights",
+        sa.Column("highlight_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "product_id",
+            sa.Integer(),
+            sa.ForeignKey("products.product_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("tier", sa.String(length=10), server_default="", nullable=False),
+        sa.Column("color_type", sa.String(length=20), server_default="", nullable=False),
+        sa.Column("code_box", sa.JSON(), nullable=True),
+        sa.Column("price_box", sa.JSON(), nullable=True),
+        sa.Column("checks", sa.JSON(), nullable=True),
+        sa.Column("computed_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.UniqueConstraint("product_id", "tier", "color_type"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("product_highlights")
@@ -0,0 +1,54 @@
+"""Add effective_prices materialized view (resolved pick_price per tier/color)
+
+Revision ID: 0007_effective_prices
+Revises: 0006_product_highlights
+Create Date: 2025-11-14
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_effective_prices"
+down_revision = "0006_product_highlights"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # pick_price() resolved once per (product, tier, color) instead of per row
+    # of every wide-search query; refreshed by scripts/seed_database.py
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW effective_prices AS
+        SELECT product_id, category, tier, color_type, price
+        FROM (
+            SELECT p.product_id, p.category, t.tier, c.color_type,
+                   pick_price(p.product_id, t.tier, c.color_type) AS price
+            FROM products p
+            CROSS JOIN (VALUES ('A级'), ('B级'), ('C级'), ('D级')) AS t(tier)
+            CROSS JOIN (VALUES ('标准色'), ('定制色')) AS c(color_type)
+        ) s
+        WHERE price IS NOT NULL
+        WITH DATA;
+        """
+    )
+    # unique index: required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute(
+        "CREATE UNIQUE INDEX ux_effective_prices_pid_tier_color "
+        "ON effective_prices (product_id, tier, color_type);"
+    )
+    op.execute(
+        "CREATE INDEX ix_effective_prices_tier_color_cat_price "
+        "ON effective_prices (tier, color_type, category, price);"
+    )
+    op.execute(
+        "CREATE INDEX ix_effective_prices_tier_color_price "
+        "ON effective_prices (tier, color_type, price);"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS effective_prices;")
@@ -0,0 +1,34 @@
+"""Add raw counts to daily_metrics so rollups can be combined across days
+
+Revision ID: 0008_daily_metric_counts
+Revises: 0007_effective_prices
+Create Date: 2025-11-15
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_daily_metric_counts"
+down_revision = "0007_effective_prices"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("daily_metrics", sa.Column("confirmation_queries", sa.Integer(), server_default="0", nullable=True))
+    op.add_column("daily_metrics", sa.Column("timed_queries", sa.Integer(), server_default="0", nullable=True))
+    op.add_column("daily_metrics", sa.Column("total_response_time_ms", sa.BigInteger(), server_default="0", nullable=True))
+    op.add_column("daily_metrics", sa.Column("error_counts", sa.JSON(), nullable=True))
+    op.add_column("daily_metrics", sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("daily_metrics", "updated_at")
+    op.drop_column("daily_metrics", "error_counts")
+    op.drop_column("daily_metrics", "total_response_time_ms")
+    op.drop_column("daily_metrics", "timed_queries")
+    op.drop_column("daily_metrics", "confirmation_queries")
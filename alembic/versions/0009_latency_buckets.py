@@ -0,0 +1,33 @@
+"""Add latency_buckets table (per-day latency histograms by query mode)
+
+Revision ID: 0009_latency_buckets
+Revises: 0008_daily_metric_counts
+Create Date: 2025-11-16
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0009_latency_buckets"
+down_revision = "0008_daily_metric_counts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "latency_buckets",
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("mode", sa.String(length=20), primary_key=True),
+        sa.Column("bucket", sa.Integer(), primary_key=True),
+        sa.Column("count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("sum_ms", sa.BigInteger(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("latency_buckets")
@@ -0,0 +1,26 @@
+"""Store per-stage timings with query logs
+
+Revision ID: 0010_query_log_stage_timings
+Revises: 0009_latency_buckets
+Create Date: 2025-11-17
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010_query_log_stage_timings"
+down_revision = "0009_latency_buckets"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("query_logs", sa.Column("stage_timings", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("query_logs", "stage_timings")
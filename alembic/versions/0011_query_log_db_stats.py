@@ -0,0 +1,28 @@
+"""Store SQL statement count and DB time with query logs
+
+Revision ID: 0011_query_log_db_stats
+Revises: 0010_query_log_stage_timings
+Create Date: 2025-11-18
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0011_query_log_db_stats"
+down_revision = "0010_query_log_stage_timings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("query_logs", sa.Column("db_statements", sa.Integer(), nullable=True))
+    op.add_column("query_logs", sa.Column("db_time_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("query_logs", "db_time_ms")
+    op.drop_column("query_logs", "db_statements")
@@ -3,20 +3,48 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy import func
+from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.core.security import verify_admin
-from app.models import QueryLog
+from app.models import DailyMetric, LatencyBucket, QueryLog
+from app.services.catalog import get_catalog
+from app.services.extraction_cache import extraction_cache
+from app.services.latency import latency_percentiles, latency_recorder
+from app.services.logger import query_log_writer
+from app.services.metrics_rollup import window_stats
+from app.services.page_cache import page_cache
+from app.services.response_cache import response_cache_stats
+from app.utils.http_cache import cache_headers, is_not_modified, make_etag, not_modified
 
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"], dependencies=[Depends(verify_admin)])
 
 
+def _validator(*parts) -> str:
+    """Weak ETag from cheap inputs, computed before the payload is built."""
+    return make_etag(":".join(str(p) for p in parts), weak=True)
+
+
+def _stats_validator(db: Session, days: int) -> str:
+    # logs are append-only and rollups stamp updated_at, so new data moves
+    # one of these; the date moves the window (one statement)
+    today = datetime.utcnow().date()
+    first = today - timedelta(days=days - 1)
+    last_log, rolled_up, latencies = db.query(
+        db.query(func.max(QueryLog.query_id)).scalar_subquery(),
+        db.query(func.max(DailyMetric.updated_at)).scalar_subquery(),
+        db.query(func.sum(LatencyBucket.count)).filter(LatencyBucket.date >= first).scalar_subquery(),
+    ).one()
+    return _validator("stats", days, today, last_log, rolled_up, latencies)
+
+
 @router.get("/queries")
 def get_queries(
+    request: Request,
+    response: Response,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     start_date: Optional[str] = None,
@@ -33,10 +61,14 @@ def get_queries(
         q = q.filter(QueryLog.success.is_(True))
     elif status == "error":
         q = q.filter(QueryLog.success.is_(False))
-    total = q.count()
+    total, last_id = q.with_entities(func.count(QueryLog.query_id), func.max(QueryLog.query_id)).one()
+    etag = _validator("queries", total, last_id, limit, offset, start_date, end_date, status)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
     rows = (
         q.order_by(QueryLog.timestamp.desc()).offset(offset).limit(limit).all()
     )
+    response.headers.update(cache_headers(etag))
     return {
         "total": total,
         "queries": [
@@ -54,70 +86,72 @@ def get_queries(
 
 
 @router.get("/stats")
-def get_stats(days: int = Query(7, ge=1, le=90), db: Session = Depends(get_db)):
-    since = datetime.utcnow() - timedelta(days=days)
-    q = db.query(QueryLog).filter(QueryLog.timestamp >= since)
-    total = q.count()
-    success_count = q.filter(QueryLog.success.is_(True)).count()
-    confirm_count = q.filter(QueryLog.confirmation_required.is_(True)).count()
-
-    # average execution time
-    times = [
-        t[0]
-        for t in db.query(QueryLog.execution_time_ms).filter(QueryLog.timestamp >= since).all()
-        if t[0] is not None
-    ]
-    avg_ms = int(sum(times) / len(times)) if times else 0
-
-    # top products
-    top_rows = (
-        db.query(QueryLog.selected_product, func.count(1))
-        .filter(QueryLog.timestamp >= since, QueryLog.selected_product.isnot(None))
-        .group_by(QueryLog.selected_product)
-        .order_by(func.count(1).desc())
-        .limit(10)
-        .all()
-    )
-    top_products = [
-        {"product_code": r[0], "count": int(r[1])} for r in top_rows if r[0]
-    ]
-
-    # common errors
-    err_rows = (
-        db.query(QueryLog.error_message, func.count(1))
-        .filter(QueryLog.timestamp >= since, QueryLog.success.is_(False), QueryLog.error_message.isnot(None))
-        .group_by(QueryLog.error_message)
-        .order_by(func.count(1).desc())
-        .limit(10)
-        .all()
-    )
-    common_errors = [
-        {"error": r[0], "count": int(r[1])} for r in err_rows if r[0]
-    ]
-
+def get_stats(
+    request: Request,
+    response: Response,
+    days: int = Query(7, ge=1, le=90),
+    db: Session = Depends(get_db),
+):
+    etag = _stats_validator(db, days)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    # completed days come from daily_metrics, today (and any gap) live
+    agg, sources = window_stats(db, days)
+    total = agg.total
+    top_products = [{"product_code": k, "count": n} for k, n in agg.products.most_common(10)]
+    common_errors = [{"error": k, "count": n} for k, n in agg.errors.most_common(10)]
+
+    response.headers.update(cache_headers(etag))
     return {
         "period": f"last_{days}_days",
         "total_queries": total,
-        "success_rate": (success_count / total) if total else 0.0,
-        "avg_response_time_ms": avg_ms,
-        "confirmation_rate": (confirm_count / total) if total else 0.0,
+        "success_rate": (agg.successful / total) if total else 0.0,
+        "avg_response_time_ms": agg.avg_response_time_ms,
+        "confirmation_rate": (agg.confirmations / total) if total else 0.0,
         "top_products": top_products,
         "common_errors": common_errors,
+        "latency": latency_percentiles(db, days),
+        "sources": sources,
+    }
+
+
+@router.get("/latency")
+def get_latency(days: int = Query(1, ge=1, le=90), db: Session = Depends(get_db)):
+    """Latency percentiles per query mode: persisted daily histograms and this process since start."""
+    return {
+        "period": f"last_{days}_days",
+        **latency_percentiles(db, days),
+        "process": latency_recorder.summary(),
     }
 
 
 @router.get("/data_quality")
-def data_quality(db: Session = Depends(get_db)):
-    from app.models import Product
-
-    total = db.query(func.count(1)).select_from(Product).scalar() or 0
-    with_shot = db.query(func.count(1)).select_from(Product).filter(Product.screenshot_url.isnot(None)).scalar() or 0
-    # per-category counts
-    rows = db.query(Product.category, func.count(1)).group_by(Product.category).all()
-    categories = [{"category": r[0] or "", "count": int(r[1])} for r in rows]
+def data_quality(request: Request, response: Response, db: Session = Depends(get_db)):
+    # served from the catalog snapshot; validators follow the catalog version
+    catalog = get_catalog(db)
+    etag = make_etag(f"catalog:{catalog.version}", weak=True)
+    if is_not_modified(request, etag, catalog.updated_at):
+        return not_modified(etag, catalog.updated_at)
+    counts: dict[str, int] = {}
+    for p in catalog.products:
+        counts[p.category or ""] = counts.get(p.category or "", 0) + 1
+    categories = [{"category": k, "count": v} for k, v in counts.items()]
+    response.headers.update(cache_headers(etag, catalog.updated_at))
     return {
-        "last_updated": None,
-        "total_products": int(total),
-        "products_with_screenshots": int(with_shot),
+        "last_updated": catalog.updated_at.isoformat() if catalog.updated_at else None,
+        "catalog_version": catalog.version,
+        "total_products": len(catalog),
+        "products_with_screenshots": sum(1 for p in catalog.products if p.screenshot_url is not None),
         "categories": categories,
     }
+
+
+@router.get("/cache")
+def cache_stats(db: Session = Depends(get_db)):
+    """Hit/miss counters for in-process caches (LLM calls saved, etc.)."""
+    return {
+        "llm_extraction": extraction_cache.stats(),
+        "pdf_pages": page_cache.stats(),
+        "responses": response_cache_stats(db),
+        "query_log_writer": query_log_writer.stats(),
+    }
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+
+from fastapi import APIRouter, Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import CONTENT_TYPE, registry
+
+
+router = APIRouter(tags=["metrics"])
+
+_REQUESTS = registry.counter(
+    "costchecker_http_requests_total", "HTTP requests by route, method and status.", ["route", "method", "status"]
+)
+_DURATION = registry.histogram(
+    "costchecker_http_request_duration_seconds", "HTTP request latency by route.", ["route", "method"], scale=0.001
+)
+_IN_FLIGHT = registry.gauge("costchecker_http_requests_in_flight", "HTTP requests being served.")
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """All registered metrics in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+def _route_label(scope: Scope) -> str:
+    """Route template (``/api/screenshot/{filename}``), never the raw path."""
+    route = scope.get("route")
+    if route is None:
+        app = scope.get("app")
+        for r in getattr(getattr(app, "router", None), "routes", ()):
+            match, _ = r.matches(scope)
+            if match == Match.FULL:
+                route = r
+                break
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Counts HTTP requests and times them per route template."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def _send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        in_flight = _IN_FLIGHT.labels()
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            in_flight.dec()
+            route, method = _route_label(scope), scope.get("method", "")
+            _DURATION.labels(route, method).observe((time.perf_counter() - t0) * 1000.0)
+            _REQUESTS.labels(route, method, str(status)).inc()
@@ -1,36 +1,94 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request, HTTPException
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response, HTTPException
+from fastapi.security import HTTPBasicCredentials
 from sqlalchemy.orm import Session
 
 from app.api.schemas import QueryRequest
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.security import optional_security, verify_admin
 from app.services.query_processor import process_query
-from app.services.logger import log_query
+from app.services.logger import log_query, query_log_record
 from app.services.confirmation import get_confirmation, pop_confirmation
 from app.services.response_formatter import format_success_response
-from app.models import Product, PricingTier
+from app.services.catalog import get_catalog
+from app.utils.deadline import Deadline
+from app.utils.profiler import SamplingProfiler
+from app.utils.sql_stats import track_sql
+from app.utils.timing import start_timings, stop_timings
 
 
 router = APIRouter(prefix="/api", tags=["query"])
 
 
+def _profile_result(profiler: SamplingProfiler) -> dict:
+    out = {**profiler.summary(), "collapsed": profiler.collapsed(), "file": None}
+    if settings.PROFILE_DIR:
+        name = "query_" + datetime.utcnow().strftime("%Y%m%dT%H%M%S_%f")
+        try:
+            out["file"] = str(profiler.write(settings.PROFILE_DIR, name))
+        except OSError:
+            pass  # still returned in the response
+    return out
+
+
 @router.post("/query")
-def query_endpoint(req: QueryRequest, request: Request, db: Session = Depends(get_db)):
-    result = process_query(req.query, db)
-    # fire-and-forget logging (synchronous here, but errors ignored)
+def query_endpoint(
+    req: QueryRequest,
+    request: Request,
+    response: Response,
+    profile: bool = Query(False, description="Admin only: profile this request"),
+    credentials: Optional[HTTPBasicCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db),
+):
+    profiler = None
+    if profile or request.headers.get("x-profile") in ("1", "true"):
+        verify_admin(credentials)
+        profiler = SamplingProfiler(interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000.0).start()
+    timings = start_timings() if (settings.STAGE_TIMINGS or req.debug) else None
     try:
-        query_data = {
-            "query_text": req.query,
-            "result_text": result.get("result_text"),
-            "result_data": result.get("data"),
-            "screenshot_url": result.get("screenshot_url"),
-            "execution_time_ms": result.get("execution_time_ms"),
-            "success": result.get("status") == "success",
-            "user_session": req.user_session,
-            "ip_address": request.client.host if request.client else None,
-            "confirmation_required": result.get("status") == "needs_confirmation",
-        }
+        with track_sql() as sql:
+            result = process_query(
+                req.query,
+                db,
+                deadline=Deadline.after(settings.QUERY_DEADLINE_SECONDS),
+                # a cached answer would profile the cache lookup only
+                use_cache=profiler is None,
+            )
+    finally:
+        if timings is not None:
+            stop_timings()
+        if profiler is not None:
+            profiler.stop()
+    if profiler is not None:
+        result["profile"] = _profile_result(profiler)
+    stage_timings = None
+    if timings is not None:
+        stage_timings = timings.as_dict()
+        response.headers["Server-Timing"] = timings.server_timing()
+        response.headers["X-DB-Statements"] = str(sql.statements)
+        response.headers["X-DB-Time-Ms"] = f"{sql.time_ms:.1f}"
+        if req.debug:
+            result["debug"] = {
+                "timings_ms": stage_timings,
+                "db": {"statements": sql.statements, "time_ms": round(sql.time_ms, 2)},
+            }
+    # queued for the background log writer; errors never reach the client
+    try:
+        query_data = query_log_record(
+            req.query,
+            result,
+            user_session=req.user_session,
+            ip_address=request.client.host if request.client else None,
+            stage_timings=stage_timings,
+            db_statements=sql.statements,
+            db_time_ms=int(round(sql.time_ms)),
+        )
         log_query(db, query_data)
     except Exception:
         # do not block response on logging errors
@@ -40,7 +98,8 @@ def query_endpoint(req: QueryRequest, request: Request, db: Session = Depends(ge
 
 
 @router.post("/confirm")
-def confirm_endpoint(payload: dict, db: Session = Depends(get_db)):
+def confirm_endpoint(payload: dict, request: Request, db: Session = Depends(get_db)):
+    t0 = time.time()
     conf_id = payload.get("confirmation_id")
     selected = payload.get("selected_option")
     if not conf_id or not selected:
@@ -56,7 +115,8 @@ def confirm_endpoint(payload: dict, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Invalid selected_option")
 
     code = opt.get("product_code")
-    product = db.query(Product).filter(Product.product_code == code).first()
+    catalog = get_catalog(db)
+    product = catalog.by_code(code)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -64,24 +124,36 @@ def confirm_endpoint(payload: dict, db: Session = Depends(get_db)):
     color = session.params.get("color_type")
     pricing = None
     if tier and color:
-        pricing = (
-            db.query(PricingTier)
-            .filter(
-                PricingTier.product_id == product.product_id,
-                PricingTier.tier == tier,
-                PricingTier.color_type == color,
-            )
-            .order_by(PricingTier.effective_date.desc())
-            .first()
-        )
+        pricing = catalog.price(product.product_id, tier, color)
 
-    md_text, md_markdown, data = format_success_response(product, pricing, product.screenshot_url)
-    return {
+    highlight = (
+        catalog.highlight(product.product_id, pricing.tier, pricing.color_type)
+        if pricing is not None
+        else catalog.highlight(product.product_id)
+    )
+    md_text, md_markdown, data = format_success_response(
+        product, pricing, product.screenshot_url, highlight=highlight
+    )
+    result = {
         "status": "success",
         "result_text": md_text,
         "result_markdown": md_markdown,
         "screenshot_url": product.screenshot_url,
         "data": data,
         "confidence": opt.get("confidence", 1.0),
-        "execution_time_ms": 0,
+        "execution_time_ms": int((time.time() - t0) * 1000),
     }
+    try:
+        log_query(
+            db,
+            query_log_record(
+                session.params.get("query") or code,
+                result,
+                query_classification="confirmation",
+                user_confirmed=True,
+                ip_address=request.client.host if request.client else None,
+            ),
+        )
+    except Exception:
+        pass
+    return result
@@ -2,18 +2,30 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, Response
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.utils.http_cache import cache_headers, is_not_modified, make_etag, not_modified
 
 
 router = APIRouter(prefix="/api", tags=["screenshots"])
 
+SCREENSHOT_CACHE_CONTROL = "public, max-age=86400"
+
 
 @router.get("/screenshot/{filename}")
-def get_screenshot(filename: str):
+def get_screenshot(filename: str, request: Request):
     file_path = Path("data/screenshots") / filename
     if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=404, detail="Screenshot not found")
+    # validators come from stat(); a revalidation never reads the file
+    st = file_path.stat()
+    etag = make_etag(f"{filename}:{st.st_size}:{st.st_mtime_ns}")
+    last_modified = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, SCREENSHOT_CACHE_CONTROL)
     content = file_path.read_bytes()
-    headers = {"Cache-Control": "public, max-age=86400"}
+    headers = cache_headers(etag, last_modified, SCREENSHOT_CACHE_CONTROL)
     return Response(content=content, media_type="image/png", headers=headers)
 
@@ -3,22 +3,35 @@ from __future__ import annotations
 import asyncio
 import time
 import logging
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Request, Response, BackgroundTasks, HTTPException
 from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 import xmltodict
 
+from app.core.config import settings
 from app.core.database import SessionLocal
-from app.services.query_processor import process_query
+from app.services.deepseek import DeepSeekClient
+from app.services.logger import log_query, query_log_record
+from app.services.query_processor import cached_answer, process_query
+from app.services.wide_search import detect_wide_query
 from app.services.wework_service import get_wework_service
+from app.utils.deadline import Deadline
 from app.utils.message_cache import message_cache
+from app.utils.metrics import registry
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/wework", tags=["WeChat Work"])
 
+# WeChat Work drops passive replies that take longer than this
+PASSIVE_REPLY_SECONDS = 4.0
+
+# passive: answered within the window; active: sent later as a message
+_REPLIES = registry.counter("costchecker_wework_replies_total", "WeWork query replies by delivery.", ["kind"])
+_DUPLICATES = registry.counter("costchecker_wework_duplicate_messages_total", "WeWork messages ignored as retries.")
+
 
 @router.get("/callback")
 async def wework_verify(msg_signature: str, timestamp: str, nonce: str, echostr: str):
@@ -54,6 +67,7 @@ async def wework_callback(
 
         msg_id = msg_dict.get("MsgId") or msg_dict.get("MsgID")
         if msg_id and message_cache.is_duplicate(str(msg_id)):
+            _DUPLICATES.inc()
             return PlainTextResponse(content="")
         if msg_id:
             message_cache.mark_processed(str(msg_id))
@@ -73,16 +87,20 @@ async def wework_callback(
 
         logger.info("WeWork query from %s: %s", from_user, query_text)
 
+        # One computation per message: if it misses the passive-reply window
+        # it keeps running and its result is sent as an active message.
+        task = asyncio.ensure_future(_process_query_in_thread(query_text, user_id=from_user))
         try:
-            # Run query with 4s timeout in threadpool using its own DB session
-            result_text = await asyncio.wait_for(_process_query_in_thread(query_text), timeout=4.0)
+            result_text = await asyncio.wait_for(asyncio.shield(task), timeout=PASSIVE_REPLY_SECONDS)
 
             reply_xml = _build_reply_xml(from_user, to_user, result_text, create_time)
             encrypted = service.encrypt_reply(reply_xml, timestamp, nonce)
+            _REPLIES.labels("passive").inc()
             return Response(content=encrypted, media_type="text/xml")
         except asyncio.TimeoutError:
             # schedule active message and return immediately
-            background_tasks.add_task(_send_active_result, from_user, query_text)
+            background_tasks.add_task(_send_active_result, from_user, query_text, task)
+            _REPLIES.labels("active").inc()
             return PlainTextResponse(content="")
     except Exception as e:
         # Always 200 to avoid retries; log for debugging
@@ -102,33 +120,91 @@ def _build_reply_xml(to_user: str, from_user: str, content: str, create_time: st
     )
 
 
-async def _process_query_in_thread(query: str) -> str:
-    """Run process_query in a worker thread with its own DB session."""
+async def _process_query_in_thread(query: str, user_id: Optional[str] = None) -> str:
+    """Run process_query in a worker thread with its own DB session.
+
+    A repeated query is answered from the response cache. Otherwise the LLM
+    extraction is awaited on the event loop first (pooled async client), so
+    the worker thread is only held for the DB/formatting part. The whole
+    computation is bounded by ``QUERY_DEADLINE_SECONDS``; the LLM call
+    additionally by the passive-reply window.
+    """
+    deadline = Deadline.after(settings.QUERY_DEADLINE_SECONDS)
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _process_query_blocking, query)
+    if detect_wide_query(query) is not None:
+        return await loop.run_in_executor(None, _process_query_blocking, query, None, deadline, user_id)
+    reply = await loop.run_in_executor(None, _cached_reply_blocking, query, user_id)
+    if reply is not None:
+        return reply
+    client = DeepSeekClient(settings.DEEPSEEK_API_KEY)
+    params = await client.aextract_query_params(query, deadline=deadline.within(PASSIVE_REPLY_SECONDS))
+    return await loop.run_in_executor(
+        None, _process_query_blocking, query, params, deadline, user_id, client.last_path, True
+    )
 
 
-def _process_query_blocking(query: str) -> str:
+def _cached_reply_blocking(query: str, user_id: Optional[str] = None) -> Optional[str]:
+    """Reply from the response cache (logged like any answer), or None on a miss."""
     db: Session = SessionLocal()
     try:
-        result: dict[str, Any] = process_query(query, db)
-        if result.get("status") == "success":
-            return result.get("result_text") or "查询成功"
-        elif result.get("status") == "needs_confirmation":
-            # For chat UX, show options briefly
-            opts = result.get("options") or []
-            lines = ["需要确认，请选择以下产品："]
-            for o in opts:
-                lines.append(f"{o.get('id')}. {o.get('product_code')}（{o.get('material','')}）")
-            return "\n".join(lines)
-        else:
-            return f"❌ 查询失败\n\n{result.get('message', '未知错误')}"
+        result = cached_answer(query, db)
+        return _reply(db, query, result, user_id) if result is not None else None
     finally:
         db.close()
 
 
-def _send_active_result(user_id: str, query: str) -> None:
-    service = get_wework_service()
-    text = _process_query_blocking(query)
-    service.send_markdown_message(user_id, text)
+def _process_query_blocking(
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    deadline: Optional[Deadline] = None,
+    user_id: Optional[str] = None,
+    extraction_path: Optional[str] = None,
+    cache_missed: bool = False,
+) -> str:
+    db: Session = SessionLocal()
+    try:
+        result: dict[str, Any] = process_query(
+            query, db, params=params, deadline=deadline, extraction_path=extraction_path, cache_missed=cache_missed
+        )
+        return _reply(db, query, result, user_id)
+    finally:
+        db.close()
+
 
+def _reply(db: Session, query: str, result: dict[str, Any], user_id: Optional[str]) -> str:
+    """Log ``result`` and render it as chat text."""
+    try:
+        log_query(
+            db,
+            query_log_record(
+                query, result, user_session=f"wework:{user_id or ''}", query_classification="wework"
+            ),
+        )
+    except Exception as e:
+        logger.warning("WeWork query log failed: %s", e)
+    if result.get("status") == "success":
+        return result.get("result_text") or "查询成功"
+    elif result.get("status") == "needs_confirmation":
+        # For chat UX, show options briefly
+        opts = result.get("options") or []
+        lines = ["需要确认，请选择以下产品："]
+        for o in opts:
+            lines.append(f"{o.get('id')}. {o.get('product_code')}（{o.get('material','')}）")
+        return "\n".join(lines)
+    else:
+        return f"❌ 查询失败\n\n{result.get('message', '未知错误')}"
+
+
+async def _send_active_result(user_id: str, query: str, pending: Optional[asyncio.Future] = None) -> None:
+    """Send the answer as an active message once the computation finishes.
+
+    ``pending`` is the computation started for the passive reply; it is
+    awaited rather than re-running the query.
+    """
+    try:
+        text = await (pending if pending is not None else _process_query_in_thread(query, user_id=user_id))
+    except Exception as e:
+        logger.error("WeWork query failed: %s", e, exc_info=True)
+        text = "❌ 查询失败\n\n未知错误"
+    service = get_wework_service()
+    await asyncio.to_thread(service.send_markdown_message, user_id, text)
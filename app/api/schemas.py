@@ -8,6 +8,8 @@ class QueryRequest(BaseModel):
     query: str
     user_session: Optional[str] = None
     language: str = "zh"
+    # add per-stage timings (debug.timings_ms) to the response
+    debug: bool = False
 
 
 class QueryResponse(BaseModel):
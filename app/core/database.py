@@ -1,13 +1,52 @@
 from __future__ import annotations
 
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.core.config import settings
+from app.utils.metrics import registry
+from app.utils.sql_stats import instrument_engine
+
+
+POOL_CHECKOUT_WAIT = registry.histogram(
+    "costchecker_db_pool_checkout_seconds",
+    "Time to get a connection from the pool (waiting for a free one or opening it).",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+    scale=0.001,
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait in ``POOL_CHECKOUT_WAIT``."""
 
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            POOL_CHECKOUT_WAIT.observe((time.perf_counter() - t0) * 1000.0)
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+
+def _engine_kwargs(url: str) -> dict:
+    # SQLite (scripts, tests) keeps SQLAlchemy's default pool for its URL
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {"poolclass": TimedQueuePool}
+
+
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **_engine_kwargs(settings.DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# per-request statement counts and DB time (app.utils.sql_stats.track_sql)
+instrument_engine(engine)
+
+_POOL = registry.gauge("costchecker_db_pool_connections", "Connections of the app's pool by state.", ["state"])
+_POOL.set_function(lambda: engine.pool.checkedout(), "checked_out")
+_POOL.set_function(lambda: engine.pool.checkedin(), "idle")
+_POOL.set_function(lambda: max(0, engine.pool.overflow()), "overflow")
 
 
 def get_db():
@@ -16,4 +55,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
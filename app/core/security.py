@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from app.core.config import settings
 
 security = HTTPBasic()
+# for public routes with admin-only options: credentials are checked only when used
+optional_security = HTTPBasic(auto_error=False)
 
 
-def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
+def verify_admin(credentials: Optional[HTTPBasicCredentials] = Depends(security)):
     correct_username = settings.ADMIN_USERNAME
     correct_password = settings.ADMIN_PASSWORD
-    if not (credentials.username == correct_username and credentials.password == correct_password):
+    if credentials is None or not (
+        credentials.username == correct_username and credentials.password == correct_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Unauthorized",
@@ -1,3 +1,5 @@
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 from fastapi import FastAPI, Request
@@ -7,15 +9,45 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.services.catalog import get_catalog
+from app.services.deepseek import aclose_http_client, close_http_client
+from app.services.logger import query_log_writer
 from app.api.routes.query import router as query_router
 from app.api.routes.screenshots import router as screenshots_router
 from app.api.routes.analytics import router as analytics_router
 from app.api.routes.wework import router as wework_router
 from app.api.routes.admin_static import router as admin_static_router
+from app.api.routes.metrics import MetricsMiddleware, router as metrics_router
 
 
-app = FastAPI(title=settings.APP_NAME, version="0.1.0", description="CostChecker API")
+logger = logging.getLogger(__name__)
+
+
+def _warm_catalog() -> None:
+    """Load the catalog snapshot before the first query arrives."""
+    db = SessionLocal()
+    try:
+        snap = get_catalog(db)
+        logger.info("Catalog snapshot v%s loaded (%d products)", snap.version, len(snap))
+    except Exception as e:
+        # Not fatal: the snapshot is loaded lazily on the first query instead
+        logger.warning("Catalog warm-up failed: %s", e)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _warm_catalog()
+    query_log_writer.start()
+    yield
+    query_log_writer.stop()
+    close_http_client()
+    await aclose_http_client()
+
+
+app = FastAPI(title=settings.APP_NAME, version="0.1.0", description="CostChecker API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -25,6 +57,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# request counts and latency per route, exported at /metrics
+app.add_middleware(MetricsMiddleware)
 
 
 @app.exception_handler(404)
@@ -56,6 +90,7 @@ app.include_router(screenshots_router)
 app.include_router(analytics_router)
 app.include_router(admin_static_router)
 app.include_router(wework_router)
+app.include_router(metrics_router)
 
 # Simple frontend playground (no auth) for quick manual testing
 app.mount("/playground", StaticFiles(directory="playground", html=True), name="playground")
@@ -1,5 +1,5 @@
 from .base import Base
-from .product import Product, PricingTier, ProductSize, QueryLog, DailyMetric, PricingHistory, ConfirmationSessionDB
+from .product import Product, PricingTier, ProductSize, QueryLog, DailyMetric, PricingHistory, ConfirmationSessionDB, CatalogVersion, LLMExtractionCache, ProductHighlight, LatencyBucket
 
 __all__ = [
     "Base",
@@ -10,4 +10,8 @@ __all__ = [
     "DailyMetric",
     "PricingHistory",
     "ConfirmationSessionDB",
+    "CatalogVersion",
+    "LLMExtractionCache",
+    "ProductHighlight",
+    "LatencyBucket",
 ]
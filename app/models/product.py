@@ -6,6 +6,7 @@ from typing import Optional
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
     Text,
     DateTime,
@@ -110,6 +111,9 @@ class QueryLog(Base):
     error_message: Mapped[Optional[str]] = mapped_column(Text)
     user_session: Mapped[Optional[str]] = mapped_column(String(100))
     ip_address: Mapped[Optional[str]] = mapped_column(String(45))
+    stage_timings: Mapped[Optional[dict]] = mapped_column(JSON)
+    db_statements: Mapped[Optional[int]] = mapped_column(Integer)
+    db_time_ms: Mapped[Optional[int]] = mapped_column(Integer)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     __table_args__ = (
@@ -130,6 +134,12 @@ class DailyMetric(Base):
     confirmation_rate: Mapped[Optional[float]] = mapped_column(DECIMAL(5, 2))
     unique_users: Mapped[int] = mapped_column(Integer, default=0)
     top_products: Mapped[Optional[dict]] = mapped_column(JSON)
+    # raw counts so several days can be combined exactly
+    confirmation_queries: Mapped[int] = mapped_column(Integer, default=0)
+    timed_queries: Mapped[int] = mapped_column(Integer, default=0)
+    total_response_time_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    error_counts: Mapped[Optional[dict]] = mapped_column(JSON)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
 
 class PricingHistory(Base):
@@ -159,3 +169,67 @@ class ConfirmationSessionDB(Base):
     params: Mapped[Optional[dict]] = mapped_column(JSON)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class LLMExtractionCache(Base):
+    __tablename__ = "llm_extraction_cache"
+
+    query_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    normalized_query: Mapped[str] = mapped_column(Text, nullable=False)
+    params: Mapped[Optional[dict]] = mapped_column(JSON)
+    hit_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    __table_args__ = (
+        Index("idx_llm_cache_expires", "expires_at"),
+    )
+
+
+class ProductHighlight(Base):
+    """Precomputed screenshot boxes per product x tier x color.
+
+    The row with empty tier/color_type holds the code box alone (used when
+    no specific price was asked for). Built by scripts/build_highlights.py;
+    the seeder rebuilds the rows of products it adds or reprices.
+    """
+
+    __tablename__ = "product_highlights"
+
+    highlight_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.product_id", ondelete="CASCADE"), nullable=False)
+    tier: Mapped[str] = mapped_column(String(10), nullable=False, default="")
+    color_type: Mapped[str] = mapped_column(String(20), nullable=False, default="")
+    code_box: Mapped[Optional[dict]] = mapped_column(JSON)
+    price_box: Mapped[Optional[dict]] = mapped_column(JSON)
+    checks: Mapped[Optional[dict]] = mapped_column(JSON)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("product_id", "tier", "color_type"),
+    )
+
+
+class LatencyBucket(Base):
+    """Per-day latency histogram: one row per (date, query mode, bucket).
+
+    ``bucket`` indexes ``app.utils.histogram.LATENCY_BUCKETS_MS`` (the
+    index past the last bound is the overflow bucket). Counts are added by
+    the query-log writer as it inserts ``query_logs`` batches.
+    """
+
+    __tablename__ = "latency_buckets"
+
+    date: Mapped[date] = mapped_column(Date, primary_key=True)
+    mode: Mapped[str] = mapped_column(String(20), primary_key=True)
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sum_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
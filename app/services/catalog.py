@@ -0,0 +1,296 @@
+"""
+In-memory catalog snapshot for the query resolution path.
+
+The catalog is small (a few thousand rows), so products keyed by code and
+base_code, the latest price per (tier, color) and the precomputed
+screenshot highlight boxes are loaded once into an immutable snapshot.
+Code resolution, direct price lookups and highlights then run without
+touching the database. The snapshot is swapped atomically when
+``catalog_version`` changes (bumped by ``scripts/seed_database.py`` and
+``scripts/build_highlights.py``).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import CatalogVersion, Product, PricingTier, ProductHighlight
+from app.utils.product_parser import extract_base_code
+
+
+@dataclass(frozen=True)
+class ProductRecord:
+    """Read-only copy of a ``Product`` row (attribute-compatible)."""
+
+    product_id: int
+    product_code: str
+    base_code: str
+    product_name_cn: Optional[str]
+    category: str
+    subcategory: Optional[str]
+    material_type: str
+    base_cost: float
+    source_pdf: str
+    source_page: int
+    screenshot_url: Optional[str]
+    notes: Optional[str]
+
+
+@dataclass(frozen=True)
+class PriceRecord:
+    """Latest ``PricingTier`` row for a (product, tier, color)."""
+
+    product_id: int
+    tier: str
+    color_type: str
+    price: float
+    effective_date: Optional[date]
+
+
+@dataclass(frozen=True)
+class HighlightRecord:
+    """Precomputed ``ProductHighlight`` row (empty tier/color = code box only)."""
+
+    product_id: int
+    tier: str
+    color_type: str
+    code_box: Optional[dict]
+    price_box: Optional[dict]
+    checks: Optional[dict]
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog at a given version."""
+
+    def __init__(
+        self,
+        version: int,
+        products: List[ProductRecord],
+        prices: List[PriceRecord],
+        highlights: Optional[List[HighlightRecord]] = None,
+        updated_at: Optional[datetime] = None,
+    ) -> None:
+        self.version = version
+        self.loaded_at = datetime.utcnow()
+        # when the version was last bumped (HTTP Last-Modified of catalog data)
+        self.updated_at = updated_at
+        self.products: Tuple[ProductRecord, ...] = tuple(products)
+        self._by_id: Dict[int, ProductRecord] = {p.product_id: p for p in self.products}
+        self._by_code: Dict[str, ProductRecord] = {p.product_code: p for p in self.products}
+        # aligned with ``products``; scored in one batch by fuzzy_string_match
+        self.codes: Tuple[str, ...] = tuple(p.product_code for p in self.products)
+        by_base: Dict[str, List[ProductRecord]] = {}
+        for p in self.products:
+            by_base.setdefault(p.base_code, []).append(p)
+        self._by_base: Dict[str, Tuple[ProductRecord, ...]] = {k: tuple(v) for k, v in by_base.items()}
+        # prices are expected newest-first per key; keep the first seen
+        latest: Dict[int, Dict[Tuple[str, str], PriceRecord]] = {}
+        for pr in prices:
+            latest.setdefault(pr.product_id, {}).setdefault((pr.tier, pr.color_type), pr)
+        self._prices = latest
+        self._highlights: Dict[Tuple[int, str, str], HighlightRecord] = {
+            (h.product_id, h.tier, h.color_type): h for h in highlights or ()
+        }
+        self._derived: Dict[str, Any] = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def get(self, product_id: int) -> Optional[ProductRecord]:
+        return self._by_id.get(product_id)
+
+    def by_code(self, product_code: str) -> Optional[ProductRecord]:
+        return self._by_code.get(product_code)
+
+    def exact_match(self, normalized_code: str) -> Tuple[list[ProductRecord], float]:
+        p = self._by_code.get(normalized_code)
+        return ([p], 1.0) if p else ([], 0.0)
+
+    def base_code_match(self, normalized_code: str) -> Tuple[list[ProductRecord], float]:
+        base, _ = extract_base_code(normalized_code)
+        matches = list(self._by_base.get(base, ()))
+        return matches, 0.95 if matches else 0.0
+
+    def price(self, product_id: int, tier: str, color_type: str) -> Optional[PriceRecord]:
+        return self._prices.get(product_id, {}).get((tier, color_type))
+
+    def prices_for(self, product_id: int) -> list[PriceRecord]:
+        recs = self._prices.get(product_id, {})
+        return [recs[k] for k in sorted(recs)]
+
+    def highlight(
+        self, product_id: int, tier: Optional[str] = None, color_type: Optional[str] = None
+    ) -> Optional[HighlightRecord]:
+        """Precomputed boxes for (tier, color), or the code-only row when no price was asked for.
+
+        A price without its own row (added since the boxes were last built)
+        still gets the code-only row, so the code box is not lost.
+        """
+        rec = self._highlights.get((product_id, tier or "", color_type or ""))
+        if rec is None and (tier or color_type):
+            rec = self._highlights.get((product_id, "", ""))
+        return rec
+
+    def derived(self, name: str, builder: Callable[["CatalogSnapshot"], Any]) -> Any:
+        """Return an index derived from this snapshot, building it once.
+
+        Derived structures live and die with the snapshot, so they are
+        rebuilt automatically whenever the catalog version changes.
+        """
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+
+def get_catalog_version(db: Session) -> int:
+    v = db.query(CatalogVersion.version).filter(CatalogVersion.id == 1).scalar()
+    return int(v or 0)
+
+
+def bump_catalog_version(db: Session) -> int:
+    """Increment the catalog version (caller commits)."""
+    rec = db.get(CatalogVersion, 1)
+    if rec is None:
+        rec = CatalogVersion(id=1, version=0)
+        db.add(rec)
+    rec.version = int(rec.version or 0) + 1
+    rec.updated_at = datetime.utcnow()
+    db.flush()
+    return rec.version
+
+
+def load_catalog(db: Session, version: Optional[int] = None) -> CatalogSnapshot:
+    if version is None:
+        version = get_catalog_version(db)
+    products = [
+        ProductRecord(
+            product_id=p.product_id,
+            product_code=p.product_code,
+            base_code=p.base_code,
+            product_name_cn=p.product_name_cn,
+            category=p.category,
+            subcategory=p.subcategory,
+            material_type=p.material_type,
+            base_cost=float(p.base_cost or 0),
+            source_pdf=p.source_pdf,
+            source_page=p.source_page,
+            screenshot_url=p.screenshot_url,
+            notes=p.notes,
+        )
+        for p in db.query(Product).order_by(Product.product_id).all()
+    ]
+    rows = (
+        db.query(
+            PricingTier.product_id,
+            PricingTier.tier,
+            PricingTier.color_type,
+            PricingTier.price,
+            PricingTier.effective_date,
+        )
+        .order_by(
+            PricingTier.product_id,
+            PricingTier.tier,
+            PricingTier.color_type,
+            PricingTier.effective_date.desc(),
+            PricingTier.pricing_id.desc(),
+        )
+        .all()
+    )
+    prices = [
+        PriceRecord(product_id=r[0], tier=r[1], color_type=r[2], price=float(r[3]), effective_date=r[4])
+        for r in rows
+    ]
+    highlights = [
+        HighlightRecord(
+            product_id=h.product_id,
+            tier=h.tier or "",
+            color_type=h.color_type or "",
+            code_box=h.code_box,
+            price_box=h.price_box,
+            checks=h.checks,
+        )
+        for h in db.query(ProductHighlight).all()
+    ]
+    updated_at = db.query(CatalogVersion.updated_at).filter(CatalogVersion.id == 1).scalar()
+    return CatalogSnapshot(version, products, prices, highlights, updated_at=updated_at)
+
+
+class _Slot:
+    def __init__(self) -> None:
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+# One snapshot per engine (tests use several throwaway SQLite engines)
+_SLOTS: "weakref.WeakKeyDictionary[Any, _Slot]" = weakref.WeakKeyDictionary()
+_SLOTS_LOCK = threading.Lock()
+
+
+def _slot_for(bind: Any) -> _Slot:
+    slot = _SLOTS.get(bind)
+    if slot is None:
+        with _SLOTS_LOCK:
+            slot = _SLOTS.get(bind)
+            if slot is None:
+                slot = _Slot()
+                _SLOTS[bind] = slot
+    return slot
+
+
+def get_catalog(db: Session, version: Optional[int] = None) -> CatalogSnapshot:
+    """Return the current snapshot, reloading it if the catalog version moved.
+
+    The version row is consulted at most every ``CATALOG_REFRESH_SECONDS``;
+    in between, lookups never touch the database. A caller that has just
+    read the current ``version`` gets a snapshot of that version right away.
+    """
+    slot = _slot_for(db.get_bind())
+    snap = slot.snapshot
+    now = time.monotonic()
+
+    def _fresh(s: Optional[CatalogSnapshot]) -> bool:
+        if s is None:
+            return False
+        if version is not None:
+            # an older read (long transaction) must not roll the snapshot back
+            return s.version >= version
+        return now - slot.checked_at < settings.CATALOG_REFRESH_SECONDS
+
+    if _fresh(snap):
+        return snap
+    with slot.lock:
+        snap = slot.snapshot
+        if _fresh(snap):
+            return snap
+        if version is None:
+            version = get_catalog_version(db)
+        if snap is None or snap.version != version:
+            snap = load_catalog(db, version)
+            slot.snapshot = snap  # atomic swap; readers keep their old reference
+        slot.checked_at = time.monotonic()
+        return snap
+
+
+def invalidate_catalog(db: Optional[Session] = None) -> None:
+    """Drop cached snapshots (for one engine, or all) so the next call reloads."""
+    if db is None:
+        with _SLOTS_LOCK:
+            _SLOTS.clear()
+        return
+    with _SLOTS_LOCK:
+        _SLOTS.pop(db.get_bind(), None)
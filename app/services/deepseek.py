@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import re
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
 
+from app.core.config import settings
+from app.services.extraction_cache import extraction_cache
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.deadline import Deadline
+from app.utils.metrics import registry
+
 
 SYSTEM_PROMPT = """你是一个专业的价格查询助手。用户会用中文提问产品价格。
 
@@ -36,6 +45,12 @@ SYSTEM_PROMPT = """你是一个专业的价格查询助手。用户会用中文
 """
 
 
+# product code as typed ("GT10S", "gt-10s" once upper-cased); shared by the
+# extraction and its confidence score so both agree on what a code is
+_CODE_TOKEN_RE = re.compile(r"[A-Z]{1,3}\s*-?\s*\d{1,4}[SP]?")
+_EXPLICIT_TIER_RE = re.compile(r"([ABCD])\s*[级类]")
+
+
 def _heuristic_extract(query: str) -> Dict[str, Any]:
     q = (query or "").upper()
     result: Dict[str, Any] = {
@@ -44,7 +59,7 @@ def _heuristic_extract(query: str) -> Dict[str, Any]:
         "color_type": None,
         "material": None,
     }
-    m = re.search(r"[A-Z]{1,3}\s*-?\s*\d{1,4}[SP]?", q)
+    m = _CODE_TOKEN_RE.search(q)
     if m:
         code = re.sub(r"[^A-Z0-9]", "", m.group(0))
         result["product_code"] = code
@@ -67,6 +82,34 @@ def _heuristic_extract(query: str) -> Dict[str, Any]:
     return result
 
 
+def _heuristic_confidence(query: str, result: Dict[str, Any]) -> float:
+    """Score how fully the heuristic parse pins the query down (0.0 - 1.0).
+
+    Each of code (0.4), tier (0.3) and color (0.3) only counts when it is
+    unambiguous: a single distinct code token, exactly one explicit
+    "X级"/"X类" tier that is also the tier extracted, and not both 标准
+    and 定制 mentioned.
+    """
+    q = (query or "").upper()
+    score = 0.0
+    codes = {re.sub(r"[^A-Z0-9]", "", m) for m in _CODE_TOKEN_RE.findall(q)}
+    if result.get("product_code") and len(codes) == 1:
+        score += 0.4
+    tiers = set(_EXPLICIT_TIER_RE.findall(q))
+    if len(tiers) == 1 and result.get("tier") == f"{next(iter(tiers))}级":
+        score += 0.3
+    custom = any(k in q for k in ["定制", "CUSTOM"])
+    standard = any(k in q for k in ["标准", "STANDARD"])
+    if result.get("color_type") and custom != standard:
+        score += 0.3
+    return round(score, 2)
+
+
+def heuristic_extract_scored(query: str) -> Tuple[Dict[str, Any], float]:
+    result = _heuristic_extract(query)
+    return result, _heuristic_confidence(query, result)
+
+
 def _normalize_tier(value: Optional[str]) -> Optional[str]:
     if not value:
         return None
@@ -108,8 +151,147 @@ def _parse_json_from_text(text: str) -> Dict[str, Any]:
     return {}
 
 
+try:  # optional dependency: HTTP/2 needs the h2 package (httpx[http2])
+    import h2  # type: ignore  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except Exception:  # pragma: no cover
+    _HTTP2_AVAILABLE = False
+
+
+# Process-wide pooled clients: keep-alive connections are reused across
+# queries, so only the first call pays DNS + TCP + TLS setup.
+_client_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "http2": bool(settings.DEEPSEEK_HTTP2 and _HTTP2_AVAILABLE),
+        "limits": httpx.Limits(
+            max_connections=settings.DEEPSEEK_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.DEEPSEEK_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "timeout": httpx.Timeout(
+            settings.DEEPSEEK_TIMEOUT_SECONDS,
+            connect=settings.DEEPSEEK_CONNECT_TIMEOUT_SECONDS,
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _client_lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled async client, bound to the running event loop."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        with _client_lock:
+            if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+                # connections cannot be shared across event loops
+                _async_client = httpx.AsyncClient(**_client_options())
+                _async_client_loop = loop
+    return _async_client
+
+
+def close_http_client() -> None:
+    global _sync_client
+    with _client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+
+
+async def aclose_http_client() -> None:
+    global _async_client, _async_client_loop
+    client = _async_client
+    _async_client, _async_client_loop = None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+# Shared by all clients: while open, queries fall back to the heuristic
+# parser immediately instead of waiting on a slow or failing API.
+deepseek_breaker = CircuitBreaker(
+    "deepseek",
+    failure_threshold=settings.DEEPSEEK_BREAKER_FAILURE_THRESHOLD,
+    slow_call_seconds=settings.DEEPSEEK_BREAKER_SLOW_CALL_SECONDS,
+    recovery_seconds=settings.DEEPSEEK_BREAKER_RECOVERY_SECONDS,
+)
+
+_CALL_DURATION = registry.histogram(
+    "costchecker_deepseek_request_duration_seconds", "DeepSeek API call latency.", scale=0.001
+)
+# ok, http_error, bad_response (unparseable answer), transport_error (timeout, connection)
+_CALLS = registry.counter("costchecker_deepseek_requests_total", "DeepSeek API calls by outcome.", ["outcome"])
+_BREAKER_OPEN = registry.gauge("costchecker_deepseek_breaker_open", "1 while the DeepSeek circuit is not closed.")
+_BREAKER_OPEN.set_function(lambda: 0 if deepseek_breaker.state == CircuitBreaker.CLOSED else 1)
+_BREAKER_REJECTED = registry.counter(
+    "costchecker_deepseek_breaker_rejected_total", "DeepSeek calls skipped because the circuit was open."
+)
+_BREAKER_REJECTED.set_function(lambda: deepseek_breaker.rejected)
+
+
+def _count_call(resp: Optional[httpx.Response], result: Optional[Dict[str, Any]], elapsed: float) -> None:
+    _CALL_DURATION.observe(elapsed * 1000)
+    if resp is None:
+        outcome = "transport_error"
+    elif result is not None:
+        outcome = "ok"
+    else:
+        outcome = "http_error" if resp.status_code >= 400 else "bad_response"
+    _CALLS.labels(outcome).inc()
+
+
+# Not worth starting an LLM call with less budget than this
+_MIN_LLM_BUDGET_SECONDS = 0.1
+
+
+def _llm_timeout(deadline: Optional[Deadline]) -> float:
+    """Configured timeout bounded by the caller's deadline (0.0 = no budget left)."""
+    timeout = settings.DEEPSEEK_TIMEOUT_SECONDS
+    if deadline is not None:
+        timeout = deadline.clamp(timeout)
+    return timeout if timeout >= _MIN_LLM_BUDGET_SECONDS else 0.0
+
+
+def _cut_short(exc: Exception, timeout: Optional[float]) -> bool:
+    """True for a timeout that only fired because the deadline shortened the configured one.
+
+    Callers still count such a call when it ran longer than the breaker's
+    slow-call threshold (the WeWork passive window is above it).
+    """
+    if timeout is None or not isinstance(exc, httpx.TimeoutException):
+        return False
+    if isinstance(exc, httpx.ConnectTimeout):
+        return timeout < settings.DEEPSEEK_CONNECT_TIMEOUT_SECONDS
+    return timeout < settings.DEEPSEEK_TIMEOUT_SECONDS
+
+
+def _request_timeout(timeout: float) -> httpx.Timeout:
+    return httpx.Timeout(timeout, connect=min(timeout, settings.DEEPSEEK_CONNECT_TIMEOUT_SECONDS))
+
+
 class DeepSeekClient:
-    """DeepSeek API client. Falls back to heuristics if API key missing or request fails."""
+    """DeepSeek API client. Falls back to heuristics if API key missing or request fails.
+
+    Instances are cheap: HTTP connections live in the module-level pool.
+    """
+
+    # values reported in ``last_path`` (which extraction path answered)
+    PATH_HEURISTIC = "heuristic"  # fast path: query fully determined by regex
+    PATH_CACHE = "cache"
+    PATH_LLM = "llm"
+    PATH_FALLBACK = "heuristic_fallback"  # no API key/budget, circuit open, or the LLM call failed
 
     def __init__(self, api_key: str | None, base_url: str | None = None, model: str | None = None) -> None:
         self.api_key = api_key or None
@@ -117,58 +299,115 @@ class DeepSeekClient:
             self.api_key = None
         self.base_url = (base_url or "https://api.deepseek.com/v1").rstrip("/")
         self.model = model or "deepseek-chat"
+        self.last_path: Optional[str] = None
 
-    def _call_api(self, query: str, timeout: float = 8.0) -> Optional[Dict[str, Any]]:
-        if not self.api_key:
-            return None
-        url = f"{self.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
+    def _request_args(self, query: str) -> Dict[str, Any]:
+        return {
+            "url": f"{self.base_url}/chat/completions",
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+            "json": {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": query},
+                ],
+                "temperature": 0.0,
+            },
         }
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": query},
-            ],
-            "temperature": 0.0,
+
+    @staticmethod
+    def _parse_response(resp: httpx.Response) -> Optional[Dict[str, Any]]:
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        content = (
+            data.get("choices", [{}])[0]
+            .get("message", {})
+            .get("content", "")
+        )
+        parsed = _parse_json_from_text(content)
+        if not isinstance(parsed, dict):
+            return None
+        out: Dict[str, Any] = {
+            "product_code": parsed.get("product_code"),
+            "tier": _normalize_tier(parsed.get("tier")),
+            "color_type": _normalize_color(parsed.get("color_type")),
+            "material": None,
         }
+        mat = parsed.get("material")
+        if isinstance(mat, str):
+            mu = mat.strip().upper()
+            if "SILICONE" in mu or "硅" in mu or "矽" in mu:
+                out["material"] = "SILICONE"
+            elif "PVC" in mu:
+                out["material"] = "PVC"
+        if isinstance(out.get("product_code"), str):
+            out["product_code"] = re.sub(r"[^A-Z0-9]", "", str(out["product_code"]).upper())
+        return out
+
+    def _prepare(self, query: str, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """``post()`` arguments, or None when the call must not be made (no key, circuit open)."""
+        if not self.api_key or not deepseek_breaker.allow():
+            return None
+        args = self._request_args(query)
+        if timeout is not None:
+            args["timeout"] = _request_timeout(timeout)
+        return args
+
+    @staticmethod
+    def _failed(exc: Exception, timeout: Optional[float], elapsed: float) -> None:
+        """Breaker and metrics bookkeeping for a call that raised."""
+        # the request's deadline, not the API, limited this call; a call
+        # that still ran past the slow threshold counts either way
+        if _cut_short(exc, timeout) and elapsed <= deepseek_breaker.slow_call_seconds:
+            deepseek_breaker.record_ignored()
+        else:
+            deepseek_breaker.record_failure()
+        _count_call(None, None, elapsed)
+
+    def _completed(self, resp: httpx.Response, elapsed: float) -> Optional[Dict[str, Any]]:
+        """Breaker and metrics bookkeeping for a response; returns the parsed params."""
+        # 5xx / rate limiting count against the breaker; other statuses mean the API is up
+        if resp.status_code >= 500 or resp.status_code == 429:
+            deepseek_breaker.record_failure()
+        else:
+            deepseek_breaker.record_success(elapsed)
         try:
-            with httpx.Client(timeout=timeout) as client:
-                resp = client.post(url, headers=headers, json=payload)
-            if resp.status_code != 200:
-                return None
-            data = resp.json()
-            content = (
-                data.get("choices", [{}])[0]
-                .get("message", {})
-                .get("content", "")
-            )
-            parsed = _parse_json_from_text(content)
-            if not isinstance(parsed, dict):
-                return None
-            out: Dict[str, Any] = {
-                "product_code": parsed.get("product_code"),
-                "tier": _normalize_tier(parsed.get("tier")),
-                "color_type": _normalize_color(parsed.get("color_type")),
-                "material": None,
-            }
-            mat = parsed.get("material")
-            if isinstance(mat, str):
-                mu = mat.strip().upper()
-                if "SILICONE" in mu or "硅" in mu or "矽" in mu:
-                    out["material"] = "SILICONE"
-                elif "PVC" in mu:
-                    out["material"] = "PVC"
-            if isinstance(out.get("product_code"), str):
-                out["product_code"] = re.sub(r"[^A-Z0-9]", "", str(out["product_code"]).upper())
-            return out
+            result = self._parse_response(resp)
         except Exception:
+            result = None
+        _count_call(resp, result, elapsed)
+        return result
+
+    def _call_api(self, query: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        args = self._prepare(query, timeout)
+        if args is None:
+            return None
+        start = time.monotonic()
+        try:
+            resp = get_http_client().post(**args)
+        except Exception as exc:
+            self._failed(exc, timeout, time.monotonic() - start)
+            return None
+        return self._completed(resp, time.monotonic() - start)
+
+    async def _acall_api(self, query: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        args = self._prepare(query, timeout)
+        if args is None:
+            return None
+        start = time.monotonic()
+        try:
+            resp = await get_async_http_client().post(**args)
+        except Exception as exc:
+            self._failed(exc, timeout, time.monotonic() - start)
             return None
+        return self._completed(resp, time.monotonic() - start)
 
-    def extract_query_params(self, query: str) -> Dict[str, Any]:
-        api_result = self._call_api(query)
+    @staticmethod
+    def _finalize(query: str, api_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         if api_result:
             if not api_result.get("product_code"):
                 h = _heuristic_extract(query)
@@ -177,3 +416,55 @@ class DeepSeekClient:
             return api_result
         return _heuristic_extract(query)
 
+    def fast_path(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return heuristic params when they fully determine the query, else None."""
+        if not settings.HEURISTIC_FAST_PATH:
+            return None
+        params, confidence = heuristic_extract_scored(query)
+        if confidence >= 1.0:
+            self.last_path = self.PATH_HEURISTIC
+            return params
+        return None
+
+    def extract_query_params(self, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Extract params; the LLM call never outlives ``deadline``."""
+        params = self.fast_path(query)
+        if params is not None:
+            return params
+        if self.api_key:
+            cached = extraction_cache.get(query)
+            if cached is not None:
+                self.last_path = self.PATH_CACHE
+                return cached
+        timeout = _llm_timeout(deadline)
+        api_result = self._call_api(query, timeout=timeout) if timeout else None
+        params = self._finalize(query, api_result)
+        self.last_path = self.PATH_LLM if api_result else self.PATH_FALLBACK
+        if api_result and self.api_key:
+            # only LLM answers are cached; heuristic fallbacks are cheap anyway
+            extraction_cache.put(query, params)
+        return params
+
+    async def aextract_query_params(self, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Async variant: awaits the LLM without tying up a worker thread."""
+        params = self.fast_path(query)
+        if params is not None:
+            return params
+        if self.api_key:
+            if extraction_cache.persist:
+                cached = await asyncio.to_thread(extraction_cache.get, query)
+            else:
+                cached = extraction_cache.get(query)
+            if cached is not None:
+                self.last_path = self.PATH_CACHE
+                return cached
+        timeout = _llm_timeout(deadline)
+        api_result = await self._acall_api(query, timeout=timeout) if timeout else None
+        params = self._finalize(query, api_result)
+        self.last_path = self.PATH_LLM if api_result else self.PATH_FALLBACK
+        if api_result and self.api_key:
+            if extraction_cache.persist:
+                await asyncio.to_thread(extraction_cache.put, query, params)
+            else:
+                extraction_cache.put(query, params)
+        return params
@@ -0,0 +1,157 @@
+"""
+Cache of LLM-extracted query parameters.
+
+Staff repeat the same questions all day, so the ``{product_code, tier,
+color_type, material}`` dict returned by DeepSeek is cached under a
+normalized form of the query text. Entries live in an in-process LRU with
+a TTL and, when ``LLM_CACHE_PERSIST`` is enabled, in the
+``llm_extraction_cache`` table so restarts and other workers reuse them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import LLMExtractionCache
+from app.utils.lru_cache import LRUCache
+from app.utils.metrics import export_cache_stats
+
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query_text(query: str) -> str:
+    """Canonical cache key text: NFKC (full-width -> ASCII), upper-case, single spaces."""
+    q = unicodedata.normalize("NFKC", query or "").upper()
+    return _WS_RE.sub(" ", q).strip()
+
+
+def _key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """Two-level (memory, optional DB table) cache of extracted params."""
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl_seconds: float = 6 * 3600,
+        persist: bool = False,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._session_factory = session_factory
+        self._memory: LRUCache[Dict[str, Any]] = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from app.core.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        normalized = normalize_query_text(query)
+        if not normalized:
+            return None
+        key = _key(normalized)
+        value = self._memory.get(key)
+        if value is None and self.persist:
+            value = self._load(key)
+            if value is not None:
+                self._memory.set(key, value)
+                with self._lock:
+                    self.store_hits += 1
+                return dict(value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return dict(value) if value is not None else None
+
+    def put(self, query: str, params: Dict[str, Any]) -> None:
+        normalized = normalize_query_text(query)
+        if not normalized:
+            return
+        key = _key(normalized)
+        value = dict(params)
+        self._memory.set(key, value)
+        if self.persist:
+            self._store(key, normalized, value)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        db = self._session()
+        try:
+            rec = db.get(LLMExtractionCache, key)
+            if rec is None or (rec.expires_at and rec.expires_at < datetime.utcnow()):
+                return None
+            rec.hit_count = int(rec.hit_count or 0) + 1
+            db.commit()
+            return dict(rec.params or {})
+        except Exception as e:
+            logger.warning("LLM cache lookup failed: %s", e)
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, normalized: str, value: Dict[str, Any]) -> None:
+        db = self._session()
+        try:
+            db.merge(
+                LLMExtractionCache(
+                    query_key=key,
+                    normalized_query=normalized,
+                    params=value,
+                    hit_count=0,
+                    created_at=datetime.utcnow(),
+                    expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                )
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning("LLM cache store failed: %s", e)
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "llm_calls_saved": self.hits + self.store_hits,
+                "hit_ratio": ((self.hits + self.store_hits) / lookups) if lookups else 0.0,
+                "persist": self.persist,
+                "memory": self._memory.stats(),
+            }
+
+
+# module-level instance
+extraction_cache = ExtractionCache(
+    maxsize=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    persist=settings.LLM_CACHE_PERSIST,
+)
+export_cache_stats("llm_extraction", extraction_cache.stats, hits_key="llm_calls_saved")
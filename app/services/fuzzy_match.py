@@ -5,8 +5,7 @@ from typing import List, Tuple
 from rapidfuzz import fuzz, process  # type: ignore
 from sqlalchemy.orm import Session
 
-from app.models import Product
-from app.utils.product_parser import extract_base_code
+from app.services.catalog import ProductRecord, get_catalog
 
 
 def normalize_product_code(query: str) -> str:
@@ -14,26 +13,34 @@ def normalize_product_code(query: str) -> str:
     return "".join(ch for ch in q if ch.isalnum())
 
 
-def exact_match(db: Session, normalized_code: str) -> Tuple[list[Product], float]:
-    match = db.query(Product).filter(Product.product_code == normalized_code).all()
-    return match, 1.0 if match else 0.0
+def exact_match(db: Session, normalized_code: str) -> Tuple[list[ProductRecord], float]:
+    return get_catalog(db).exact_match(normalized_code)
 
 
-def base_code_match(db: Session, normalized_code: str) -> Tuple[list[Product], float]:
-    base, _ = extract_base_code(normalized_code)
-    matches = db.query(Product).filter(Product.base_code == base).all()
-    return matches, 0.95 if matches else 0.0
+def base_code_match(db: Session, normalized_code: str) -> Tuple[list[ProductRecord], float]:
+    return get_catalog(db).base_code_match(normalized_code)
 
 
-def fuzzy_string_match(db: Session, normalized_code: str, threshold: float = 0.85) -> list[tuple[Product, float]]:
-    codes = db.query(Product.product_code).all()
-    all_codes = [c[0] for c in codes]
-    results = []
-    for code in all_codes:
-        score = fuzz.ratio(normalized_code, code) / 100.0
-        if score >= threshold:
-            prod = db.query(Product).filter(Product.product_code == code).one()
-            results.append((prod, score))
+def fuzzy_string_match(db: Session, normalized_code: str, threshold: float = 0.85) -> list[tuple[ProductRecord, float]]:
+    """Score the query against every catalog code in one batched rapidfuzz call.
+
+    Products come straight from the catalog snapshot, so a typo costs no
+    database round trips regardless of how many codes clear the threshold.
+    """
+    catalog = get_catalog(db)
+    if not normalized_code or not catalog.codes:
+        return []
+    hits = process.extract(
+        normalized_code,
+        catalog.codes,
+        scorer=fuzz.ratio,
+        score_cutoff=threshold * 100.0 - 1e-6,  # float slack; re-checked below
+        limit=None,
+    )
+    results = [
+        (catalog.products[idx], score / 100.0)
+        for _, score, idx in hits
+        if score / 100.0 >= threshold
+    ]
     results.sort(key=lambda x: x[1], reverse=True)
     return results
-
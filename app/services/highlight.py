@@ -0,0 +1,223 @@
+"""
+Screenshot highlight boxes for the product code cell and the price cell.
+
+Boxes are in screenshot pixel space (pages rendered at 300 DPI) and carry
+the 1-based page number. ``scripts/build_highlights.py`` computes them once
+per product x tier x color into ``product_highlights`` (the seeder redoes
+the products it changes, before its version bump); they reach the
+query path through the catalog snapshot. Parsing the PDF at query time is
+only an opt-in fallback (``HIGHLIGHT_ONLINE_FALLBACK``).
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import ProductHighlight
+from app.services.page_cache import PageWords, page_cache
+from app.services.page_index import SCALE, PageIndex, alnum_key, parse_number, word_box
+
+
+TIER_ORDINAL = {"A级": 1, "B级": 2, "C级": 3, "D级": 4}
+
+
+def new_checks() -> Dict[str, Any]:
+    """QA flags describing how the price box was located."""
+    return {
+        "code_found": False,
+        "row_located": False,
+        "cost_anchor": False,
+        "column_ordinal": False,
+        "fallback_nearest": False,
+        "value_match": False,
+    }
+
+
+def page_index(words: Union[PageIndex, PageWords, Iterable[Dict[str, Any]]]) -> PageIndex:
+    """Spatial index for ``words``; memoised when they come from the page cache."""
+    if isinstance(words, PageIndex):
+        return words
+    if isinstance(words, PageWords):
+        return words.index()
+    return PageIndex(words)
+
+
+def notes_highlight(product: Any) -> Optional[dict]:
+    """Code box recorded by the extractors in ``product.notes`` JSON, if any."""
+    try:
+        if product.notes:
+            j = json.loads(product.notes)
+            return j.get("highlight") if isinstance(j, dict) else None
+    except Exception:
+        pass
+    return None
+
+
+def load_page_words(source_pdf: Optional[str], page: Optional[int]) -> Optional[PageWords]:
+    """Words of a source PDF page (via the shared page cache), or None when unavailable."""
+    return page_cache.get(source_pdf, page)
+
+
+def find_code_box(words: Union[PageIndex, Iterable[Dict[str, Any]]], product: Any) -> Optional[dict]:
+    """Box of the first word equal to the product code (or, failing that, the base code)."""
+    index = page_index(words)
+    cands = []
+    if product.product_code:
+        cands.append(alnum_key(product.product_code))
+    if getattr(product, "base_code", None):
+        cands.append(alnum_key(product.base_code))
+    for cand in cands:
+        w = index.find_text(cand)
+        if w is not None:
+            return word_box(w, product.source_page)
+    return None
+
+
+def find_price_box(
+    words: Union[PageIndex, Iterable[Dict[str, Any]]],
+    product: Any,
+    tier: Optional[str],
+    color_type: Optional[str],
+    price: float,
+    code_box: Optional[dict],
+    checks: Dict[str, Any],
+) -> Optional[dict]:
+    """Locate the price cell for (tier, color) on the product's row.
+
+    Prefers the column ordinal counted from the base-cost cell on the code's
+    row; falls back to the word with the same value closest to that row.
+    Updates ``checks`` with how the box was found.
+    """
+    index = page_index(words)
+    page = int(product.source_page)
+    code_y = None
+    if code_box:
+        code_y = code_box.get("y") + (code_box.get("h") or 0) / 2
+    # Row tokens near code_y (compared in PDF space; allow ~3.5 points)
+    row = index.row(code_y / SCALE, 3.5) if code_y is not None else []
+    if row:
+        checks["row_located"] = True
+    chosen = None
+    chosen_val: Optional[float] = None
+    if row:
+        row_num = []
+        for w in row:
+            val = parse_number(w.get("text", ""))
+            if val is not None and 0.05 <= val <= 10.0:
+                row_num.append(w)
+        row_num.sort(key=lambda w: w.get("x0", 0.0))
+        # Map ordinal by tier/color after cost
+        ord_after_cost = TIER_ORDINAL.get(tier or "", 0)
+        if (color_type or "") == "定制色":
+            ord_after_cost += 4
+        # find cost index by matching base_cost if present
+        cost_idx = 0
+        try:
+            base_cost = float(product.base_cost or 0)
+            for i, w in enumerate(row_num):
+                v = parse_number(w.get("text", ""))
+                if v is not None and abs(v - base_cost) < 1e-6:
+                    cost_idx = i
+                    checks["cost_anchor"] = True
+                    break
+        except Exception:
+            pass
+        target_idx = cost_idx + ord_after_cost
+        if 0 <= target_idx < len(row_num):
+            w = row_num[target_idx]
+            v = parse_number(w.get("text", ""))
+            if v is not None:
+                chosen = word_box(w, page)
+                chosen_val = v
+                checks["column_ordinal"] = True
+    # Fallback to the same value nearest the row
+    if chosen is None:
+        best_pen = 1e9
+        for w in index.with_value(price):
+            box = word_box(w, page)
+            pen = 0.0
+            if code_y is not None:
+                pen += abs(box["y"] + box["h"] / 2 - code_y)
+            # prefer more rightward values slightly to avoid cost match
+            pen += box["x"] * 0.0001
+            if pen < best_pen:
+                best_pen = pen
+                chosen = box
+                chosen_val = parse_number(w.get("text", ""))
+        if chosen is not None:
+            checks["fallback_nearest"] = True
+    if chosen_val is not None and abs(chosen_val - price) < 1e-6:
+        checks["value_match"] = True
+    return chosen
+
+
+def compute_product_highlights(
+    product: Any,
+    prices: Iterable[Any],
+    words: Optional[Iterable[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """Rows for ``product_highlights``: one code-only row plus one per price.
+
+    ``prices`` are records with ``tier``, ``color_type`` and ``price``;
+    ``words`` is the product's source page (None when the PDF is missing).
+    """
+    index = page_index(words) if words else None
+    code_box = notes_highlight(product)
+    if code_box is None and index is not None:
+        code_box = find_code_box(index, product)
+    base_checks = new_checks()
+    base_checks["code_found"] = code_box is not None
+    rows = [{"tier": "", "color_type": "", "code_box": code_box, "price_box": None, "checks": base_checks}]
+    for pr in prices:
+        checks = dict(base_checks)
+        price_box = None
+        if index is not None:
+            price_box = find_price_box(index, product, pr.tier, pr.color_type, float(pr.price), code_box, checks)
+        rows.append(
+            {"tier": pr.tier, "color_type": pr.color_type, "code_box": code_box, "price_box": price_box, "checks": checks}
+        )
+    return rows
+
+
+def rebuild_highlights(
+    db: Session,
+    load_words: Callable[[Optional[str], Optional[int]], Optional[Iterable[Dict[str, Any]]]] = load_page_words,
+    product_ids: Optional[Iterable[int]] = None,
+    bump: bool = True,
+) -> Dict[str, Any]:
+    """Recompute ``product_highlights`` for the whole catalog, or only ``product_ids`` (caller commits).
+
+    Each source page is parsed once and shared by every product on it. The
+    catalog version is bumped so running processes pick the boxes up; the
+    seeder passes ``bump=False`` and bumps once itself, in the same
+    transaction.
+    """
+    from app.services.catalog import bump_catalog_version, load_catalog
+
+    wanted = None if product_ids is None else set(product_ids)
+    catalog = load_catalog(db)
+    by_page: Dict[tuple, list] = {}
+    for p in catalog.products:
+        if wanted is None or p.product_id in wanted:
+            by_page.setdefault((p.source_pdf, p.source_page), []).append(p)
+    stale = db.query(ProductHighlight)
+    if wanted is not None:
+        stale = stale.filter(ProductHighlight.product_id.in_(wanted))
+    stale.delete(synchronize_session=False)
+    rows: List[Dict[str, Any]] = []
+    pages_parsed = 0
+    for (pdf, page), products in by_page.items():
+        words = load_words(pdf, page)
+        if words is not None:
+            pages_parsed += 1
+        for p in products:
+            for r in compute_product_highlights(p, catalog.prices_for(p.product_id), words):
+                rows.append({"product_id": p.product_id, **r})
+    if rows:
+        db.execute(insert(ProductHighlight), rows)
+    version = bump_catalog_version(db) if bump else None
+    return {"rows": len(rows), "pages": len(by_page), "pages_parsed": pages_parsed, "catalog_version": version}
@@ -0,0 +1,197 @@
+"""
+Latency histograms per query mode.
+
+Every logged request is classified (direct, wide, description,
+confirmation, wework) and its ``execution_time_ms`` lands in a
+fixed-bucket histogram twice: in memory for this process (since start),
+and in ``latency_buckets`` per day, added by the query-log writer in the
+same transaction as the log rows. Requests whose rows the writer sheds
+under overload are still counted: their buckets are held in a
+``LatencyTally`` and added with the next batch, so sampling never skews
+the percentiles. Percentiles are computed from bucket counts only, never
+from raw ``query_logs`` rows.
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import LatencyBucket
+from app.utils.histogram import LATENCY_BUCKETS_MS, Histogram
+from app.utils.metrics import HistogramMetric, registry
+
+
+MODES = ("direct", "wide", "description", "confirmation", "wework")
+
+QUERY_DURATION = registry.histogram(
+    "costchecker_query_duration_seconds",
+    "Query latency by mode (execution_time_ms of logged queries).",
+    ["mode"],
+    scale=0.001,
+)
+
+
+def query_mode(result: Dict[str, Any]) -> str:
+    """Mode of a ``process_query`` result (the WeWork and confirm routes set their own)."""
+    data = result.get("data") or {}
+    if "results" in data and "mode" in data:
+        return "description" if "ref_products" in data else "wide"
+    return "direct"
+
+
+class LatencyRecorder:
+    """In-process histograms per mode since the process started.
+
+    With ``metric`` the histograms are that metric's children, so /metrics
+    exports the same counts.
+    """
+
+    def __init__(self, metric: Optional[HistogramMetric] = None) -> None:
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._metric = metric
+        self.started_at = datetime.utcnow()
+
+    def histogram(self, mode: str) -> Histogram:
+        h = self._histograms.get(mode)
+        if h is None:
+            with self._lock:
+                h = self._histograms.get(mode)
+                if h is None:
+                    h = self._metric.labels(mode) if self._metric is not None else Histogram()
+                    self._histograms[mode] = h
+        return h
+
+    def observe(self, mode: str, ms: Optional[float]) -> None:
+        if ms is not None:
+            self.histogram(mode).observe(float(ms))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            modes = dict(self._histograms)
+        return {
+            "since": self.started_at.isoformat(),
+            "modes": {m: h.summary() for m, h in sorted(modes.items())},
+        }
+
+
+latency_recorder = LatencyRecorder(QUERY_DURATION)
+
+
+class LatencyTally:
+    """``latency_buckets`` increments keyed by (day, mode, bucket).
+
+    Its size is bounded by days x modes x buckets however many rows are
+    added, so the writer can hold the latencies of rows it sheds.
+    """
+
+    _probe = Histogram()
+
+    def __init__(self) -> None:
+        self._acc: Dict[Tuple[date, str, int], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._acc)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Count one query-log row (rows without a latency are ignored)."""
+        ms = row.get("execution_time_ms")
+        if ms is None:
+            return
+        ts = row.get("timestamp") or datetime.utcnow()
+        key = (ts.date(), row.get("query_classification") or "direct", self._probe.bucket_index(ms))
+        c = self._acc.setdefault(key, [0, 0])
+        c[0] += 1
+        c[1] += int(ms)
+
+    def update(self, deltas: Iterable[Dict[str, Any]]) -> None:
+        for d in deltas:
+            c = self._acc.setdefault((d["date"], d["mode"], d["bucket"]), [0, 0])
+            c[0] += d["count"]
+            c[1] += d["sum_ms"]
+
+    def deltas(self) -> List[Dict[str, Any]]:
+        return [
+            {"date": d, "mode": m, "bucket": b, "count": c, "sum_ms": s}
+            for (d, m, b), (c, s) in sorted(self._acc.items())
+        ]
+
+
+def bucket_deltas(rows: Iterable[Dict[str, Any]], extra: Iterable[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+    """Histogram increments ``{date, mode, bucket, count, sum_ms}`` for query-log rows plus ``extra``."""
+    tally = LatencyTally()
+    tally.update(extra)
+    for r in rows:
+        tally.add(r)
+    return tally.deltas()
+
+
+def persist_latencies(
+    conn: Connection, rows: Iterable[Dict[str, Any]], extra: Iterable[Dict[str, Any]] = ()
+) -> int:
+    """Add the rows' latencies and ``extra`` increments to ``latency_buckets`` (one upsert).
+
+    Returns the number of buckets touched.
+    """
+    deltas = bucket_deltas(rows, extra)
+    if not deltas:
+        return 0
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(LatencyBucket)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["date", "mode", "bucket"],
+            set_={
+                "count": LatencyBucket.count + stmt.excluded.count,
+                "sum_ms": LatencyBucket.sum_ms + stmt.excluded.sum_ms,
+            },
+        )
+        conn.execute(stmt, deltas)
+    else:  # pragma: no cover - other dialects: read-modify-write
+        with Session(bind=conn) as s:
+            for d in deltas:
+                rec = s.get(LatencyBucket, (d["date"], d["mode"], d["bucket"]))
+                if rec is None:
+                    s.add(LatencyBucket(**d))
+                else:
+                    rec.count += d["count"]
+                    rec.sum_ms += d["sum_ms"]
+            s.flush()
+    return len(deltas)
+
+
+def daily_histograms(db: Session, days: int, today: Optional[date] = None) -> Dict[str, Histogram]:
+    """Histograms per mode over the last ``days`` calendar days (bucket rows only)."""
+    today = today or datetime.utcnow().date()
+    first = today - timedelta(days=days - 1)
+    rows = (
+        db.query(LatencyBucket.mode, LatencyBucket.bucket, func.sum(LatencyBucket.count), func.sum(LatencyBucket.sum_ms))
+        .filter(LatencyBucket.date >= first, LatencyBucket.date <= today)
+        .group_by(LatencyBucket.mode, LatencyBucket.bucket)
+        .all()
+    )
+    out: Dict[str, Histogram] = {}
+    for mode, bucket, count, sum_ms in rows:
+        if 0 <= bucket <= len(LATENCY_BUCKETS_MS):
+            out.setdefault(mode, Histogram()).add_bucket(bucket, int(count or 0), float(sum_ms or 0))
+    return out
+
+
+def latency_percentiles(db: Session, days: int, today: Optional[date] = None) -> Dict[str, Any]:
+    """p50/p90/p95/p99 per mode and overall from ``latency_buckets``."""
+    per_mode = daily_histograms(db, days, today)
+    overall = Histogram()
+    for h in per_mode.values():
+        overall.merge(h)
+    return {
+        "modes": {m: h.summary() for m, h in sorted(per_mode.items())},
+        "all": overall.summary(),
+    }
@@ -1,33 +1,260 @@
+"""
+Query logging off the request path.
+
+``log_query`` puts a ``query_logs`` row on an in-process queue; a writer
+thread started with the app drains it with one multi-row INSERT per
+batch, flushing when ``QUERY_LOG_BATCH_SIZE`` rows are waiting or every
+``QUERY_LOG_FLUSH_SECONDS``. The queue is bounded: once it is half full
+only a sample of successful queries is kept (failures always are), and
+when it is full new rows are dropped and counted. The latencies of shed
+rows are still persisted with the next batch. Remaining rows are flushed
+on shutdown. When the writer is not running (scripts, tests) rows
+are written inline.
+"""
+
 from __future__ import annotations
 
-from typing import Any, Dict
+import logging
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models import QueryLog
+from app.services.latency import LatencyTally, latency_recorder, persist_latencies, query_mode
+from app.utils.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = (
+    "query_text",
+    "normalized_query",
+    "query_classification",
+    "fuzzy_matches",
+    "selected_product",
+    "confirmation_required",
+    "user_confirmed",
+    "sql_generated",
+    "result_text",
+    "result_data",
+    "screenshot_url",
+    "confidence_score",
+    "execution_time_ms",
+    "success",
+    "error_message",
+    "user_session",
+    "ip_address",
+    "stage_timings",
+    "db_statements",
+    "db_time_ms",
+)
+
+
+def _row(query_data: Dict[str, Any]) -> Dict[str, Any]:
+    row = {c: query_data.get(c) for c in _COLUMNS}
+    row["query_text"] = row["query_text"] or ""
+    row["confirmation_required"] = bool(row["confirmation_required"])
+    row["user_confirmed"] = bool(row["user_confirmed"])
+    row["success"] = True if row["success"] is None else bool(row["success"])
+    # stamped when the query ran, not when the batch is written
+    row["timestamp"] = query_data.get("timestamp") or datetime.utcnow()
+    return row
+
+
+def query_log_record(query: str, result: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+    """``log_query`` payload describing ``result`` (extra keys: user_session, ip_address, ...)."""
+    data = result.get("data") or {}
+    status = result.get("status")
+    record = {
+        "query_text": query,
+        "query_classification": query_mode(result),
+        "selected_product": data.get("product_code"),
+        "result_text": result.get("result_text"),
+        "result_data": result.get("data"),
+        "screenshot_url": result.get("screenshot_url"),
+        "confidence_score": result.get("confidence"),
+        "execution_time_ms": result.get("execution_time_ms"),
+        "success": status == "success",
+        "error_message": result.get("message") if status == "error" else None,
+        "confirmation_required": status == "needs_confirmation",
+    }
+    record.update(extra)
+    return record
+
+
+def write_query_logs(
+    bind: Any, rows: List[Dict[str, Any]], extra_latencies: Sequence[Dict[str, Any]] = ()
+) -> None:
+    """Insert ``rows`` in one executemany statement, add their latency buckets
+    (and ``extra_latencies`` increments of unwritten rows), commit."""
+    if not rows and not extra_latencies:
+        return
+    with bind.begin() as conn:
+        if rows:
+            conn.execute(insert(QueryLog), rows)
+        persist_latencies(conn, rows, extra_latencies)
+
+
+class QueryLogWriter:
+    """Bounded queue of pending log rows drained by a background thread."""
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_seconds: float = 1.0,
+        overload_sample_rate: float = 0.1,
+    ) -> None:
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = flush_seconds
+        self.overload_sample_rate = overload_sample_rate
+        # rows carry the engine they belong to (tests use several)
+        self._queue: Deque[Tuple[Any, Dict[str, Any]]] = deque()
+        # latencies of dropped / sampled-out rows, per engine, until the next write
+        self._unlogged: Dict[Any, LatencyTally] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._cond:
+            if self.running:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the thread after writing everything still queued."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def submit(self, bind: Any, query_data: Dict[str, Any]) -> bool:
+        """Queue one row; False when it was dropped or sampled out."""
+        row = _row(query_data)
+        # in-memory histograms count every request, even rows dropped below
+        latency_recorder.observe(row["query_classification"] or "direct", row["execution_time_ms"])
+        if not self.running:
+            self._write(bind, [row])
+            return True
+        with self._cond:
+            depth = len(self._queue)
+            if depth >= self.max_queue:
+                self.dropped += 1
+                self._unlogged.setdefault(bind, LatencyTally()).add(row)
+                return False
+            if depth * 2 >= self.max_queue and row["success"] and random.random() >= self.overload_sample_rate:
+                self.sampled_out += 1
+                self._unlogged.setdefault(bind, LatencyTally()).add(row)
+                return False
+            self._queue.append((bind, row))
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _take(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        n = min(self.batch_size, len(self._queue))
+        return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._queue) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_seconds)
+                batch = self._take()
+                stopping = self._stopping
+            self._write_batch(batch)
+            if stopping and not batch:
+                return
+
+    def _write_batch(self, batch: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        by_bind: Dict[Any, List[Dict[str, Any]]] = {}
+        for bind, row in batch:
+            by_bind.setdefault(bind, []).append(row)
+        for bind, rows in by_bind.items():
+            self._write(bind, rows)
+
+    def _write(self, bind: Any, rows: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            unlogged = self._unlogged.pop(bind, None)
+        extra = unlogged.deltas() if unlogged is not None else []
+        try:
+            write_query_logs(bind, rows, extra)
+        except Exception as e:
+            logger.warning("Dropping %d query log rows: %s", len(rows), e)
+            with self._cond:
+                self.failed += len(rows)
+                if extra:
+                    self._unlogged.setdefault(bind, LatencyTally()).update(extra)
+            return
+        with self._cond:
+            self.written += len(rows)
+            self.batches += 1
+
+    def flush(self) -> None:
+        """Write everything queued now (from the caller's thread)."""
+        while True:
+            with self._cond:
+                batch = self._take()
+            if not batch:
+                break
+            self._write_batch(batch)
+        with self._cond:
+            binds = list(self._unlogged)
+        for bind in binds:
+            self._write(bind, [])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "running": self.running,
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "sampled_out": self.sampled_out,
+                "failed": self.failed,
+            }
+
+
+# module-level instance, started and flushed by the app lifespan
+query_log_writer = QueryLogWriter(
+    max_queue=settings.QUERY_LOG_QUEUE_MAX,
+    batch_size=settings.QUERY_LOG_BATCH_SIZE,
+    flush_seconds=settings.QUERY_LOG_FLUSH_SECONDS,
+    overload_sample_rate=settings.QUERY_LOG_OVERLOAD_SAMPLE_RATE,
+)
+
 
+_QUEUED = registry.gauge("costchecker_query_log_queued", "Query log rows waiting for the writer.")
+_QUEUED.set_function(lambda: len(query_log_writer._queue))
+_ROWS = registry.counter("costchecker_query_log_rows_total", "Query log rows by outcome.", ["outcome"])
+for _outcome in ("written", "dropped", "sampled_out", "failed"):
+    _ROWS.set_function(lambda o=_outcome: getattr(query_log_writer, o), _outcome)
 
-def log_query(db: Session, query_data: Dict[str, Any]) -> int:
-    log = QueryLog(
-        query_text=query_data.get("query_text", ""),
-        normalized_query=query_data.get("normalized_query"),
-        query_classification=query_data.get("query_classification"),
-        fuzzy_matches=query_data.get("fuzzy_matches"),
-        selected_product=query_data.get("selected_product"),
-        confirmation_required=query_data.get("confirmation_required", False),
-        user_confirmed=query_data.get("user_confirmed", False),
-        sql_generated=query_data.get("sql_generated"),
-        result_text=query_data.get("result_text"),
-        result_data=query_data.get("result_data"),
-        screenshot_url=query_data.get("screenshot_url"),
-        confidence_score=query_data.get("confidence_score"),
-        execution_time_ms=query_data.get("execution_time_ms"),
-        success=query_data.get("success", True),
-        error_message=query_data.get("error_message"),
-        user_session=query_data.get("user_session"),
-        ip_address=query_data.get("ip_address"),
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log.query_id
 
+def log_query(db: Session, query_data: Dict[str, Any]) -> bool:
+    """Queue a ``query_logs`` row for the database ``db`` is bound to."""
+    return query_log_writer.submit(db.get_bind(), query_data)
@@ -0,0 +1,182 @@
+"""
+Daily rollups of ``query_logs`` into ``daily_metrics``.
+
+``rollup`` re-aggregates every day from the newest stored rollup through
+today (so a day rolled up while it was still running is completed on the
+next run) and is safe to repeat. Rows keep raw counts and sums, not only
+rates, so any range of days can be combined exactly.
+
+``window_stats`` answers the analytics dashboard from these rows; days
+without a complete rollup (always including today) are aggregated live
+from ``query_logs``, one contiguous range at a time.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, distinct, func
+from sqlalchemy.orm import Session
+
+from app.models import DailyMetric, QueryLog
+
+
+@dataclass
+class Aggregate:
+    """Query-log counts over some period."""
+
+    total: int = 0
+    successful: int = 0
+    confirmations: int = 0
+    timed: int = 0
+    time_sum_ms: int = 0
+    unique_users: int = 0
+    products: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+
+    def merge(self, other: "Aggregate") -> None:
+        self.total += other.total
+        self.successful += other.successful
+        self.confirmations += other.confirmations
+        self.timed += other.timed
+        self.time_sum_ms += other.time_sum_ms
+        # distinct users do not add up across days; this is an upper bound
+        self.unique_users += other.unique_users
+        self.products.update(other.products)
+        self.errors.update(other.errors)
+
+    @property
+    def avg_response_time_ms(self) -> int:
+        return int(self.time_sum_ms / self.timed) if self.timed else 0
+
+    @classmethod
+    def from_metric(cls, m: DailyMetric) -> "Aggregate":
+        return cls(
+            total=int(m.total_queries or 0),
+            successful=int(m.successful_queries or 0),
+            confirmations=int(m.confirmation_queries or 0),
+            timed=int(m.timed_queries or 0),
+            time_sum_ms=int(m.total_response_time_ms or 0),
+            unique_users=int(m.unique_users or 0),
+            products=Counter(m.top_products or {}),
+            errors=Counter(m.error_counts or {}),
+        )
+
+
+def aggregate(db: Session, start: datetime, end: datetime) -> Aggregate:
+    """Aggregate ``query_logs`` with ``start <= timestamp < end`` (three grouped queries)."""
+    in_range = (QueryLog.timestamp >= start, QueryLog.timestamp < end)
+    row = (
+        db.query(
+            func.count(QueryLog.query_id),
+            func.sum(case((QueryLog.success.is_(True), 1), else_=0)),
+            func.sum(case((QueryLog.confirmation_required.is_(True), 1), else_=0)),
+            func.count(QueryLog.execution_time_ms),
+            func.sum(QueryLog.execution_time_ms),
+            func.count(distinct(QueryLog.user_session)),
+        )
+        .filter(*in_range)
+        .one()
+    )
+    products = (
+        db.query(QueryLog.selected_product, func.count(1))
+        .filter(*in_range, QueryLog.selected_product.isnot(None))
+        .group_by(QueryLog.selected_product)
+        .all()
+    )
+    errors = (
+        db.query(QueryLog.error_message, func.count(1))
+        .filter(*in_range, QueryLog.success.is_(False), QueryLog.error_message.isnot(None))
+        .group_by(QueryLog.error_message)
+        .all()
+    )
+    return Aggregate(
+        total=int(row[0] or 0),
+        successful=int(row[1] or 0),
+        confirmations=int(row[2] or 0),
+        timed=int(row[3] or 0),
+        time_sum_ms=int(row[4] or 0),
+        unique_users=int(row[5] or 0),
+        products=Counter({k: int(n) for k, n in products if k}),
+        errors=Counter({k: int(n) for k, n in errors if k}),
+    )
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def rollup_day(db: Session, day: date) -> DailyMetric:
+    """(Re)compute the ``daily_metrics`` row for ``day`` (caller commits)."""
+    agg = aggregate(db, *_day_bounds(day))
+    metric = DailyMetric(
+        date=day,
+        total_queries=agg.total,
+        successful_queries=agg.successful,
+        failed_queries=agg.total - agg.successful,
+        avg_response_time_ms=agg.avg_response_time_ms if agg.timed else None,
+        confirmation_rate=round(agg.confirmations / agg.total, 2) if agg.total else None,
+        unique_users=agg.unique_users,
+        top_products=dict(agg.products),
+        confirmation_queries=agg.confirmations,
+        timed_queries=agg.timed,
+        total_response_time_ms=agg.time_sum_ms,
+        error_counts=dict(agg.errors),
+        updated_at=datetime.utcnow(),
+    )
+    return db.merge(metric)
+
+
+def rollup(db: Session, today: Optional[date] = None) -> List[date]:
+    """Roll up every day from the newest stored rollup (or first log) through today."""
+    today = today or datetime.utcnow().date()
+    start = db.query(func.max(DailyMetric.date)).scalar()
+    if start is None:
+        first = db.query(func.min(QueryLog.timestamp)).scalar()
+        start = first.date() if first is not None else today
+    days = []
+    day = start
+    while day <= today:
+        rollup_day(db, day)
+        days.append(day)
+        day += timedelta(days=1)
+    db.flush()
+    return days
+
+
+def _is_complete(m: DailyMetric) -> bool:
+    return m.updated_at is not None and m.updated_at >= _day_bounds(m.date)[1]
+
+
+def window_stats(db: Session, days: int, today: Optional[date] = None) -> Tuple[Aggregate, Dict[str, Any]]:
+    """Aggregate over the last ``days`` calendar days including today.
+
+    Returns the aggregate and how it was assembled (rolled-up days and
+    live-aggregated ranges).
+    """
+    today = today or datetime.utcnow().date()
+    first = today - timedelta(days=days - 1)
+    rolled = {
+        m.date: m
+        for m in db.query(DailyMetric).filter(DailyMetric.date >= first, DailyMetric.date < today).all()
+        if _is_complete(m)
+    }
+    total = Aggregate()
+    live_ranges = 0
+    run_start: Optional[date] = None
+    day = first
+    while day <= today:
+        if day in rolled:
+            total.merge(Aggregate.from_metric(rolled[day]))
+        elif run_start is None:
+            run_start = day
+        if run_start is not None and (day == today or (day + timedelta(days=1)) in rolled):
+            total.merge(aggregate(db, _day_bounds(run_start)[0], _day_bounds(day)[1]))
+            live_ranges += 1
+            run_start = None
+        day += timedelta(days=1)
+    return total, {"rollup_days": len(rolled), "live_ranges": live_ranges}
@@ -0,0 +1,172 @@
+"""
+Byte-bounded LRU cache of parsed PDF pages.
+
+Highlight computation needs ``extract_words()`` of a price-list page, which
+costs hundreds of milliseconds in pdfplumber. Pages are cached as compact
+coordinate arrays plus text, keyed by ``(source_pdf, page, file mtime)``:
+replacing a file under ``data/pdfs`` changes its mtime, so the stale entry
+is dropped on the next lookup.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.page_index import PageIndex
+from app.utils.metrics import export_cache_stats
+
+try:  # optional dependency for reading words from the source PDFs
+    import pdfplumber  # type: ignore
+except Exception:  # pragma: no cover
+    pdfplumber = None  # type: ignore
+
+
+PDF_DIR = Path("data/pdfs")
+# rough allowance for the lookup tables of a PageIndex (no per-word dicts)
+_INDEX_BYTES_PER_WORD = 160
+
+
+class PageWords:
+    """Words of one page: parallel float32 arrays of x0/x1/top/bottom plus text."""
+
+    __slots__ = ("texts", "x0", "x1", "top", "bottom", "nbytes", "_index")
+
+    def __init__(self, words: List[Dict[str, Any]]) -> None:
+        self.texts: Tuple[str, ...] = tuple(str(w.get("text", "")) for w in words)
+        self.x0 = array("f", (float(w.get("x0", 0.0)) for w in words))
+        self.x1 = array("f", (float(w.get("x1", 0.0)) for w in words))
+        self.top = array("f", (float(w.get("top", 0.0)) for w in words))
+        self.bottom = array("f", (float(w.get("bottom", 0.0)) for w in words))
+        self._index: Optional[PageIndex] = None
+        self.nbytes = (
+            sum(sys.getsizeof(t) for t in self.texts)
+            + sys.getsizeof(self.texts)
+            + 4 * (len(words) * self.x0.itemsize + 64)
+            + len(words) * _INDEX_BYTES_PER_WORD
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def word(self, i: int) -> Dict[str, Any]:
+        return {
+            "text": self.texts[i],
+            "x0": self.x0[i],
+            "x1": self.x1[i],
+            "top": self.top[i],
+            "bottom": self.bottom[i],
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Word dicts shaped like pdfplumber's ``extract_words()`` output."""
+        for i in range(len(self.texts)):
+            yield self.word(i)
+
+    def index(self) -> PageIndex:
+        """Spatial index over these words, built on first use."""
+        if self._index is None:
+            self._index = PageIndex(self)
+        return self._index
+
+
+def _extract_words(path: Path, page: int) -> List[Dict[str, Any]]:
+    with pdfplumber.open(str(path)) as doc:
+        return doc.pages[max(0, int(page) - 1)].extract_words() or []
+
+
+class PageCache:
+    """Thread-safe LRU of ``PageWords`` bounded by approximate memory use."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        pdf_dir: Path = PDF_DIR,
+        extract: Optional[Callable[[Path, int], List[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self.pdf_dir = pdf_dir
+        self._extract = extract
+        self._data: "OrderedDict[Tuple[str, int], Tuple[int, PageWords]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, source_pdf: Optional[str], page: Optional[int]) -> Optional[PageWords]:
+        """Parsed words of ``source_pdf`` page ``page`` (1-based), or None if unavailable."""
+        if not source_pdf or not page:
+            return None
+        extract = self._extract or (_extract_words if pdfplumber is not None else None)
+        path = self.pdf_dir / source_pdf
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+        if extract is None:
+            return None
+        key = (source_pdf, int(page))
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                if item[0] == mtime:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                # file replaced since it was parsed
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+        try:
+            words = PageWords(extract(path, int(page)))
+        except Exception:
+            return None
+        self._put(key, mtime, words)
+        return words
+
+    def _remove(self, key: Tuple[str, int]) -> None:
+        _, old = self._data.pop(key)
+        self.bytes -= old.nbytes
+
+    def _put(self, key: Tuple[str, int], mtime: int, words: PageWords) -> None:
+        if words.nbytes > self.max_bytes:
+            return  # never cache a page larger than the whole budget
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (mtime, words)
+            self.bytes += words.nbytes
+            while self.bytes > self.max_bytes and self._data:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pages": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# module-level instance shared by the formatter fallback and the offline builder
+page_cache = PageCache(max_bytes=settings.PDF_PAGE_CACHE_MAX_BYTES)
+export_cache_stats("pdf_pages", page_cache.stats)
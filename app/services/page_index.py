@@ -0,0 +1,113 @@
+"""
+Spatial index over the words of one PDF page.
+
+Highlight resolution asks three questions of a page: where is the word
+equal to this code, which words sit on the row at height y, and which
+words carry this numeric value. ``PageIndex`` answers them with a dict
+lookup or a bisect over y-sorted word centres instead of scanning every
+word. It is built once per page (memoised on cached ``PageWords``, once
+per page in the extractors).
+"""
+
+from __future__ import annotations
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+
+SCALE = 300.0 / 72.0  # PDF points -> 300 DPI screenshot pixels
+
+_NON_ASCII_CODE_RE = re.compile(r"[^A-Z0-9]")
+
+
+def alnum_key(s: str) -> str:
+    """Upper-cased alphanumerics (keeps CJK characters)."""
+    return "".join(ch for ch in (s or "").upper() if ch.isalnum())
+
+
+def ascii_code_key(s: str) -> str:
+    """Upper-cased ASCII letters and digits only (the extractors' code form)."""
+    return _NON_ASCII_CODE_RE.sub("", (s or "").upper())
+
+
+def parse_number(s: str) -> Optional[float]:
+    try:
+        t = "".join(ch for ch in s if (ch.isdigit() or ch == "."))
+        if not t:
+            return None
+        if t.endswith("."):
+            t = t[:-1]
+        return float(t)
+    except Exception:
+        return None
+
+
+def _value_key(v: float) -> float:
+    # prices have two decimals; six keeps the old 1e-6 equality semantics
+    return round(v, 6)
+
+
+def word_box(w: Dict[str, Any], page: int) -> Dict[str, int]:
+    """Word box in screenshot pixel space."""
+    x0, y0, x1, y1 = w["x0"], w["top"], w["x1"], w["bottom"]
+    return {
+        "x": int(x0 * SCALE),
+        "y": int(y0 * SCALE),
+        "w": int((x1 - x0) * SCALE),
+        "h": int((y1 - y0) * SCALE),
+        "page": int(page),
+    }
+
+
+class PageIndex:
+    """Read-only lookups over a page's words; results keep page order.
+
+    ``words`` is a list of word dicts (pdfplumber's ``extract_words()``) or a
+    cached ``PageWords``, whose coordinate arrays are read directly: word
+    dicts are only built for the words a lookup returns.
+    """
+
+    def __init__(self, words: Iterable[Dict[str, Any]], normalize: Callable[[str], str] = alnum_key) -> None:
+        if hasattr(words, "texts"):  # PageWords: parallel arrays
+            texts: Sequence[str] = words.texts
+            tops: Sequence[float] = words.top
+            bottoms: Sequence[float] = words.bottom
+            self._word: Callable[[int], Dict[str, Any]] = words.word
+        else:
+            dicts = words if isinstance(words, list) else list(words)
+            texts = [w.get("text", "") for w in dicts]
+            tops = [w.get("top", 0.0) for w in dicts]
+            bottoms = [w.get("bottom", 0.0) for w in dicts]
+            self._word = dicts.__getitem__
+        self._len = len(texts)
+        self._by_text: Dict[str, int] = {}
+        self._by_value: Dict[float, List[int]] = {}
+        for i, text in enumerate(texts):
+            self._by_text.setdefault(normalize(text), i)
+            val = parse_number(text)
+            if val is not None:
+                self._by_value.setdefault(_value_key(val), []).append(i)
+        order = sorted(range(self._len), key=lambda i: (tops[i] + bottoms[i]) / 2.0)
+        # y-sorted word centres and the word index of each
+        self._cy = array("d", ((tops[i] + bottoms[i]) / 2.0 for i in order))
+        self._cy_idx = array("l", order)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def find_text(self, key: str) -> Optional[Dict[str, Any]]:
+        """First word (page order) whose normalized text equals ``key``."""
+        i = self._by_text.get(key)
+        return None if i is None else self._word(i)
+
+    def row(self, y: float, tolerance: float) -> List[Dict[str, Any]]:
+        """Words whose vertical centre lies within ``tolerance`` of ``y`` (PDF points)."""
+        lo = bisect_left(self._cy, y - tolerance)
+        hi = bisect_right(self._cy, y + tolerance)
+        return [self._word(i) for i in sorted(self._cy_idx[lo:hi])]
+
+    def with_value(self, value: float) -> List[Dict[str, Any]]:
+        """Numeric words equal to ``value``."""
+        return [self._word(i) for i in self._by_value.get(_value_key(value), ())]
@@ -0,0 +1,139 @@
+"""
+In-process price engine for wide-search queries.
+
+For each requested (tier, color) the effective price of every product (the
+same fallback as the ``pick_price()`` SQL function) is resolved once from
+the catalog snapshot into a sorted NumPy array, overall and per category.
+Top-N, comparison and range queries are then a ``searchsorted`` plus a
+slice. The matrix is a derived structure of the snapshot, so it is
+rebuilt whenever the catalog version changes.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.services.catalog import CatalogSnapshot, ProductRecord, get_catalog
+
+try:  # optional dependency for the in-memory wide-search backend
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None  # type: ignore
+
+
+# pick_price(): third choice is the preferred color in this tier order
+_FALLBACK_TIERS = ("B级", "A级", "D级")
+
+
+def _other_color(color_type: str) -> str:
+    return "定制色" if color_type == "标准色" else "标准色"
+
+
+def effective_price(catalog: CatalogSnapshot, product_id: int, tier: str, color_type: str) -> Optional[float]:
+    """Python mirror of ``pick_price(pid, tier, color)`` over the snapshot's latest prices."""
+    pr = catalog.price(product_id, tier, color_type) or catalog.price(product_id, tier, _other_color(color_type))
+    if pr is None:
+        for t in _FALLBACK_TIERS:
+            pr = catalog.price(product_id, t, color_type)
+            if pr is not None:
+                break
+    return None if pr is None else pr.price
+
+
+class _Column:
+    """Positive prices ascending, with the catalog positions of their products."""
+
+    __slots__ = ("prices", "positions")
+
+    def __init__(self, prices, positions) -> None:
+        self.prices = prices
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+class PriceMatrix:
+    """Sorted effective-price columns per (tier, color[, category]), built on first use."""
+
+    def __init__(self, catalog: CatalogSnapshot) -> None:
+        if np is None:
+            raise RuntimeError("numpy is required for the in-memory wide-search backend")
+        self.catalog = catalog
+        self._columns: Dict[Tuple[str, str], Dict[Optional[str], _Column]] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, tier: str, color_type: str) -> Dict[Optional[str], _Column]:
+        products = self.catalog.products
+        prices = np.full(len(products), np.nan)
+        for i, p in enumerate(products):
+            v = effective_price(self.catalog, p.product_id, tier, color_type)
+            if v is not None:
+                prices[i] = v
+        positions = np.flatnonzero(prices > 0)  # NaN compares False
+        # stable: equal prices keep catalog (product_id) order
+        positions = positions[np.argsort(prices[positions], kind="stable")]
+        columns: Dict[Optional[str], _Column] = {None: _Column(prices[positions], positions)}
+        categories = np.array([p.category or "" for p in products], dtype=object)
+        for cat in set(categories[positions]):
+            sel = positions[categories[positions] == cat]
+            columns[cat] = _Column(prices[sel], sel)
+        return columns
+
+    def column(self, tier: str, color_type: str, category: Optional[str] = None) -> Optional[_Column]:
+        key = (tier, color_type)
+        columns = self._columns.get(key)
+        if columns is None:
+            with self._lock:
+                columns = self._columns.get(key)
+                if columns is None:
+                    columns = self._columns[key] = self._build(tier, color_type)
+        return columns.get(category or None)
+
+    def _rows(self, col: Optional[_Column], idx) -> List[Tuple[ProductRecord, float]]:
+        products = self.catalog.products
+        return [(products[col.positions[i]], float(col.prices[i])) for i in idx]
+
+    def top(
+        self, tier: str, color_type: str, category: Optional[str], limit: int, descending: bool
+    ) -> List[Tuple[ProductRecord, float]]:
+        """Cheapest (or most expensive) ``limit`` products."""
+        col = self.column(tier, color_type, category)
+        if col is None:
+            return []
+        n = len(col)
+        idx = range(n - 1, max(-1, n - 1 - limit), -1) if descending else range(min(limit, n))
+        return self._rows(col, idx)
+
+    def compare(
+        self, tier: str, color_type: str, category: Optional[str], ref_price: float, greater: bool, limit: int
+    ) -> List[Tuple[ProductRecord, float]]:
+        """Products priced above ``ref_price`` (most expensive first) or below it (cheapest first)."""
+        col = self.column(tier, color_type, category)
+        if col is None:
+            return []
+        if greater:
+            lo = int(np.searchsorted(col.prices, ref_price, side="right"))
+            n = len(col)
+            return self._rows(col, range(n - 1, max(lo, n - limit) - 1, -1))
+        hi = int(np.searchsorted(col.prices, ref_price, side="left"))
+        return self._rows(col, range(min(hi, limit)))
+
+    def between(
+        self, tier: str, color_type: str, category: Optional[str], min_price: float, max_price: float, limit: int
+    ) -> List[Tuple[ProductRecord, float]]:
+        """Products priced within ``[min_price, max_price]``, cheapest first."""
+        col = self.column(tier, color_type, category)
+        if col is None:
+            return []
+        lo = int(np.searchsorted(col.prices, min_price, side="left"))
+        hi = int(np.searchsorted(col.prices, max_price, side="right"))
+        return self._rows(col, range(lo, min(hi, lo + limit)))
+
+
+def get_price_matrix(db: Session) -> PriceMatrix:
+    """Price matrix of the current catalog snapshot."""
+    return get_catalog(db).derived("price_matrix", PriceMatrix)
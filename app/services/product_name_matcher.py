@@ -7,13 +7,13 @@ rather than product codes (GT10S), with optional material filtering.
 
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import re
 
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 from sqlalchemy.orm import Session
 
-from app.models import Product
+from app.services.catalog import CatalogSnapshot, ProductRecord, get_catalog
 from app.utils.inference import infer_material_from_query
 
 
@@ -62,23 +62,118 @@ def normalize_chinese_text(text: str) -> str:
     return text
 
 
+# Below this threshold a name sharing only spaces with the description could
+# in principle score, so candidates are not pruned.
+_PRUNE_MIN_THRESHOLD = 0.70
+
+
+class DescriptionIndex:
+    """
+    Description search index built once per catalog version.
+
+    Product names are normalized up front and deduplicated (S/P variants
+    usually share the same ``product_name_cn``), so each distinct name is
+    scored once and fanned out to every product that carries it. A
+    character inverted index over names prunes the candidates to names
+    sharing at least one (non-space) character with the description: both
+    scorers need a common character to reach the threshold, so the results
+    equal a full scan.
+    """
+
+    def __init__(self, catalog: CatalogSnapshot) -> None:
+        self.names: List[str] = []
+        self.products: List[List[ProductRecord]] = []
+        position: Dict[str, int] = {}
+        by_material: Dict[str, Dict[int, None]] = {}
+        self._postings: Dict[str, set[int]] = {}
+        for product in catalog.products:
+            if not product.product_name_cn:
+                continue
+            name = normalize_chinese_text(product.product_name_cn)
+            if not name:
+                continue
+            i = position.get(name)
+            if i is None:
+                i = position[name] = len(self.names)
+                self.names.append(name)
+                self.products.append([])
+            self.products[i].append(product)
+            # dict keys keep first-seen order and dedupe shared names
+            by_material.setdefault((product.material_type or "").upper(), {})[i] = None
+            for ch in set(name) - {" "}:
+                self._postings.setdefault(ch, set()).add(i)
+        self._by_material: Dict[str, set[int]] = {m: set(ids) for m, ids in by_material.items()}
+
+    def candidates(self, normalized_desc: str, material: Optional[str] = None) -> List[int]:
+        """Name positions sharing at least one character with the description."""
+        found: set[int] = set()
+        for ch in set(normalized_desc) - {" "}:
+            found |= self._postings.get(ch, set())
+        if material:
+            found &= self._by_material.get(material.upper(), set())
+        return sorted(found)
+
+    def search(
+        self,
+        normalized_desc: str,
+        material: Optional[str] = None,
+        threshold: float = 0.70,
+    ) -> List[Tuple[ProductRecord, float]]:
+        if threshold >= _PRUNE_MIN_THRESHOLD:
+            positions = self.candidates(normalized_desc, material)
+        else:
+            positions = list(range(len(self.names)))
+        if not positions:
+            return []
+        names = [self.names[i] for i in positions]
+        cutoff = threshold * 100.0 - 1e-6  # float slack; re-checked below
+        best: Dict[int, float] = {}
+        # token_set_ratio handles word order, partial_ratio handles substrings;
+        # the most generous of the two wins
+        for scorer in (fuzz.token_set_ratio, fuzz.partial_ratio):
+            for _, score, pos in process.extract(
+                normalized_desc, names, scorer=scorer, score_cutoff=cutoff, limit=None
+            ):
+                i = positions[pos]
+                if score > best.get(i, -1.0):
+                    best[i] = score
+
+        mat = material.upper() if material else None
+        results: List[Tuple[ProductRecord, float]] = []
+        for i, score in best.items():
+            s = score / 100.0
+            if s < threshold:
+                continue
+            for product in self.products[i]:
+                if mat and (product.material_type or "").upper() != mat:
+                    continue
+                results.append((product, s))
+
+        # Sort by confidence score (highest first), catalog order within ties
+        results.sort(key=lambda x: (-x[1], x[0].product_id))
+        return results
+
+
 def search_by_description(
     db: Session,
     description: str,
     material: Optional[str] = None,
     threshold: float = 0.70
-) -> List[Tuple[Product, float]]:
+) -> List[Tuple[ProductRecord, float]]:
     """
     Search products by Chinese description with optional material filtering.
 
+    Scores against the catalog snapshot's ``DescriptionIndex`` rather than
+    loading products from the database on every call.
+
     Args:
-        db: Database session
+        db: Database session (used to resolve the catalog snapshot)
         description: Chinese product description (e.g., "儿童分体简易")
         material: Optional material filter ("SILICONE", "PVC", "TPE")
         threshold: Minimum fuzzy match score (0.0 - 1.0)
 
     Returns:
-        List of (Product, confidence_score) tuples, sorted by score (highest first)
+        List of (product, confidence_score) tuples, sorted by score (highest first)
 
     Example:
         >>> matches = search_by_description(db, "儿童分体简易", "SILICONE", 0.70)
@@ -90,48 +185,15 @@ def search_by_description(
     if not normalized_desc:
         return []
 
-    # Build base query
-    query = db.query(Product)
-
-    # Filter by material if provided
-    if material:
-        query = query.filter(Product.material_type == material.upper())
-
-    # Get all products to fuzzy match
-    all_products = query.all()
-
-    results = []
-    for product in all_products:
-        if not product.product_name_cn:
-            continue
-
-        # Normalize product name from database
-        normalized_product_name = normalize_chinese_text(product.product_name_cn)
-
-        # Calculate fuzzy match scores using multiple algorithms
-        # Use token_set_ratio for better partial matching (handles word order)
-        score_token = fuzz.token_set_ratio(normalized_desc, normalized_product_name) / 100.0
-
-        # Use partial_ratio for substring matching
-        score_partial = fuzz.partial_ratio(normalized_desc, normalized_product_name) / 100.0
-
-        # Take the maximum score (most generous match)
-        score = max(score_token, score_partial)
-
-        if score >= threshold:
-            results.append((product, score))
-
-    # Sort by confidence score (highest first)
-    results.sort(key=lambda x: x[1], reverse=True)
-
-    return results
+    index = get_catalog(db).derived("description_index", DescriptionIndex)
+    return index.search(normalized_desc, material, threshold)
 
 
 def match_product_by_description(
     db: Session,
     query: str,
     threshold: float = 0.70
-) -> List[Tuple[Product, float]]:
+) -> List[Tuple[ProductRecord, float]]:
     """
     High-level function: extract description and material from query,
     then search for matching products.
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+import logging
 import time
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.models import Product, PricingTier
-from app.services.deepseek import DeepSeekClient
+from app.services.catalog import PriceRecord, get_catalog, get_catalog_version
+from app.services.deepseek import DeepSeekClient, heuristic_extract_scored
 from app.services.fuzzy_match import (
     normalize_product_code,
     exact_match,
     base_code_match,
     fuzzy_string_match,
 )
+from app.services.response_cache import get_response_cache
 from app.services.response_formatter import (
     format_success_response,
 )
@@ -23,19 +27,182 @@ from app.services.confirmation import (
     save_confirmation,
     needs_confirmation,
 )
+from app.utils.deadline import Deadline
 from app.utils.inference import infer_material_from_query
+from app.utils.timing import stage
 
 
-def process_query(query: str, db: Session) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Resolution:
+    """Outcome of resolving one normalized product code against the catalog."""
+
+    code: str
+    matches: List[Any] = field(default_factory=list)
+    confidence: float = 0.0
+    selected: Optional[Any] = None
+    need_confirm: bool = False
+
+    @property
+    def found(self) -> bool:
+        return self.selected is not None or self.need_confirm
+
+
+def _resolve_code(db: Session, norm: str) -> _Resolution:
+    """Exact -> base code -> fuzzy resolution of ``norm`` (material filtering happens later)."""
+    # level 1
+    matches, conf = exact_match(db, norm)
+    # If exact match is a base code without suffix and there are variants, require confirmation
+    if matches and len(matches) == 1:
+        m = matches[0]
+        if not (m.product_code.endswith("S") or m.product_code.endswith("P")):
+            base_variants, _ = base_code_match(db, norm)
+            # filter variants that are not the base code itself
+            variants = [p for p in base_variants if p.product_code != m.product_code]
+            if variants:
+                matches = variants
+                conf = 0.95
+    if not matches:
+        # level 2: base code
+        matches, conf = base_code_match(db, norm)
+    if len(matches) == 1 and conf == 1.0:
+        return _Resolution(norm, matches, conf, selected=matches[0])
+    if needs_confirmation(len(matches), conf):
+        return _Resolution(norm, matches, conf, need_confirm=True)
+    # fuzzy
+    fuzzy = fuzzy_string_match(db, norm)
+    if fuzzy:
+        return _Resolution(norm, [p for p, _ in fuzzy], fuzzy[0][1], need_confirm=True)
+    return _Resolution(norm)
+
+
+# LLM calls run here while the request thread resolves the heuristic guess
+_llm_executor = ThreadPoolExecutor(
+    max_workers=settings.DEEPSEEK_MAX_CONNECTIONS, thread_name_prefix="deepseek"
+)
+
+
+def _extract_speculatively(
+    ds: DeepSeekClient, query: str, db: Session, deadline: Optional[Deadline] = None
+) -> Tuple[Dict[str, Any], Optional[_Resolution]]:
+    """Extract params, resolving the heuristic's code while the LLM is in flight.
+
+    Returns the params and, when speculation ran, the resolution of the
+    heuristic code so the caller can reuse it if the LLM agrees.
+    """
+    params = ds.fast_path(query)
+    if params is not None:
+        return params, None
+    if not (settings.SPECULATIVE_RESOLUTION and ds.api_key):
+        # no network round trip to hide
+        return ds.extract_query_params(query, deadline=deadline), None
+    future = _llm_executor.submit(ds.extract_query_params, query, deadline=deadline)
+    guess, _ = heuristic_extract_scored(query)
+    speculative: Optional[_Resolution] = None
+    try:
+        if guess.get("product_code"):
+            speculative = _resolve_code(db, normalize_product_code(guess["product_code"]))
+    finally:
+        try:
+            params = future.result()
+        except Exception as e:  # extract_query_params already falls back internally
+            logger.warning("Speculative LLM extraction failed: %s", e)
+            ds.last_path = DeepSeekClient.PATH_FALLBACK
+            params = guess
+    return params, speculative
+
+
+def process_query(
+    query: str,
+    db: Session,
+    params: Optional[Dict[str, Any]] = None,
+    deadline: Optional[Deadline] = None,
+    use_cache: bool = True,
+    extraction_path: Optional[str] = None,
+    cache_missed: bool = False,
+) -> Dict[str, Any]:
+    """Answer a price query.
+
+    ``params`` may carry parameters already extracted by the caller (e.g. the
+    WeWork route awaits the async DeepSeek client), with the
+    ``extraction_path`` that produced them (``DeepSeekClient.last_path``;
+    a heuristic fallback is cached only briefly); otherwise they are
+    extracted here. ``deadline`` bounds the LLM call, wide-search SQL and
+    highlight computation. Answers are served from the response cache of
+    the current catalog version when possible (``use_cache=False`` always
+    computes the answer, e.g. to profile it; ``cache_missed=True`` means the
+    caller already missed in ``cached_answer`` and only the answer is
+    stored). Stages are timed when the
+    caller started stage timings (``app.utils.timing``).
+    """
+    t0 = time.time()
+    cache = None
+    if use_cache and settings.RESPONSE_CACHE_MAX_ENTRIES > 0:
+        with stage("cache"):
+            # read every time: cached answers must not outlive their catalog version
+            version = get_catalog_version(db)
+            cache = get_response_cache(db, version)
+            cached = cache.get(query, version) if cache is not None and not cache_missed else None
+        if cached is not None:
+            cached["execution_time_ms"] = int((time.time() - t0) * 1000)
+            cached["cached"] = True
+            return cached
+    result = _answer_query(query, db, params, deadline, t0, extraction_path)
+    if cache is not None:
+        with stage("cache"):
+            # the seeder may have bumped the version while this was computed
+            if get_catalog_version(db) == version:
+                cache.put(query, result, version)
+    return result
+
+
+def cached_answer(query: str, db: Session) -> Optional[Dict[str, Any]]:
+    """The cached answer to ``query`` at the current catalog version, or None.
+
+    Lets a caller skip its own work for a repeated query (WeWork awaits the
+    LLM before ``process_query``); on a miss it calls ``process_query`` with
+    ``cache_missed=True``.
+    """
+    if settings.RESPONSE_CACHE_MAX_ENTRIES <= 0:
+        return None
     t0 = time.time()
+    with stage("cache"):
+        version = get_catalog_version(db)
+        cache = get_response_cache(db, version)
+        cached = cache.get(query, version) if cache is not None else None
+    if cached is not None:
+        cached["execution_time_ms"] = int((time.time() - t0) * 1000)
+        cached["cached"] = True
+    return cached
+
+
+def _answer_query(
+    query: str,
+    db: Session,
+    params: Optional[Dict[str, Any]],
+    deadline: Optional[Deadline],
+    t0: float,
+    extraction_path: Optional[str] = None,
+) -> Dict[str, Any]:
     # 1) Wide-search detection (more expensive/cheaper/top-N)
-    w = detect_wide_query(query)
+    with stage("detect"):
+        w = detect_wide_query(query)
     if w is not None:
-        result = run_wide_search(db, w)
+        result = run_wide_search(db, w, deadline=deadline)
         result["execution_time_ms"] = int((time.time() - t0) * 1000)
         return result
-    ds = DeepSeekClient(settings.DEEPSEEK_API_KEY)
-    params = ds.extract_query_params(query)
+    # which extraction path answered (heuristic / cache / llm / heuristic_fallback)
+    extraction_path = extraction_path or "provided"
+    speculative: Optional[_Resolution] = None
+    if params is None:
+        ds = DeepSeekClient(settings.DEEPSEEK_API_KEY)
+        with stage("extract"):
+            params, speculative = _extract_speculatively(ds, query, db, deadline)
+        extraction_path = ds.last_path
+    else:
+        params = dict(params)
     if not params.get("material"):
         inferred = infer_material_from_query(query)
         if inferred:
@@ -49,47 +216,30 @@ def process_query(query: str, db: Session) -> Dict[str, Any]:
             "error_type": "missing_product_code",
             "message": "未检测到产品代码，请提供产品代码再试。",
             "execution_time_ms": ms,
+            "extraction_path": extraction_path,
         }
 
     norm = normalize_product_code(code)
-    # level 1
-    matches, conf = exact_match(db, norm)
-    # If exact match is a base code without suffix and there are variants, require confirmation
-    if matches and len(matches) == 1:
-        m = matches[0]
-        if not (m.product_code.endswith("S") or m.product_code.endswith("P")):
-            base_variants, _ = base_code_match(db, norm)
-            # filter variants that are not the base code itself
-            variants = [p for p in base_variants if p.product_code != m.product_code]
-            if variants:
-                matches = variants
-                conf = 0.95
-    if not matches:
-        # level 2: base code
-        matches, conf = base_code_match(db, norm)
-    need_confirm = False
-    selected = None
-    confidence = conf
-    if len(matches) == 1 and conf == 1.0:
-        selected = matches[0]
-    elif needs_confirmation(len(matches), conf):
-        need_confirm = True
+    if speculative is not None and speculative.code == norm:
+        # the LLM agreed with the heuristic: reuse the resolution done meanwhile
+        resolution = speculative
     else:
-        # fuzzy
-        fuzzy = fuzzy_string_match(db, norm)
-        if fuzzy:
-            need_confirm = True
-            matches = [p for p, _ in fuzzy]
-            confidence = fuzzy[0][1]
-        else:
-            ms = int((time.time() - t0) * 1000)
-            return {
-                "status": "error",
-                "error_type": "product_not_found",
-                "message": "未找到匹配的产品。请检查产品代码是否正确。",
-                "suggestions": [],
-                "execution_time_ms": ms,
-            }
+        with stage("resolve"):
+            resolution = _resolve_code(db, norm)
+    matches = resolution.matches
+    confidence = resolution.confidence
+    selected = resolution.selected
+    need_confirm = resolution.need_confirm
+    if not resolution.found:
+        ms = int((time.time() - t0) * 1000)
+        return {
+            "status": "error",
+            "error_type": "product_not_found",
+            "message": "未找到匹配的产品。请检查产品代码是否正确。",
+            "suggestions": [],
+            "execution_time_ms": ms,
+            "extraction_path": extraction_path,
+        }
 
     if need_confirm:
         # filter by material if inferred
@@ -111,11 +261,13 @@ def process_query(query: str, db: Session) -> Dict[str, Any]:
                 }
             )
         conf_id = generate_confirmation_id()
+        # the query rides along so the confirmation can be logged under it
+        saved = {**params, "query": query}
         # persist confirmation options; fall back to in-memory if DB commit fails
         try:
-            save_confirmation(conf_id, opts[:5], params, db)
+            save_confirmation(conf_id, opts[:5], saved, db)
         except Exception:
-            save_confirmation(conf_id, opts[:5], params, None)
+            save_confirmation(conf_id, opts[:5], saved, None)
         ms = int((time.time() - t0) * 1000)
         return {
             "status": "needs_confirmation",
@@ -123,44 +275,42 @@ def process_query(query: str, db: Session) -> Dict[str, Any]:
             "options": opts[:5],
             "confirmation_id": conf_id,
             "execution_time_ms": ms,
+            "extraction_path": extraction_path,
         }
 
-    # Direct match
+    # Direct match (prices come from the in-memory catalog snapshot)
     product = selected
-    tier = params.get("tier")
-    color = params.get("color_type") or "标准色"
-    pricing: PricingTier | None = None
-    all_prices: list[PricingTier] | None = None
-    # resolve pricing with sensible defaults and fallback
-    if tier:
-        try_colors = [color] if color else ["标准色", "定制色"]
-        if "标准" not in "".join(try_colors) and "定制" not in "".join(try_colors):
-            try_colors = ["标准色", "定制色"]
-        for c in try_colors:
-            rec = (
-                db.query(PricingTier)
-                .filter(
-                    PricingTier.product_id == product.product_id,
-                    PricingTier.tier == tier,
-                    PricingTier.color_type == c,
-                )
-                .order_by(PricingTier.effective_date.desc())
-                .first()
-            )
-            if rec is not None:
-                pricing = rec
-                color = c
-                break
-    else:
-        # Ambiguous query (no tier provided): return full price list
-        all_prices = (
-            db.query(PricingTier)
-            .filter(PricingTier.product_id == product.product_id)
-            .order_by(PricingTier.tier, PricingTier.color_type)
-            .all()
-        )
+    with stage("price"):
+        catalog = get_catalog(db)
+        tier = params.get("tier")
+        color = params.get("color_type") or "标准色"
+        pricing: PriceRecord | None = None
+        all_prices: list[PriceRecord] | None = None
+        # resolve pricing with sensible defaults and fallback
+        if tier:
+            try_colors = [color] if color else ["标准色", "定制色"]
+            if "标准" not in "".join(try_colors) and "定制" not in "".join(try_colors):
+                try_colors = ["标准色", "定制色"]
+            for c in try_colors:
+                rec = catalog.price(product.product_id, tier, c)
+                if rec is not None:
+                    pricing = rec
+                    color = c
+                    break
+        else:
+            # Ambiguous query (no tier provided): return full price list
+            all_prices = catalog.prices_for(product.product_id)
 
-    md_text, md_markdown, data = format_success_response(product, pricing, product.screenshot_url, all_prices)
+    # precomputed screenshot boxes (code-only row when no single price was asked for)
+    highlight = (
+        catalog.highlight(product.product_id, pricing.tier, pricing.color_type)
+        if pricing is not None
+        else catalog.highlight(product.product_id)
+    )
+    with stage("format"):
+        md_text, md_markdown, data = format_success_response(
+            product, pricing, product.screenshot_url, all_prices, deadline=deadline, highlight=highlight
+        )
     ms = int((time.time() - t0) * 1000)
     return {
         "status": "success",
@@ -170,4 +320,5 @@ def process_query(query: str, db: Session) -> Dict[str, Any]:
         "data": data,
         "confidence": confidence,
         "execution_time_ms": ms,
+        "extraction_path": extraction_path,
     }
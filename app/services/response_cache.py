@@ -0,0 +1,156 @@
+"""
+Cache of whole ``process_query`` responses.
+
+Answers only change when the catalog does, so responses are cached under
+the normalized query text. Each cache belongs to one catalog snapshot
+(it is a derived structure) and every entry records the catalog version
+read before its answer was computed. Callers read the current version
+(one primary-key lookup) before each ``get`` and again before ``put``, so
+an entry from an older catalog is never served, and an answer computed
+while the seeder bumped the version is never stored.
+
+Deterministic misses ("product not found" etc.) are kept only for
+``RESPONSE_CACHE_NEGATIVE_TTL_SECONDS`` so newly seeded products show up
+quickly. Confirmation prompts (single-use ids) and timeouts are never
+cached.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.catalog import CatalogSnapshot, get_catalog
+from app.services.extraction_cache import normalize_query_text
+from app.utils.lru_cache import LRUCache
+from app.utils.metrics import export_cache_stats
+
+
+# errors that depend only on the query and the catalog
+NEGATIVE_ERROR_TYPES = frozenset(
+    {
+        "missing_product_code",
+        "product_not_found",
+        "reference_not_found",
+        "no_results",
+        "no_pricing_data",
+        "unsupported_wide_query",
+    }
+)
+
+
+class _Entry:
+    __slots__ = ("response", "version", "hits")
+
+    def __init__(self, response: Dict[str, Any], version: int) -> None:
+        self.response = response
+        self.version = version
+        self.hits = 0
+
+
+class _Counters:
+    """Totals across catalog versions (each version has its own cache)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.negative_stores = 0
+
+    def totals(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "stores": self.stores,
+                "negative_stores": self.negative_stores,
+            }
+
+
+_counters = _Counters()
+export_cache_stats("responses", _counters.totals)
+
+
+def ttl_for(response: Dict[str, Any]) -> Optional[float]:
+    """TTL for caching ``response``, or None when it must not be cached."""
+    status = response.get("status")
+    if status == "success":
+        if response.get("extraction_path") == "heuristic_fallback":
+            # LLM unavailable: the answer may improve once it is back
+            return settings.RESPONSE_CACHE_NEGATIVE_TTL_SECONDS
+        return settings.RESPONSE_CACHE_TTL_SECONDS
+    if status == "error" and response.get("error_type") in NEGATIVE_ERROR_TYPES:
+        return settings.RESPONSE_CACHE_NEGATIVE_TTL_SECONDS
+    return None
+
+
+class ResponseCache:
+    """LRU of responses for one catalog snapshot, with per-entry hit counts."""
+
+    def __init__(self, catalog: CatalogSnapshot) -> None:
+        self.version = catalog.version
+        self._memory: LRUCache[_Entry] = LRUCache(
+            maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        )
+        self._lock = threading.Lock()
+
+    def get(self, query: str, version: int) -> Optional[Dict[str, Any]]:
+        """Copy of the response cached for ``query`` at catalog ``version`` (callers may mutate it)."""
+        entry = self._memory.get(normalize_query_text(query)) if version == self.version else None
+        if entry is not None and entry.version != version:
+            entry = None
+        with _counters.lock:
+            if entry is None:
+                _counters.misses += 1
+                return None
+            _counters.hits += 1
+        with self._lock:
+            entry.hits += 1
+        return copy.deepcopy(entry.response)
+
+    def put(self, query: str, response: Dict[str, Any], version: int) -> bool:
+        """Store ``response``, computed from catalog ``version`` (still current per the caller)."""
+        key = normalize_query_text(query)
+        ttl = ttl_for(response)
+        if not key or ttl is None or ttl <= 0 or version != self.version:
+            return False
+        self._memory.set(key, _Entry(copy.deepcopy(response), version), ttl_seconds=ttl)
+        with _counters.lock:
+            _counters.stores += 1
+            if response.get("status") != "success":
+                _counters.negative_stores += 1
+        return True
+
+    def top_entries(self, n: int = 10) -> list[Dict[str, Any]]:
+        items = self._memory.items()
+        items.sort(key=lambda kv: kv[1].hits, reverse=True)
+        return [
+            {"query": k, "hits": e.hits, "status": e.response.get("status")} for k, e in items[:n]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"catalog_version": self.version, **self._memory.stats(), "top": self.top_entries()}
+
+
+def get_response_cache(db: Session, version: Optional[int] = None) -> Optional[ResponseCache]:
+    """Response cache of the current catalog snapshot (None when disabled).
+
+    With ``version`` (just read by the caller) the snapshot is reloaded
+    first if it is older, regardless of ``CATALOG_REFRESH_SECONDS``.
+    """
+    if settings.RESPONSE_CACHE_MAX_ENTRIES <= 0:
+        return None
+    return get_catalog(db, version).derived("response_cache", ResponseCache)
+
+
+def response_cache_stats(db: Session) -> Dict[str, Any]:
+    cache = get_response_cache(db)
+    return {**_counters.totals(), "current": cache.stats() if cache is not None else None}
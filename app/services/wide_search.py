@@ -6,10 +6,16 @@ import logging
 
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
 
+from app.core.config import settings
 from app.models import Product
 from app.services.fuzzy_match import normalize_product_code
+from app.services.price_matrix import PriceMatrix, effective_price, get_price_matrix
 from app.services.product_name_matcher import match_product_by_description
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
@@ -101,10 +107,136 @@ def detect_wide_query(query: str) -> Optional[WideQueryParams]:
     return None
 
 
-def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
+def refresh_effective_prices(db: Session) -> bool:
+    """Refresh the ``effective_prices`` materialized view after pricing changes.
+
+    Runs in the caller's transaction; a no-op (False) on databases without it.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY effective_prices"))
+    return True
+
+
+def pick_prices(conn: Connection, product_ids: List[int], tier: str, color_type: str) -> Dict[int, float]:
+    """Effective prices of many products in one round trip ({product_id: price}).
+
+    On Postgres this is a single ``ANY(:ids)`` read of ``effective_prices``,
+    the same source the ranking queries use; elsewhere (SQLite in tests)
+    ``pick_price()`` is called per id. Products without a price are absent.
+    """
+    ids = list(dict.fromkeys(int(i) for i in product_ids))
+    if not ids:
+        return {}
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(
+            text(
+                "SELECT product_id, price FROM effective_prices "
+                "WHERE product_id = ANY(:ids) AND tier = :tier AND color_type = :color"
+            ),
+            {"ids": ids, "tier": tier, "color": color_type},
+        ).fetchall()
+    else:
+        rows = [
+            (pid, conn.execute(
+                text("SELECT pick_price(:pid, :tier, :color) AS rp"),
+                {"pid": pid, "tier": tier, "color": color_type},
+            ).scalar())
+            for pid in ids
+        ]
+    return {int(pid): float(price) for pid, price in rows if price is not None}
+
+
+def _apply_deadline(conn: Connection, deadline: Optional[Deadline]) -> None:
+    """Fail fast once the budget is spent; on Postgres bound each statement by what is left."""
+    if deadline is None:
+        return
+    deadline.check()
+    remaining = deadline.remaining()
+    if remaining is not None and conn.dialect.name == "postgresql":
+        # SET LOCAL is scoped to the connection's transaction, rolled back on close
+        conn.execute(text(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}"))
+
+
+def run_wide_search(db: Session, params: WideQueryParams, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Run a wide (comparison/top-N/range) search within ``deadline``."""
+    try:
+        return _run_wide_search(db, params, deadline)
+    except DeadlineExceeded:
+        return _timeout_error()
+    except DBAPIError as e:
+        if deadline is not None and (deadline.expired() or "statement timeout" in str(e)):
+            return _timeout_error()
+        raise
+
+
+def _timeout_error() -> Dict[str, Any]:
+    return {"status": "error", "error_type": "timeout", "message": "查询超时，请稍后重试。"}
+
+
+def _price_matrix(db: Session) -> Optional[PriceMatrix]:
+    """In-memory price engine when ``WIDE_SEARCH_BACKEND`` is "memory", else None (SQL)."""
+    if settings.WIDE_SEARCH_BACKEND != "memory":
+        return None
+    try:
+        return get_price_matrix(db)
+    except RuntimeError as e:
+        logger.warning(f"In-memory wide search unavailable, using SQL: {e}")
+        return None
+
+
+def _find_reference(db: Session, matrix: Optional[PriceMatrix], ref_code: str) -> Optional[Any]:
+    """Reference product by exact code, then by its S/P/base variants."""
+    base = re.sub(r"[SP]$", "", ref_code)
+    if matrix is not None:
+        catalog = matrix.catalog
+        for code in (ref_code, base + "S", base + "P", base):
+            ref = catalog.by_code(code)
+            if ref is not None:
+                return ref
+        return None
+    ref = db.query(Product).filter(Product.product_code == ref_code).first()
+    if not ref:
+        ref = (
+            db.query(Product)
+            .filter(Product.product_code.in_([base + "S", base + "P", base]))
+            .first()
+        )
+    return ref
+
+
+def _matrix_rows(
+    hits: List[Any], params: WideQueryParams, rp: Optional[float] = None, with_name: bool = False
+) -> List[Dict[str, Any]]:
+    """Rows shaped like the SQL backend's from ``PriceMatrix`` (product, price) hits."""
+    rows = []
+    for p, price in hits:
+        r: Dict[str, Any] = {
+            "product_code": p.product_code,
+            "category": p.category,
+            "material": p.material_type,
+            "screenshot_url": p.screenshot_url,
+        }
+        if with_name:
+            r["product_name_cn"] = p.product_name_cn
+        r["price"] = price
+        if rp is not None:
+            r["delta"] = price - rp
+        r["tier"] = params.tier
+        r["color_type"] = params.color
+        rows.append(r)
+    return rows
+
+
+def _run_wide_search(db: Session, params: WideQueryParams, deadline: Optional[Deadline]) -> Dict[str, Any]:
     title = "查询结果"
     bind = db.get_bind()
-    where_cat = " AND p.category = :cat" if params.category else ""
+    with stage("price_matrix"):
+        matrix = _price_matrix(db)
+    if matrix is not None and deadline is not None:
+        deadline.check()
+    # filter on the view's category so (tier, color, category, price) is usable as an index
+    where_cat = " AND x.category = :cat" if params.category else ""
 
     def _format(rows: List[Dict[str, Any]], extra: Dict[str, Any]) -> Dict[str, Any]:
         if not rows:
@@ -156,7 +288,8 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
         # Handle description-based queries (no product code)
         if params.description_query and not params.ref_code:
             # Find products matching the description
-            matches = match_product_by_description(db, params.description_query, threshold=0.70)
+            with stage("description_match"):
+                matches = match_product_by_description(db, params.description_query, threshold=0.70)
             if not matches:
                 logger.warning(f"Description-based match failed: {params.description_query}")
                 logger.debug("Attempted match with threshold=0.70, zero results")
@@ -170,17 +303,25 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
             params.ref_products = [prod for prod, score in matches]
 
             # Get prices for all reference products
+            ref_ids = [prod.product_id for prod in params.ref_products]
+            with stage("reference"):
+                if matrix is not None:
+                    prices = {}
+                    for pid in ref_ids:
+                        price = effective_price(matrix.catalog, pid, params.tier, params.color)
+                        if price is not None:
+                            prices[pid] = price
+                else:
+                    with bind.connect() as conn:
+                        _apply_deadline(conn, deadline)
+                        prices = pick_prices(conn, ref_ids, params.tier, params.color)
             ref_prices = []
             ref_info = []
-            with bind.connect() as conn:
-                for ref_prod in params.ref_products:
-                    rp = conn.execute(
-                        text("SELECT pick_price(:pid, :tier, :color) AS rp"),
-                        {"pid": ref_prod.product_id, "tier": params.tier, "color": params.color},
-                    ).scalar()
-                    if rp is not None:
-                        ref_prices.append(float(rp))
-                        ref_info.append({"code": ref_prod.product_code, "price": float(rp), "name": ref_prod.product_name_cn})
+            for ref_prod in params.ref_products:
+                rp = prices.get(ref_prod.product_id)
+                if rp is not None:
+                    ref_prices.append(rp)
+                    ref_info.append({"code": ref_prod.product_code, "price": rp, "name": ref_prod.product_name_cn})
 
             if not ref_prices:
                 codes = ", ".join([p.product_code for p in params.ref_products])
@@ -201,30 +342,36 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
                 SELECT p.product_code, p.category, p.material_type, p.screenshot_url, p.product_name_cn,
                        x.price, (x.price - :rp) AS delta
                 FROM products p
-                CROSS JOIN LATERAL (SELECT pick_price(p.product_id, :tier, :color) AS price) AS x
+                JOIN effective_prices x ON x.product_id = p.product_id AND x.tier = :tier AND x.color_type = :color
                 WHERE x.price IS NOT NULL{where_cat} AND x.price > 0 AND x.price {comp_op} :rp
                 ORDER BY (x.price - :rp) {order_dir}
                 LIMIT :limit
             """
-            conn = bind.connect()
-            try:
-                res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "rp": rp, "limit": params.limit, "cat": params.category})
-                rows = [
-                    {
-                        "product_code": r[0],
-                        "category": r[1],
-                        "material": r[2],
-                        "screenshot_url": r[3],
-                        "product_name_cn": r[4],
-                        "price": float(r[5]),
-                        "delta": float(r[6]),
-                        "tier": params.tier,
-                        "color_type": params.color,
-                    }
-                    for r in res.fetchall()
-                ]
-            finally:
-                conn.close()
+            with stage("wide_search"):
+                if matrix is not None:
+                    hits = matrix.compare(params.tier, params.color, params.category, rp, params.mode == "compare_gt", params.limit)
+                    rows = _matrix_rows(hits, params, rp=rp, with_name=True)
+                else:
+                    conn = bind.connect()
+                    try:
+                        _apply_deadline(conn, deadline)
+                        res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "rp": rp, "limit": params.limit, "cat": params.category})
+                        rows = [
+                            {
+                                "product_code": r[0],
+                                "category": r[1],
+                                "material": r[2],
+                                "screenshot_url": r[3],
+                                "product_name_cn": r[4],
+                                "price": float(r[5]),
+                                "delta": float(r[6]),
+                                "tier": params.tier,
+                                "color_type": params.color,
+                            }
+                            for r in res.fetchall()
+                        ]
+                    finally:
+                        conn.close()
 
             # Post-filter any zero/invalid prices defensively and log
             logger.warning(f"Found {len(rows)} products, filtering zero prices")
@@ -245,22 +392,17 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
         # Handle traditional code-based queries
         elif params.ref_code:
             ref_code = params.ref_code
-            ref = db.query(Product).filter(Product.product_code == ref_code).first()
-            if not ref:
-                base = re.sub(r"[SP]$", "", ref_code)
-                ref = (
-                    db.query(Product)
-                    .filter(Product.product_code.in_([base + "S", base + "P", base]))
-                    .first()
-                )
-            if not ref:
-                return {"status": "error", "error_type": "reference_not_found", "message": f"参考产品 {ref_code} 未找到。"}
-            # SQLAlchemy 2.x: Engine no longer has execute(); use a Connection
-            with bind.connect() as conn:
-                rp = conn.execute(
-                    text("SELECT pick_price(:pid, :tier, :color) AS rp"),
-                    {"pid": ref.product_id, "tier": params.tier, "color": params.color},
-                ).scalar()
+            with stage("reference"):
+                ref = _find_reference(db, matrix, ref_code)
+                if not ref:
+                    return {"status": "error", "error_type": "reference_not_found", "message": f"参考产品 {ref_code} 未找到。"}
+                if matrix is not None:
+                    rp = effective_price(matrix.catalog, ref.product_id, params.tier, params.color)
+                else:
+                    # SQLAlchemy 2.x: Engine no longer has execute(); use a Connection
+                    with bind.connect() as conn:
+                        _apply_deadline(conn, deadline)
+                        rp = pick_prices(conn, [ref.product_id], params.tier, params.color).get(ref.product_id)
             if rp is None:
                 return {"status": "error", "error_type": "reference_not_found", "message": f"参考产品 {ref_code} 价格缺失。"}
             comp_op = ">" if params.mode == "compare_gt" else "<"
@@ -269,29 +411,35 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
                 SELECT p.product_code, p.category, p.material_type, p.screenshot_url,
                        x.price, (x.price - :rp) AS delta
                 FROM products p
-                CROSS JOIN LATERAL (SELECT pick_price(p.product_id, :tier, :color) AS price) AS x
+                JOIN effective_prices x ON x.product_id = p.product_id AND x.tier = :tier AND x.color_type = :color
                 WHERE x.price IS NOT NULL{where_cat} AND x.price > 0 AND x.price {comp_op} :rp
                 ORDER BY (x.price - :rp) {order_dir}
                 LIMIT :limit
             """
-            conn = bind.connect()
-            try:
-                res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "rp": rp, "limit": params.limit, "cat": params.category})
-                rows = [
-                {
-                    "product_code": r[0],
-                    "category": r[1],
-                    "material": r[2],
-                    "screenshot_url": r[3],
-                    "price": float(r[4]),
-                    "delta": float(r[5]),
-                    "tier": params.tier,
-                    "color_type": params.color,
-                }
-                for r in res.fetchall()
-            ]
-            finally:
-                conn.close()
+            with stage("wide_search"):
+                if matrix is not None:
+                    hits = matrix.compare(params.tier, params.color, params.category, float(rp), params.mode == "compare_gt", params.limit)
+                    rows = _matrix_rows(hits, params, rp=float(rp))
+                else:
+                    conn = bind.connect()
+                    try:
+                        _apply_deadline(conn, deadline)
+                        res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "rp": rp, "limit": params.limit, "cat": params.category})
+                        rows = [
+                        {
+                            "product_code": r[0],
+                            "category": r[1],
+                            "material": r[2],
+                            "screenshot_url": r[3],
+                            "price": float(r[4]),
+                            "delta": float(r[5]),
+                            "tier": params.tier,
+                            "color_type": params.color,
+                        }
+                        for r in res.fetchall()
+                    ]
+                    finally:
+                        conn.close()
 
             # Post-filter any zero/invalid prices defensively and log
             logger.warning(f"Found {len(rows)} products, filtering zero prices")
@@ -311,28 +459,34 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
         sql = f"""
             SELECT p.product_code, p.category, p.material_type, p.screenshot_url, x.price
             FROM products p
-            CROSS JOIN LATERAL (SELECT pick_price(p.product_id, :tier, :color) AS price) AS x
+            JOIN effective_prices x ON x.product_id = p.product_id AND x.tier = :tier AND x.color_type = :color
             WHERE x.price IS NOT NULL{where_cat} AND x.price > 0
             ORDER BY x.price {order_dir}
             LIMIT :limit
         """
-        conn = bind.connect()
-        try:
-            res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "limit": params.limit, "cat": params.category})
-            rows = [
-            {
-                "product_code": r[0],
-                "category": r[1],
-                "material": r[2],
-                "screenshot_url": r[3],
-                "price": float(r[4]),
-                "tier": params.tier,
-                "color_type": params.color,
-            }
-            for r in res.fetchall()
-        ]
-        finally:
-            conn.close()
+        with stage("wide_search"):
+            if matrix is not None:
+                hits = matrix.top(params.tier, params.color, params.category, params.limit, params.mode == "top_desc")
+                rows = _matrix_rows(hits, params)
+            else:
+                conn = bind.connect()
+                try:
+                    _apply_deadline(conn, deadline)
+                    res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "limit": params.limit, "cat": params.category})
+                    rows = [
+                    {
+                        "product_code": r[0],
+                        "category": r[1],
+                        "material": r[2],
+                        "screenshot_url": r[3],
+                        "price": float(r[4]),
+                        "tier": params.tier,
+                        "color_type": params.color,
+                    }
+                    for r in res.fetchall()
+                ]
+                finally:
+                    conn.close()
         # Post-filter any zero/invalid prices defensively and log
         logger.warning(f"Found {len(rows)} products, filtering zero prices")
         rows = [r for r in rows if r.get("price", 0) > 0]
@@ -350,20 +504,26 @@ def run_wide_search(db: Session, params: WideQueryParams) -> Dict[str, Any]:
         sql = f"""
             SELECT p.product_code, p.category, p.material_type, p.screenshot_url, x.price
             FROM products p
-            CROSS JOIN LATERAL (SELECT pick_price(p.product_id, :tier, :color) AS price) AS x
+            JOIN effective_prices x ON x.product_id = p.product_id AND x.tier = :tier AND x.color_type = :color
             WHERE x.price IS NOT NULL{where_cat} AND x.price > 0 AND x.price BETWEEN :minp AND :maxp
             ORDER BY x.price ASC
             LIMIT :limit
         """
-        conn = bind.connect()
-        try:
-            res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "limit": params.limit, "cat": params.category, "minp": params.min_price, "maxp": params.max_price})
-            rows = [
-                {"product_code": r[0], "category": r[1], "material": r[2], "screenshot_url": r[3], "price": float(r[4]), "tier": params.tier, "color_type": params.color}
-                for r in res.fetchall()
-            ]
-        finally:
-            conn.close()
+        with stage("wide_search"):
+            if matrix is not None:
+                hits = matrix.between(params.tier, params.color, params.category, params.min_price, params.max_price, params.limit)
+                rows = _matrix_rows(hits, params)
+            else:
+                conn = bind.connect()
+                try:
+                    _apply_deadline(conn, deadline)
+                    res = conn.execute(text(sql), {"tier": params.tier, "color": params.color, "limit": params.limit, "cat": params.category, "minp": params.min_price, "maxp": params.max_price})
+                    rows = [
+                        {"product_code": r[0], "category": r[1], "material": r[2], "screenshot_url": r[3], "price": float(r[4]), "tier": params.tier, "color_type": params.color}
+                        for r in res.fetchall()
+                    ]
+                finally:
+                    conn.close()
         # Post-filter any zero/invalid prices defensively and log
         logger.warning(f"Found {len(rows)} products, filtering zero prices")
         rows = [r for r in rows if r.get("price", 0) > 0]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for a remote dependency.
+
+    - closed: calls go through; ``failure_threshold`` consecutive failures
+      (errors, or calls slower than ``slow_call_seconds``) open the circuit.
+    - open: calls are rejected immediately for ``recovery_seconds``.
+    - half_open: a single probe call is let through; success closes the
+      circuit, failure re-opens it.
+
+    Every call admitted by ``allow()`` must be followed by exactly one
+    ``record_success()``, ``record_failure()`` or ``record_ignored()``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        slow_call_seconds: float = 3.0,
+        recovery_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.slow_call_seconds = slow_call_seconds
+        self.recovery_seconds = recovery_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, duration: float = 0.0) -> None:
+        if duration > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning("Circuit %s opened after %d failure(s)", self.name, self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def record_ignored(self) -> None:
+        """The call said nothing about the dependency (e.g. the caller gave up early)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised by ``Deadline.check()`` once the budget is used up."""
+
+
+class Deadline:
+    """Absolute point in time by which a request must be answered.
+
+    Created once by the caller (e.g. ``QUERY_DEADLINE_SECONDS`` per query)
+    and passed down so each stage can bound its own timeouts by what is
+    left of the budget. ``Deadline(None)`` never expires.
+    """
+
+    def __init__(self, seconds: Optional[float], clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.expires_at: Optional[float] = None if seconds is None else clock() + max(0.0, seconds)
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        return cls(seconds)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (>= 0), or None when unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0.0
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded()
+
+    def within(self, seconds: float) -> "Deadline":
+        """The earlier of this deadline and ``seconds`` from now."""
+        d = Deadline(seconds, clock=self._clock)
+        if self.expires_at is not None and (d.expires_at is None or self.expires_at < d.expires_at):
+            d.expires_at = self.expires_at
+        return d
+
+    def clamp(self, timeout: float) -> float:
+        """``timeout`` shortened to the remaining budget."""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining()!r})"
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Upper bounds (inclusive, milliseconds) of the latency buckets; values
+# above the last bound land in an overflow bucket. Persisted histograms
+# rely on these staying fixed.
+LATENCY_BUCKETS_MS: Sequence[int] = (
+    5, 10, 25, 50, 75, 100, 150, 200, 300, 400, 500, 750,
+    1000, 1500, 2000, 3000, 4000, 5000, 8000, 12000, 20000, 30000,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram with approximate quantiles.
+
+    Quantiles interpolate linearly inside the bucket that holds the rank,
+    so their error is bounded by the bucket width. Thread-safe.
+    """
+
+    def __init__(self, bounds: Sequence[int] = LATENCY_BUCKETS_MS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def bucket_index(self, value: float) -> int:
+        return bisect_left(self.bounds, value)
+
+    def observe(self, value: float) -> None:
+        i = self.bucket_index(value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += 1
+            self.sum += value
+
+    def add_bucket(self, index: int, count: int, value_sum: float = 0.0) -> None:
+        with self._lock:
+            self.counts[index] += count
+            self.total += count
+            self.sum += value_sum
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        """Consistent copy of (bucket counts, total, sum)."""
+        with self._lock:
+            return list(self.counts), self.total, self.sum
+
+    def merge(self, other: "Histogram") -> None:
+        counts, total, value_sum = other.snapshot()
+        with self._lock:
+            for i, c in enumerate(counts):
+                self.counts[i] += c
+            self.total += total
+            self.sum += value_sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            counts, total = list(self.counts), self.total
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0
+                if i == len(self.bounds):
+                    return float(lo)  # overflow bucket has no upper bound
+                hi = self.bounds[i]
+                return lo + (hi - lo) * max(0.0, rank - seen) / c
+            seen += c
+        return float(self.bounds[-1])
+
+    def summary(self, quantiles: Iterable[float] = (0.5, 0.9, 0.95, 0.99)) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {
+            "count": self.total,
+            "mean": (self.sum / self.total) if self.total else None,
+        }
+        for q in quantiles:
+            v = self.quantile(q)
+            out[f"p{int(round(q * 100))}"] = None if v is None else round(v, 1)
+        return out
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(value: str, weak: bool = False) -> str:
+    """Quoted entity tag for ``value`` (hashed so it is opaque to clients)."""
+    digest = hashlib.sha1(value.encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _http_date(dt: datetime) -> str:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)  # stored timestamps are naive UTC
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's validators still match (RFC 9110 weak comparison).
+
+    ``If-None-Match`` takes precedence; ``If-Modified-Since`` is only
+    consulted when it is absent.
+    """
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        if inm.strip() == "*":
+            return True
+        return _opaque(etag) in {_opaque(t) for t in inm.split(",") if t.strip()}
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        lm = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+        return lm.replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(
+    etag: str, last_modified: Optional[datetime] = None, cache_control: str = "private, no-cache"
+) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def not_modified(
+    etag: str, last_modified: Optional[datetime] = None, cache_control: str = "private, no-cache"
+) -> Response:
+    """Empty 304 carrying the same validators as the full response."""
+    return Response(status_code=304, headers=cache_headers(etag, last_modified, cache_control))
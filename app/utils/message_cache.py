@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from typing import Dict
 import threading
 
+from app.utils.metrics import registry
+
 
 class MessageCache:
     """In-memory TTL cache for deduplicating incoming messages.
@@ -26,6 +28,10 @@ class MessageCache:
         with self._lock:
             self._cache[msg_id] = datetime.now()
 
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
     def _cleanup_locked(self, now: datetime) -> None:
         expired = [k for k, v in self._cache.items() if now - v > self._ttl]
         for k in expired:
@@ -34,4 +40,7 @@ class MessageCache:
 
 # module-level instance
 message_cache = MessageCache()
+registry.gauge("costchecker_wework_message_cache_size", "WeWork message ids kept for deduplication.").set_function(
+    lambda: len(message_cache)
+)
 
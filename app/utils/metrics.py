@@ -0,0 +1,245 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Modules register counters, gauges and histograms on the shared
+``registry`` at import time (registering a name twice returns the same
+metric, so several modules can contribute label values to one metric)
+and ``GET /metrics`` renders them. Values that already live elsewhere
+(cache stats, queue sizes) are exported with ``set_function`` and read
+only when scraped.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.histogram import LATENCY_BUCKETS_MS, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+class _Value:
+    """A counter or gauge sample."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Metric:
+    """One metric family; ``labels(...)`` returns (and creates) a child sample."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._functions: Dict[LabelValues, Callable[[], Optional[float]]] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # unlabelled metrics are exported (as zero) before the first update
+            self._children[()] = self._new_child()
+
+    def _key(self, values: Sequence[str]) -> LabelValues:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(values)}")
+        return tuple(str(v) for v in values)
+
+    def _new_child(self) -> object:
+        return _Value()
+
+    def labels(self, *values: str):
+        key = self._key(values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def set_function(self, fn: Callable[[], Optional[float]], *values: str) -> None:
+        """Read this sample from ``fn()`` at scrape time (None skips it)."""
+        self._functions[self._key(values)] = fn
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float, Tuple[str, ...]]]:
+        """(suffix, label values, value, extra label pair) tuples."""
+        with self._lock:
+            children = list(self._children.items())
+        functions = dict(self._functions)
+        for key, child in children:
+            if key not in functions:
+                yield "", key, child.value, ()
+        for key, fn in functions.items():
+            try:
+                value = fn()
+            except Exception as e:  # a broken source must not break the scrape
+                logger.debug("Metric %s%s unavailable: %s", self.name, key, e)
+                continue
+            if value is not None:
+                yield "", key, float(value), ()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class HistogramMetric(Metric):
+    """Fixed-bucket histogram observed in the unit of ``buckets``.
+
+    Bucket bounds and sums are multiplied by ``scale`` when rendered, so
+    millisecond observations can be exported in seconds.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS_MS,
+        scale: float = 1.0,
+    ) -> None:
+        self.buckets = tuple(buckets)
+        self.scale = scale
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for key, h in children:
+            counts, total, value_sum = h.snapshot()
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                yield "_bucket", key, cumulative, ("le", _format_value(bound * self.scale))
+            yield "_bucket", key, total, ("le", "+Inf")
+            yield "_sum", key, value_sum * self.scale, ()
+            yield "_count", key, total, ()
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if type(existing) is not cls or existing.labelnames != tuple(labelnames):
+                    raise ValueError(f"metric {name} already registered with a different type or labels")
+                return existing
+            metric = cls(name, documentation, labelnames, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS_MS,
+        scale: float = 1.0,
+    ) -> HistogramMetric:
+        return self._register(HistogramMetric, name, documentation, labelnames, buckets=buckets, scale=scale)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: List[str] = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {_escape_help(m.documentation)}")
+            lines.append(f"# TYPE {m.name} {m.type}")
+            for suffix, key, value, extra in m.samples():
+                pairs = list(zip(m.labelnames, key))
+                if extra:
+                    pairs.append(extra)
+                labels = ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs)
+                labels = f"{{{labels}}}" if labels else ""
+                lines.append(f"{m.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(s: str) -> str:
+    return s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(v: float) -> str:
+    if isinstance(v, float):
+        if math.isinf(v):
+            return "+Inf" if v > 0 else "-Inf"
+        if math.isnan(v):
+            return "NaN"
+        if v.is_integer() and abs(v) < 1e15:
+            return str(int(v))
+    return repr(v)
+
+
+# shared by the routes and services; rendered by GET /metrics
+registry = Registry()
+
+
+def export_cache_stats(cache: str, stats: Callable[[], Dict[str, Any]], hits_key: str = "hits") -> None:
+    """Export hits, misses and hit ratio from a cache's ``stats()`` dict, labelled ``cache``."""
+    registry.counter("costchecker_cache_hits_total", "Cache hits.", ["cache"]).set_function(
+        lambda: stats()[hits_key], cache
+    )
+    registry.counter("costchecker_cache_misses_total", "Cache misses.", ["cache"]).set_function(
+        lambda: stats()["misses"], cache
+    )
+    registry.gauge("costchecker_cache_hit_ratio", "Cache hits / lookups since start.", ["cache"]).set_function(
+        lambda: stats()["hit_ratio"], cache
+    )
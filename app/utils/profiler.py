@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# path shortening: (marker, prefix kept in the label)
+_PATH_ROOTS = (("/site-packages/", ""), ("/app/", "app/"), ("/scripts/", "scripts/"))
+
+
+def _frame_label(code) -> str:
+    """``function (path:first_line)`` with the path shortened to the package."""
+    filename = code.co_filename.replace("\\", "/")
+    for marker, prefix in _PATH_ROOTS:
+        i = filename.rfind(marker)
+        if i >= 0:
+            filename = prefix + filename[i + len(marker):]
+            break
+    else:
+        filename = filename.rsplit("/", 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread.
+
+    Stacks are aggregated in the collapsed ("folded") format read by
+    flamegraph.pl, speedscope and similar tools: ``root;...;leaf count``.
+    Nothing runs unless a profiler is started.
+    """
+
+    def __init__(self, interval: float = 0.002, thread_id: Optional[int] = None, max_depth: int = 200) -> None:
+        self.interval = interval
+        self.thread_id = thread_id
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self.started_at
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> bool:
+        self.stop()
+        return False
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == own:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            del frame
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Folded stacks, most sampled first."""
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000.0, 3),
+            "duration_ms": round(self.duration * 1000.0, 1),
+        }
+
+    def write(self, directory: str, name: str) -> Path:
+        """Save the folded stacks as ``<directory>/<name>.folded``."""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        out = path / f"{name}.folded"
+        out.write_text(self.collapsed() + "\n", encoding="utf-8")
+        return out
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Optional
+
+from sqlalchemy import event
+
+
+class SqlStats:
+    """SQL statements executed and database time spent inside ``track_sql()``.
+
+    Nested trackers also add to the enclosing one, so a test budget still
+    sees statements counted by the request it wraps.
+    """
+
+    __slots__ = ("statements", "seconds", "recorded", "_parent")
+
+    def __init__(self, parent: Optional["SqlStats"] = None, record: bool = False) -> None:
+        self.statements = 0
+        self.seconds = 0.0
+        # statement texts, kept only when asked for (test budgets)
+        self.recorded: Optional[List[str]] = [] if record else None
+        self._parent = parent
+
+    @property
+    def time_ms(self) -> float:
+        return self.seconds * 1000.0
+
+    def add(self, statement: str, seconds: float) -> None:
+        stats: Optional[SqlStats] = self
+        while stats is not None:
+            stats.statements += 1
+            stats.seconds += seconds
+            if stats.recorded is not None:
+                stats.recorded.append(statement)
+            stats = stats._parent
+
+
+_current: ContextVar[Optional[SqlStats]] = ContextVar("sql_stats", default=None)
+
+
+@contextmanager
+def track_sql(record: bool = False) -> Iterator[SqlStats]:
+    """Count statements run in this context (threads started with a copy of it included)."""
+    stats = SqlStats(_current.get(), record=record)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None and _current.get() is not None:
+        # an engine and the Engine class may both be instrumented: time once
+        if getattr(context, "_sql_stats_t0", None) is None:
+            context._sql_stats_t0 = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    t0 = getattr(context, "_sql_stats_t0", None) if context is not None else None
+    if t0 is None:
+        return
+    context._sql_stats_t0 = None
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement, time.perf_counter() - t0)
+
+
+def instrument_engine(target: Any) -> None:
+    """Count statements of ``target`` (an Engine, or the Engine class for all engines)."""
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+def uninstrument_engine(target: Any) -> None:
+    if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.remove(target, "before_cursor_execute", _before_cursor_execute)
+        event.remove(target, "after_cursor_execute", _after_cursor_execute)
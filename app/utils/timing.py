@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class StageTimings:
+    """Milliseconds spent per named stage of one request (repeated stages add up)."""
+
+    __slots__ = ("stages", "_t0")
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    def add(self, name: str, ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {k: round(v, 2) for k, v in self.stages.items()}
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value (stage durations plus ``total``)."""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+
+def start_timings() -> StageTimings:
+    """Begin collecting stage timings for the current request context."""
+    timings = StageTimings()
+    _current.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[StageTimings]:
+    return _current.get()
+
+
+def stop_timings() -> None:
+    _current.set(None)
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+@contextmanager
+def _timed(timings: StageTimings, name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - t0) * 1000.0)
+
+
+def stage(name: str):
+    """Time a block as ``name``; a shared no-op when no request is being timed."""
+    timings = _current.get()
+    if timings is None:
+        return _NOOP
+    return _timed(timings, name)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""Precompute screenshot highlight boxes.
+
+For every product x tier x color, locate the product code cell and the
+price cell on the source PDF page (``data/pdfs``) and store the boxes in
+``product_highlights``. Run after ``scripts/seed_database.py``; the query
+path then reads the boxes from the catalog snapshot instead of parsing
+PDFs per request.
+"""
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.services.highlight import rebuild_highlights
+
+
+def main() -> None:
+    db: Session = SessionLocal()
+    try:
+        with db.begin():
+            stats = rebuild_highlights(db)
+        print(
+            f"Stored {stats['rows']} highlight rows for {stats['pages']} pages "
+            f"({stats['pages_parsed']} PDF pages parsed)"
+        )
+        print(f"Catalog version: {stats['catalog_version']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from typing import List, Dict, Any, Optional
 
 import pdfplumber  # type: ignore
 from app.utils.product_parser import determine_material
+from app.services.page_index import PageIndex, ascii_code_key, word_box
 
 CODE_RE = re.compile(r"[A-Z]{1,3}\s*-?\s*\d{1,4}[SP]?")
 
@@ -21,6 +22,8 @@ def extract_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
     pdf = Path(pdf_path)
     with pdfplumber.open(str(pdf)) as doc:
         for page_idx, page in enumerate(doc.pages, start=1):
+            # page words are indexed once, on the first bbox lookup
+            page_index: Optional[PageIndex] = None
             try:
                 tables = page.extract_tables() or []
             except Exception:
@@ -46,17 +49,12 @@ def extract_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
                     # best-effort highlight bbox for code text
                     bbox: Optional[Dict[str, int]] = None
                     try:
-                        def _norm(s: str) -> str:
-                            import re
-                            return re.sub(r"[^A-Z0-9]", "", s.upper())
-                        target = _norm(code)
-                        for w in page.extract_words() or []:
-                            if _norm(w.get("text", "")) == target:
-                                x0, y0, x1, y1 = w["x0"], w["top"], w["x1"], w["bottom"]
-                                scale = 300.0 / 72.0
-                                x, y, width, height = int(x0 * scale), int(y0 * scale), int((x1 - x0) * scale), int((y1 - y0) * scale)
-                                bbox = {"x": x, "y": y, "w": width, "h": height, "page": page_idx}
-                                break
+                        target = ascii_code_key(code)
+                        if page_index is None:
+                            page_index = PageIndex(page.extract_words() or [], normalize=ascii_code_key)
+                        w = page_index.find_text(target)
+                        if w is not None:
+                            bbox = word_box(w, page_idx)
                     except Exception:
                         pass
                     rec: Dict[str, Any] = {
@@ -85,17 +83,12 @@ def extract_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
                         material = material or "PVC"
                     bbox: Optional[Dict[str, int]] = None
                     try:
-                        def _norm(s: str) -> str:
-                            import re
-                            return re.sub(r"[^A-Z0-9]", "", s.upper())
-                        target = _norm(code)
-                        for w in page.extract_words() or []:
-                            if _norm(w.get("text", "")) == target:
-                                x0, y0, x1, y1 = w["x0"], w["top"], w["x1"], w["bottom"]
-                                scale = 300.0 / 72.0
-                                x, y, width, height = int(x0 * scale), int(y0 * scale), int((x1 - x0) * scale), int((y1 - y0) * scale)
-                                bbox = {"x": x, "y": y, "w": width, "h": height, "page": page_idx}
-                                break
+                        target = ascii_code_key(code)
+                        if page_index is None:
+                            page_index = PageIndex(page.extract_words() or [], normalize=ascii_code_key)
+                        w = page_index.find_text(target)
+                        if w is not None:
+                            bbox = word_box(w, page_idx)
                     except Exception:
                         pass
                     rec = {
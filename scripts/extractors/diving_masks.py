@@ -2,13 +2,13 @@
 
 from __future__ import annotations
 
-import re
 from pathlib import Path
 from typing import List, Dict, Any, Optional, TypedDict
 
 import pdfplumber  # type: ignore
 
 from app.utils.product_parser import extract_base_code, determine_material
+from app.services.page_index import PageIndex, ascii_code_key, word_box
 
 
 class _ColumnMap(TypedDict, total=False):
@@ -35,6 +35,8 @@ def extract_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
     with pdfplumber.open(str(pdf)) as doc:
         last_map: Optional[_ColumnMap] = None
         for page_idx, page in enumerate(doc.pages, start=1):
+            # page words are indexed once, on the first bbox lookup
+            page_index: Optional[PageIndex] = None
             try:
                 tables = page.extract_tables() or []
             except Exception:
@@ -115,17 +117,13 @@ def extract_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
 
                     # Best-effort highlight bbox for code cell
                     try:
-                        def _norm(s: str) -> str:
-                            return re.sub(r"[^A-Z0-9]", "", s.upper())
-                        target = _norm(product_code) or _norm(base_code)
+                        target = ascii_code_key(product_code) or ascii_code_key(base_code)
                         bbox = None
-                        for w in page.extract_words() or []:
-                            if _norm(w.get("text", "")) == target:
-                                x0, y0, x1, y1 = w["x0"], w["top"], w["x1"], w["bottom"]
-                                scale = 300.0 / 72.0
-                                x, y, width, height = int(x0 * scale), int(y0 * scale), int((x1 - x0) * scale), int((y1 - y0) * scale)
-                                bbox = {"x": x, "y": y, "w": width, "h": height, "page": page_idx}
-                                break
+                        if page_index is None:
+                            page_index = PageIndex(page.extract_words() or [], normalize=ascii_code_key)
+                        w = page_index.find_text(target)
+                        if w is not None:
+                            bbox = word_box(w, page_idx)
                     except Exception:
                         bbox = None
 
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+"""Roll query_logs up into daily_metrics.
+
+Re-aggregates every day from the newest stored rollup through today, so
+it is safe to run as often as wanted (e.g. hourly from cron). The
+analytics stats endpoint reads completed days from these rows.
+"""
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.services.metrics_rollup import rollup
+
+
+def main() -> None:
+    db: Session = SessionLocal()
+    try:
+        with db.begin():
+            days = rollup(db)
+        if days:
+            print(f"Rolled up {len(days)} day(s): {days[0]} .. {days[-1]}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
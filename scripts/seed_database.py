@@ -8,9 +8,12 @@ products/pricing_tiers/product_sizes tables within a single transaction.
 from typing import Any, Dict
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from app.core.database import SessionLocal
 from app.models import Product, PricingTier, ProductSize, PricingHistory
+from app.services.catalog import bump_catalog_version
+from app.services.highlight import rebuild_highlights
+from app.services.wide_search import refresh_effective_prices
 from app.utils.product_parser import extract_base_code, determine_material
 
 
@@ -58,7 +61,16 @@ def main() -> None:
     db: Session = SessionLocal()
     try:
         with db.begin():
+            # existing rows are loaded once up front instead of queried per record/tier
+            products_by_code: Dict[str, Product] = {p.product_code: p for p in db.query(Product)}
+            tiers_by_key: Dict[Tuple[int, str, str], PricingTier] = {
+                (t.product_id, t.tier, t.color_type): t for t in db.query(PricingTier)
+            }
+            # new tiers are inserted together (one executemany) after the loop
+            new_tiers: list[Dict[str, Any]] = []
             seen_tiers = set()
+            # products whose highlight boxes may no longer match (new, repriced, re-boxed)
+            touched: set[int] = set()
             inserted_products = 0
             inserted_tiers = 0
             updated_tiers = 0
@@ -72,7 +84,7 @@ def main() -> None:
                 if not code:
                     continue
                 # skip if product already exists
-                existing = db.query(Product).filter(Product.product_code == code).first()
+                existing = products_by_code.get(code)
 
                 base, _ = extract_base_code(code)
                 material = rec.get("material_type") or determine_material(code, None)
@@ -101,7 +113,10 @@ def main() -> None:
                         import json as _json
                         try:
                             meta = {"highlight": rec.get("screenshot_bbox")}
-                            prod.notes = _json.dumps(meta, ensure_ascii=False)
+                            notes = _json.dumps(meta, ensure_ascii=False)
+                            if notes != prod.notes:
+                                prod.notes = notes
+                                touched.add(prod.product_id)
                         except Exception:
                             pass
                 else:
@@ -129,7 +144,9 @@ def main() -> None:
                             pass
                     db.add(prod)
                     db.flush()  # assign product_id
+                    products_by_code[code] = prod
                     inserted_products += 1
+                    touched.add(prod.product_id)
 
                 # Insert pricing tiers if available
                 tier_map = {
@@ -155,25 +172,18 @@ def main() -> None:
                         key = (prod.product_code, tier, color)
                         if key in seen_tiers:
                             continue
-                        exists = (
-                            db.query(PricingTier)
-                            .filter(
-                                PricingTier.product_id == prod.product_id,
-                                PricingTier.tier == tier,
-                                PricingTier.color_type == color,
-                            )
-                            .first()
-                        )
+                        exists = tiers_by_key.get((prod.product_id, tier, color))
                         if exists is None:
-                            db.add(
-                                PricingTier(
-                                    product_id=prod.product_id,
-                                    tier=tier,
-                                    color_type=color,
-                                    price=price,
-                                )
+                            new_tiers.append(
+                                {
+                                    "product_id": prod.product_id,
+                                    "tier": tier,
+                                    "color_type": color,
+                                    "price": price,
+                                }
                             )
                             inserted_tiers += 1
+                            touched.add(prod.product_id)
                             seen_tiers.add(key)
                         else:
                             # Upsert: if price changed, update and record history
@@ -191,6 +201,7 @@ def main() -> None:
                                     )
                                 )
                                 updated_tiers += 1
+                                touched.add(prod.product_id)
                             seen_tiers.add(key)
                     except Exception:
                         continue
@@ -222,7 +233,26 @@ def main() -> None:
                             # ignore any unique constraint violations per product
                             pass
 
+            if new_tiers:
+                db.execute(insert(PricingTier), new_tiers)
+            highlights = None
+            if touched:
+                # price boxes are located by value: recompute them before the
+                # version bump so no snapshot pairs new prices with old boxes
+                db.flush()
+                highlights = rebuild_highlights(db, product_ids=touched, bump=False)
+
+            # running API processes reload their catalog snapshot on the next check
+            catalog_version = bump_catalog_version(db)
+            # wide-search queries read resolved prices from this materialized view
+            refreshed = refresh_effective_prices(db)
+
         print(f"Inserted {inserted_products} products, {inserted_tiers} inserted tiers, {updated_tiers} updated tiers, {inserted_sizes} sizes")
+        print(f"Catalog version: {catalog_version}")
+        if highlights:
+            print(f"Rebuilt {highlights['rows']} highlight rows for {len(touched)} products")
+        if refreshed:
+            print("Refreshed effective_prices")
         if warnings:
             from datetime import datetime
             out_dir = Path("data/reports")
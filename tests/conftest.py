@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.engine import Engine
+
+from app.utils.sql_stats import instrument_engine, track_sql, uninstrument_engine
+
+
+@pytest.fixture
+def statement_budget():
+    """Fail the test when the wrapped block runs more SQL statements than declared.
+
+        with statement_budget(4):
+            client.post("/api/query", ...)
+    """
+    instrument_engine(Engine)  # every engine, including per-test SQLite ones
+
+    @contextmanager
+    def budget(max_statements: int):
+        with track_sql(record=True) as stats:
+            yield stats
+        if stats.statements > max_statements:
+            listing = "\n".join(f"  {i}. {s.strip()[:200]}" for i, s in enumerate(stats.recorded, start=1))
+            pytest.fail(
+                f"{stats.statements} SQL statements, budget is {max_statements}:\n{listing}",
+                pytrace=False,
+            )
+
+    try:
+        yield budget
+    finally:
+        uninstrument_engine(Engine)
@@ -11,7 +11,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.main import app
 from app.core.database import get_db
-from app.models import Base, Product, PricingTier
+from app.models import Base, Product, PricingTier, QueryLog
 
 
 def make_sqlite_session(tmp_name: str = "test_api.sqlite"):
@@ -87,6 +87,32 @@ def test_query_success_via_api(tmp_path):
     assert data["data"]["color_type"] == "标准色"
 
 
+def test_query_debug_stage_timings(tmp_path):
+    db_file = tmp_path / "api_timing.sqlite"
+    Session = make_sqlite_session(str(db_file))
+    seed_basic(Session)
+    app.dependency_overrides[get_db] = override_dep(Session)
+    transport = httpx.ASGITransport(app=app)
+    async def _run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            plain = await client.post("/api/query", json={"query": "GT10S C级 标准色"})
+            debug = await client.post("/api/query", json={"query": "GT10P C级 标准色", "debug": True})
+            return plain, debug
+    plain, debug = asyncio.get_event_loop().run_until_complete(_run())
+    assert "server-timing" not in plain.headers and "debug" not in plain.json()
+    timings = debug.json()["debug"]["timings_ms"]
+    assert {"cache", "detect", "extract", "resolve", "price", "format", "highlight"} <= set(timings)
+    header = debug.headers["server-timing"]
+    assert "resolve;dur=" in header and "total;dur=" in header
+    db = Session()
+    try:
+        logs = {q.query_text: q.stage_timings for q in db.query(QueryLog).all()}
+    finally:
+        db.close()
+    assert logs["GT10S C级 标准色"] is None
+    assert set(logs["GT10P C级 标准色"]) == set(timings)
+
+
 def test_query_needs_confirm_and_confirm_flow(tmp_path):
     db_file = tmp_path / "api2.sqlite"
     Session = make_sqlite_session(str(db_file))
@@ -111,6 +137,13 @@ def test_query_needs_confirm_and_confirm_flow(tmp_path):
     j2 = asyncio.get_event_loop().run_until_complete(_confirm())
     assert j2["status"] == "success"
     assert j2["data"]["product_code"] in ("GT10S", "GT10P")
+    db = Session()
+    try:
+        log = db.query(QueryLog).filter(QueryLog.query_classification == "confirmation").one()
+    finally:
+        db.close()
+    # logged under the query that asked for it, not the confirmation id
+    assert log.query_text == "查 GT10 C级 标准色" and log.selected_product == j2["data"]["product_code"]
 
 
 def test_wide_search_via_mock(monkeypatch, tmp_path):
@@ -123,7 +156,7 @@ def test_wide_search_via_mock(monkeypatch, tmp_path):
 
     # Mock run_wide_search to avoid DB-specific SQL function dependency
     from app.services import query_processor as qp
-    def _fake_run(db, params):
+    def _fake_run(db, params, deadline=None):
         rows = [
             {"product_code": "GT10S", "category": "泳镜", "material": "SILICONE", "screenshot_url": None, "price": 0.9, "tier": "C级", "color_type": "标准色"},
             {"product_code": "GT10P", "category": "泳镜", "material": "PVC", "screenshot_url": None, "price": 0.7, "tier": "C级", "color_type": "标准色"},
@@ -197,3 +230,61 @@ def test_analytics_endpoints_basic_auth(tmp_path):
     assert r3.status_code == 200
     j3 = r3.json()
     assert "total_products" in j3
+
+
+def test_conditional_get_returns_304(tmp_path):
+    from app.services.catalog import bump_catalog_version, invalidate_catalog
+
+    png_path = Path("data/screenshots/test_api_etag.png")
+    png_path.parent.mkdir(parents=True, exist_ok=True)
+    png_path.write_bytes(base64.b64decode(
+        b"iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4nGNgYGAAAAAEAAH3o7sSAAAAAElFTkSuQmCC"
+    ))
+    Session = make_sqlite_session(str(tmp_path / "api_etag.sqlite"))
+    seed_basic(Session)
+    app.dependency_overrides[get_db] = override_dep(Session)
+    transport = httpx.ASGITransport(app=app)
+    auth = httpx.BasicAuth("admin", "change-me")
+
+    async def _get(url, **headers):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(url, headers=headers, auth=auth)
+
+    run = asyncio.get_event_loop().run_until_complete
+    try:
+        r = run(_get("/api/screenshot/test_api_etag.png"))
+        assert r.status_code == 200 and r.headers["etag"] and r.headers["last-modified"]
+        r304 = run(_get("/api/screenshot/test_api_etag.png", **{"If-None-Match": r.headers["etag"]}))
+        assert r304.status_code == 304 and r304.content == b""
+        assert r304.headers["etag"] == r.headers["etag"]
+
+        q = run(_get("/api/analytics/data_quality"))
+        assert q.status_code == 200 and q.json()["total_products"] == 2
+        etag = q.headers["etag"]
+        assert run(_get("/api/analytics/data_quality", **{"If-None-Match": etag})).status_code == 304
+        s = run(_get("/api/analytics/stats"))
+        assert run(_get("/api/analytics/stats", **{"If-None-Match": s.headers["etag"]})).status_code == 304
+        ql = run(_get("/api/analytics/queries"))
+        assert run(_get("/api/analytics/queries", **{"If-None-Match": ql.headers["etag"]})).status_code == 304
+        db = Session()
+        try:
+            db.add(QueryLog(query_text="GT10S C级", execution_time_ms=12))
+            db.commit()
+        finally:
+            db.close()
+        # a new log row moves both validators
+        assert run(_get("/api/analytics/stats", **{"If-None-Match": s.headers["etag"]})).status_code == 200
+        ql2 = run(_get("/api/analytics/queries", **{"If-None-Match": ql.headers["etag"]}))
+        assert ql2.status_code == 200 and ql2.json()["total"] == ql.json()["total"] + 1
+
+        db = Session()
+        try:
+            bump_catalog_version(db)
+            db.commit()
+            invalidate_catalog(db)
+        finally:
+            db.close()
+        q2 = run(_get("/api/analytics/data_quality", **{"If-None-Match": etag}))
+        assert q2.status_code == 200 and q2.headers["etag"] != etag
+    finally:
+        png_path.unlink(missing_ok=True)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models import Base, Product, PricingTier
+from app.services.catalog import bump_catalog_version, get_catalog, invalidate_catalog
+
+
+def setup_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    p_s = Product(
+        product_code="GT10S",
+        base_code="GT10",
+        product_name_cn="儿童分体简易带扣",
+        category="泳镜",
+        material_type="SILICONE",
+        base_cost=0.5,
+        source_pdf="2025.10.28 泳镜.pdf",
+        source_page=2,
+    )
+    p_p = Product(
+        product_code="GT10P",
+        base_code="GT10",
+        product_name_cn="儿童分体简易带扣",
+        category="泳镜",
+        material_type="PVC",
+        base_cost=0.4,
+        source_pdf="2025.10.28 泳镜.pdf",
+        source_page=2,
+    )
+    db.add_all([p_s, p_p])
+    db.commit()
+    db.add_all([
+        PricingTier(product_id=p_s.product_id, tier="C级", color_type="标准色", price=0.8, effective_date=date(2025, 1, 1)),
+        PricingTier(product_id=p_s.product_id, tier="C级", color_type="标准色", price=0.9, effective_date=date(2025, 6, 1)),
+        PricingTier(product_id=p_s.product_id, tier="A级", color_type="定制色", price=1.1),
+        PricingTier(product_id=p_p.product_id, tier="C级", color_type="标准色", price=0.7),
+    ])
+    db.commit()
+    return engine, db
+
+
+def test_snapshot_lookups_and_latest_price():
+    _, db = setup_db()
+    cat = get_catalog(db)
+    assert cat.by_code("GT10S").material_type == "SILICONE"
+    matches, conf = cat.exact_match("GT10S")
+    assert [m.product_code for m in matches] == ["GT10S"] and conf == 1.0
+    matches, conf = cat.base_code_match("GT10")
+    assert {m.product_code for m in matches} == {"GT10S", "GT10P"} and conf == 0.95
+    pid = cat.by_code("GT10S").product_id
+    assert cat.price(pid, "C级", "标准色").price == 0.9  # newest effective_date wins
+    assert [(p.tier, p.color_type) for p in cat.prices_for(pid)] == [("A级", "定制色"), ("C级", "标准色")]
+
+
+def test_lookups_do_not_touch_db_between_refreshes():
+    engine, db = setup_db()
+    cat = get_catalog(db)
+    statements: list[str] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for _ in range(10):
+        assert get_catalog(db) is cat
+        cat.exact_match("GT10P")
+        cat.price(1, "C级", "标准色")
+    assert statements == []
+
+
+def test_snapshot_swapped_when_version_changes(monkeypatch):
+    _, db = setup_db()
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_SECONDS", 0.0)
+    old = get_catalog(db)
+    assert get_catalog(db) is old  # unchanged version keeps the same snapshot
+
+    db.add(Product(
+        product_code="GT20S",
+        base_code="GT20",
+        category="泳镜",
+        material_type="SILICONE",
+        base_cost=0.6,
+        source_pdf="2025.10.28 泳镜.pdf",
+        source_page=3,
+    ))
+    bump_catalog_version(db)
+    db.commit()
+
+    new = get_catalog(db)
+    assert new is not old and new.version == old.version + 1
+    assert new.by_code("GT20S") is not None
+    # readers holding the old snapshot keep a consistent view
+    assert old.by_code("GT20S") is None
+
+
+def test_invalidate_forces_reload():
+    _, db = setup_db()
+    old = get_catalog(db)
+    invalidate_catalog(db)
+    assert get_catalog(db) is not old
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services import deepseek as ds
+from app.services.deepseek import DeepSeekClient, deepseek_breaker
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.deadline import Deadline
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes():
+    clock = FakeClock()
+    b = CircuitBreaker("t", failure_threshold=2, slow_call_seconds=1.0, recovery_seconds=10.0, clock=clock)
+    assert b.allow()
+    b.record_failure()
+    assert b.allow()
+    b.record_success(0.1)  # success resets the streak
+    b.record_failure()
+    b.record_success(5.0)  # slow calls count as failures
+    assert b.state == CircuitBreaker.OPEN
+    assert not b.allow()
+
+    clock.now += 10.0
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert b.allow()
+    assert not b.allow()  # only one probe at a time
+    b.record_failure()
+    assert b.state == CircuitBreaker.OPEN
+
+    clock.now += 10.0
+    assert b.allow()
+    b.record_success(0.1)
+    assert b.state == CircuitBreaker.CLOSED
+    assert b.stats()["times_opened"] == 2
+
+
+def test_deadline_clamps_to_remaining_budget():
+    clock = FakeClock()
+    d = Deadline(2.0, clock=clock)
+    assert d.clamp(8.0) == 2.0
+    clock.now += 1.5
+    assert abs(d.clamp(8.0) - 0.5) < 1e-9 and not d.expired()
+    clock.now += 1.0
+    assert d.remaining() == 0.0 and d.expired()
+    assert Deadline(None).clamp(8.0) == 8.0 and not Deadline(None).expired()
+
+
+@contextmanager
+def fake_llm_server(behaviour: dict):
+    """Local stand-in for the DeepSeek chat/completions endpoint."""
+    hits: list[str] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):  # noqa: N802
+            hits.append(self.path)
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(behaviour.get("delay", 0.0))
+            status = behaviour.get("status", 200)
+            content = json.dumps({"product_code": "GT10S", "tier": "C级"})
+            body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass  # client gave up (deadline)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(base_url: str) -> DeepSeekClient:
+    ds.extraction_cache.clear()
+    return DeepSeekClient(api_key="test-key", base_url=base_url)
+
+
+def test_llm_call_never_outlives_deadline():
+    deepseek_breaker.reset()
+    with fake_llm_server({"delay": 1.0}) as (url, hits):
+        client = _client(url)
+        start = time.monotonic()
+        r = client.extract_query_params("GT10S 多少钱", deadline=Deadline.after(0.3))
+        elapsed = time.monotonic() - start
+    assert elapsed < 0.9
+    assert r["product_code"] == "GT10S"  # heuristic answer
+    assert client.last_path == DeepSeekClient.PATH_FALLBACK
+    # an exhausted budget skips the call entirely
+    with fake_llm_server({}) as (url, hits):
+        _client(url).extract_query_params("GT10S 多少钱", deadline=Deadline.after(0.0))
+    assert hits == []
+    deepseek_breaker.reset()
+
+
+def test_deadline_shortened_timeouts_do_not_trip_breaker(monkeypatch):
+    deepseek_breaker.reset()
+    monkeypatch.setattr(deepseek_breaker, "failure_threshold", 1)
+    monkeypatch.setattr(ds.settings, "DEEPSEEK_TIMEOUT_SECONDS", 0.3)
+    with fake_llm_server({"delay": 1.0}) as (url, hits):
+        _client(url).extract_query_params("GT10S 多少钱", deadline=Deadline.after(0.2))
+        assert deepseek_breaker.stats()["consecutive_failures"] == 0
+        assert deepseek_breaker.state == CircuitBreaker.CLOSED
+        # the configured timeout itself expiring is the API's fault
+        _client(url).extract_query_params("GT10S 价格")
+        assert deepseek_breaker.state == CircuitBreaker.OPEN
+        # a clamped timeout that still outlasts the slow threshold (WeWork's
+        # 4s window against a hanging API) opens the circuit
+        deepseek_breaker.reset()
+        monkeypatch.setattr(deepseek_breaker, "slow_call_seconds", 0.1)
+        _client(url).extract_query_params("GT10S 单价", deadline=Deadline.after(0.2))
+        assert deepseek_breaker.state == CircuitBreaker.OPEN
+    deepseek_breaker.reset()
+
+
+def test_breaker_skips_failing_api_and_recovers(monkeypatch):
+    deepseek_breaker.reset()
+    monkeypatch.setattr(deepseek_breaker, "failure_threshold", 2)
+    monkeypatch.setattr(deepseek_breaker, "recovery_seconds", 0.2)
+    behaviour = {"status": 503}
+    with fake_llm_server(behaviour) as (url, hits):
+        for q in ("GT10S 多少钱", "GT10S 价格", "GT10S 报价", "GT10S 单价"):
+            client = _client(url)
+            client.extract_query_params(q)
+            assert client.last_path == DeepSeekClient.PATH_FALLBACK
+        assert len(hits) == 2  # circuit opened; later queries answered instantly
+        assert deepseek_breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.25)
+        behaviour["status"] = 200
+        client = _client(url)
+        client.extract_query_params("GT10S 要多少钱")  # half-open probe
+        assert client.last_path == DeepSeekClient.PATH_LLM
+        assert deepseek_breaker.state == CircuitBreaker.CLOSED
+        assert len(hits) == 3
+    deepseek_breaker.reset()
@@ -21,3 +21,83 @@ def test_client_extract_params_without_api_key_falls_back():
     assert r["color_type"] == "定制色"
     # material not present here -> None
     assert r.get("material") in (None, "PVC")
+
+
+def _completion(content: str) -> dict:
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def test_call_api_reuses_pooled_client(monkeypatch):
+    import httpx
+    from app.services import deepseek as ds
+
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(str(request.url))
+        return httpx.Response(200, json=_completion('{"product_code": "gt-10s", "tier": "C", "color_type": "标准色", "material": "硅胶"}'))
+
+    monkeypatch.setattr(ds, "_sync_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    assert ds.get_http_client() is ds.get_http_client()
+    ds.extraction_cache.clear()
+
+    client = DeepSeekClient(api_key="test-key", base_url="http://llm.local/v1")
+    for q in ("GT10S C级", "GT10P C级"):
+        r = client.extract_query_params(q)
+        assert r == {"product_code": "GT10S", "tier": "C级", "color_type": "标准色", "material": "SILICONE"}
+    assert seen == ["http://llm.local/v1/chat/completions"] * 2
+
+
+def test_async_extract_uses_async_client(monkeypatch):
+    import asyncio
+    import httpx
+    from app.services import deepseek as ds
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=_completion('```json\n{"product_code": "GT10P", "tier": "B级"}\n```'))
+
+    async def _run():
+        monkeypatch.setattr(ds, "_async_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(ds, "_async_client_loop", asyncio.get_running_loop())
+        client = DeepSeekClient(api_key="test-key")
+        ds.extraction_cache.clear()
+        return await client.aextract_query_params("GT10P B级")
+
+    r = asyncio.get_event_loop().run_until_complete(_run())
+    assert r["product_code"] == "GT10P" and r["tier"] == "B级" and r["color_type"] is None
+
+
+def test_heuristic_confidence_requires_unambiguous_fields():
+    from app.services.deepseek import heuristic_extract_scored
+
+    assert heuristic_extract_scored("GT10S C级 标准色")[1] == 1.0
+    assert heuristic_extract_scored("GT10S C级")[1] == 0.7
+    # two codes, two tiers or both colors are not determined
+    assert heuristic_extract_scored("GT10S 和 GT20S C级 标准色")[1] == 0.6
+    assert heuristic_extract_scored("GT10S A级 还是 C级 标准色")[1] == 0.7
+    assert heuristic_extract_scored("GT10S C级 标准色还是定制色")[1] == 0.7
+    # a stray tier letter must not lend the explicit tier's confidence to another tier
+    result, confidence = heuristic_extract_scored("GT10S C级 A 标准色")
+    assert result["tier"] != "C级" and confidence == 0.7
+
+
+def test_fast_path_skips_llm(monkeypatch):
+    def _no_call(self, query, timeout=None):
+        raise AssertionError("LLM must not be called")
+
+    monkeypatch.setattr(DeepSeekClient, "_call_api", _no_call)
+    client = DeepSeekClient(api_key="test-key")
+    r = client.extract_query_params("gt-10s c级 定制色")
+    assert r["product_code"] == "GT10S" and r["tier"] == "C级" and r["color_type"] == "定制色"
+    assert client.last_path == DeepSeekClient.PATH_HEURISTIC
+
+
+def test_free_form_query_reports_llm_or_fallback_path(monkeypatch):
+    client = DeepSeekClient(api_key=None)
+    client.extract_query_params("GT10S 多少钱")
+    assert client.last_path == DeepSeekClient.PATH_FALLBACK
+
+    monkeypatch.setattr(DeepSeekClient, "_call_api", lambda self, q, timeout=None: {"product_code": "GT10S", "tier": None, "color_type": None, "material": None})
+    client = DeepSeekClient(api_key="test-key")
+    client.extract_query_params("GT10S 多少钱 呢")
+    assert client.last_path == DeepSeekClient.PATH_LLM
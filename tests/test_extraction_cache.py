@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base
+from app.services import deepseek as ds
+from app.services.extraction_cache import ExtractionCache, normalize_query_text
+from app.utils.lru_cache import LRUCache
+
+
+PARAMS = {"product_code": "GT10S", "tier": "C级", "color_type": "标准色", "material": None}
+
+
+def test_normalize_query_text():
+    assert normalize_query_text("  gt10s  C级\t标准色 ") == "GT10S C级 标准色"
+    # full-width letters/digits fold to ASCII
+    assert normalize_query_text("ＧＴ１０Ｓ") == "GT10S"
+
+
+def test_lru_eviction_and_ttl():
+    now = [0.0]
+    cache: LRUCache[int] = LRUCache(maxsize=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.evictions == 1
+    now[0] = 11.0
+    assert cache.get("a") is None and cache.expirations == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_memory_cache_counts_hits_and_misses():
+    cache = ExtractionCache(maxsize=8, ttl_seconds=60)
+    assert cache.get("GT10S C级标准色价格") is None
+    cache.put("GT10S C级标准色价格", PARAMS)
+    hit = cache.get("gt10s  c级标准色价格")
+    assert hit == PARAMS
+    hit["tier"] = "A级"  # callers get copies
+    assert cache.get("GT10S C级标准色价格")["tier"] == "C级"
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["llm_calls_saved"] == 2
+
+
+def test_persistent_entries_shared_across_instances(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'llm_cache.sqlite'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    first = ExtractionCache(persist=True, session_factory=Session)
+    first.put("GT10S C级标准色价格", PARAMS)
+    # a fresh instance (restart / other worker) starts with an empty memory tier
+    second = ExtractionCache(persist=True, session_factory=Session)
+    assert second.get("GT10S C级标准色价格") == PARAMS
+    assert second.stats()["store_hits"] == 1
+    assert second.get("GT10S C级标准色价格") == PARAMS
+    assert second.stats()["hits"] == 1
+
+
+def test_client_skips_llm_on_cache_hit(monkeypatch):
+    calls: list[str] = []
+
+    def fake_call(self, query, timeout=None):
+        calls.append(query)
+        return dict(PARAMS)
+
+    monkeypatch.setattr(ds.DeepSeekClient, "_call_api", fake_call)
+    monkeypatch.setattr(ds, "extraction_cache", ExtractionCache(maxsize=8, ttl_seconds=60))
+    client = ds.DeepSeekClient(api_key="test-key")
+    assert client.extract_query_params("随便问问 GT10S") == PARAMS
+    assert client.extract_query_params("随便问问  gt10s") == PARAMS
+    assert calls == ["随便问问 GT10S"]
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from app.models import Base, Product
@@ -115,3 +115,18 @@ def test_no_suffix_product_present():
     db = setup_db()
     matches, _ = exact_match(db, "F9970")
     assert len(matches) == 1 and matches[0].product_code == "F9970"
+
+
+def test_fuzzy_matching_issues_no_per_hit_queries():
+    db = setup_db()
+    fuzzy_string_match(db, "GT10S")  # warm the catalog snapshot
+    statements: list[str] = []
+
+    @event.listens_for(db.get_bind(), "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    hits = fuzzy_string_match(db, "GT1OS", threshold=0.6)
+    assert len(hits) >= 3
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    assert statements == []
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Product, PricingTier, ProductHighlight
+from app.services import highlight as hl
+from app.services.catalog import get_catalog
+from app.services.query_processor import process_query
+
+
+def _w(text: str, x0: float, top: float = 100.0) -> dict:
+    return {"text": text, "x0": x0, "x1": x0 + 20.0, "top": top, "bottom": top + 10.0}
+
+
+# one price-list row: code, cost, A/B/C/D standard, A/B/C/D custom
+PAGE = [
+    _w("GT10S", 10), _w("0.5", 100),
+    _w("0.6", 150), _w("0.7", 200), _w("0.9", 250), _w("1.0", 300),
+    _w("0.8", 350), _w("0.95", 400), _w("1.1", 450), _w("1.2", 500),
+    _w("0.9", 250, top=300),  # same value on another row
+]
+
+
+def setup_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    p = Product(
+        product_code="GT10S",
+        base_code="GT10",
+        product_name_cn="儿童分体简易带扣",
+        category="泳镜",
+        material_type="SILICONE",
+        base_cost=0.5,
+        source_pdf="2025.10.28 泳镜.pdf",
+        source_page=2,
+        screenshot_url="screenshots/GT10S.png",
+    )
+    db.add(p)
+    db.commit()
+    db.add_all([
+        PricingTier(product_id=p.product_id, tier="C级", color_type="标准色", price=0.9),
+        PricingTier(product_id=p.product_id, tier="B级", color_type="定制色", price=0.95),
+    ])
+    db.commit()
+    return db
+
+
+def test_price_box_found_by_column_ordinal():
+    product = Product(product_code="GT10S", base_code="GT10", base_cost=0.5, source_page=2)
+    code_box = hl.find_code_box(PAGE, product)
+    assert code_box == {"x": int(10 * hl.SCALE), "y": int(100 * hl.SCALE), "w": int(20 * hl.SCALE), "h": int(10 * hl.SCALE), "page": 2}
+    checks = hl.new_checks()
+    box = hl.find_price_box(PAGE, product, "C级", "标准色", 0.9, code_box, checks)
+    assert box["x"] == int(250 * hl.SCALE) and box["y"] == int(100 * hl.SCALE)
+    assert checks["row_located"] and checks["cost_anchor"] and checks["column_ordinal"] and checks["value_match"]
+
+
+def test_rebuild_stores_boxes_and_query_uses_them_without_pdf(monkeypatch):
+    db = setup_db()
+    parsed: list[tuple] = []
+
+    def fake_loader(pdf, page):
+        parsed.append((pdf, page))
+        return PAGE
+
+    stats = hl.rebuild_highlights(db, load_words=fake_loader)
+    db.commit()
+    assert stats["rows"] == 3 and stats["pages_parsed"] == 1
+    assert db.query(ProductHighlight).count() == 3
+
+    rec = get_catalog(db).highlight(1, "B级", "定制色")
+    assert rec is not None and rec.price_box["x"] == int(400 * hl.SCALE)
+
+    # query time: boxes come from the snapshot; the PDF is never opened
+    monkeypatch.setattr(hl, "load_page_words", lambda *a: (_ for _ in ()).throw(AssertionError("PDF parsed")))
+    r = process_query("GT10S C级 标准色", db)
+    assert r["status"] == "success"
+    kinds = {h["type"]: h for h in r["data"]["highlights"]}
+    assert kinds["price"]["x"] == int(250 * hl.SCALE)
+    assert kinds["code"]["filename"] == "screenshots/GT10S.png"
+    assert r["data"]["checks"]["column_ordinal"] is True
+    assert parsed == [("2025.10.28 泳镜.pdf", 2)]
+
+
+def test_price_without_highlight_row_keeps_code_box():
+    db = setup_db()
+    hl.rebuild_highlights(db, load_words=lambda pdf, page: PAGE)
+    # a price added after the boxes were built has no row of its own
+    db.query(ProductHighlight).filter(ProductHighlight.tier == "C级").delete()
+    db.commit()
+    catalog = get_catalog(db)
+    rec = catalog.highlight(1, "C级", "标准色")
+    assert rec is not None and rec.tier == "" and rec.code_box is not None
+    r = process_query("GT10S C级 标准色", db)
+    assert [h["type"] for h in r["data"]["highlights"]] == ["code"]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, LatencyBucket
+from app.services.latency import latency_percentiles, persist_latencies, query_mode
+from app.services.logger import write_query_logs
+from app.utils.histogram import Histogram
+
+
+def setup_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(bind=engine)()
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    h = Histogram(bounds=(10, 100, 1000))
+    for v in [5] * 50 + [50] * 40 + [500] * 9 + [5000]:
+        h.observe(v)
+    s = h.summary()
+    assert s["count"] == 100 and s["p50"] == 10.0
+    assert 10 < s["p90"] <= 100 and 100 < s["p95"] <= 1000
+    assert s["p99"] == 1000.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_query_mode():
+    assert query_mode({"status": "success", "data": {"product_code": "GT10S"}}) == "direct"
+    assert query_mode({"status": "success", "data": {"results": [], "mode": "top_asc"}}) == "wide"
+    assert query_mode({"data": {"results": [], "mode": "compare_lt", "ref_products": []}}) == "description"
+    assert query_mode({"status": "needs_confirmation"}) == "direct"
+
+
+def test_log_batches_accumulate_daily_buckets():
+    engine, db = setup_db()
+    ts = datetime(2025, 11, 20, 9)
+    rows = [
+        {"query_text": "q", "query_classification": "wide", "execution_time_ms": ms, "timestamp": ts}
+        for ms in (20, 40, 3500)
+    ] + [{"query_text": "q", "query_classification": "wework", "execution_time_ms": 900, "timestamp": ts}]
+    write_query_logs(engine, rows)
+    write_query_logs(engine, rows[:1])
+    # same (day, mode, bucket) rows are summed, not duplicated
+    assert db.query(LatencyBucket).filter_by(mode="wide").count() == 3
+    with engine.begin() as conn:
+        assert persist_latencies(conn, [{"query_text": "q", "execution_time_ms": None}]) == 0
+    stats = latency_percentiles(db, days=1, today=date(2025, 11, 20))
+    assert stats["modes"]["wide"]["count"] == 4 and stats["modes"]["wework"]["count"] == 1
+    assert stats["all"]["count"] == 5
+    assert stats["modes"]["wide"]["p99"] > 3000
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.main import app
+from app.utils.metrics import Registry
+
+
+def test_registry_renders_prometheus_text():
+    reg = Registry()
+    calls = reg.counter("t_calls_total", "Calls.", ["outcome"])
+    calls.labels("ok").inc()
+    calls.labels("ok").inc(2)
+    assert reg.counter("t_calls_total", "Calls.", ["outcome"]) is calls
+    reg.gauge("t_size", "Size.").set_function(lambda: 7)
+    reg.gauge("t_broken", "Broken.").set_function(lambda: 1 / 0)
+    h = reg.histogram("t_seconds", "Latency.", ["route"], buckets=(10, 100), scale=0.001)
+    for ms in (5, 50, 500):
+        h.labels('/a"b').observe(ms)
+    lines = reg.render().splitlines()
+    assert "# TYPE t_calls_total counter" in lines
+    assert 't_calls_total{outcome="ok"} 3' in lines
+    assert "t_size 7" in lines
+    # a failing source is skipped, not fatal
+    assert "# TYPE t_broken gauge" in lines and not any(l.startswith("t_broken ") for l in lines)
+    assert 't_seconds_bucket{route="/a\\"b",le="0.01"} 1' in lines
+    assert 't_seconds_bucket{route="/a\\"b",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{route="/a\\"b",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{route="/a\\"b"} 0.555' in lines
+    assert 't_seconds_count{route="/a\\"b"} 3' in lines
+
+
+def test_metrics_endpoint_counts_requests_by_route():
+    transport = httpx.ASGITransport(app=app)
+    async def _run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/api/health")
+            await client.get("/api/screenshot/does-not-exist.png")
+            return await client.get("/metrics")
+    r = asyncio.get_event_loop().run_until_complete(_run())
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = r.text
+    assert 'costchecker_http_requests_total{route="/api/health",method="GET",status="200"}' in body
+    # labelled by route template, not by the requested path
+    assert 'route="/api/screenshot/{filename}",method="GET",status="404"' in body
+    assert "does-not-exist" not in body
+    for name in (
+        "costchecker_db_pool_checkout_seconds_count",
+        "costchecker_deepseek_requests_total",
+        'costchecker_cache_hit_ratio{cache="responses"}',
+        "costchecker_wework_message_cache_size",
+        "costchecker_query_log_queued",
+    ):
+        assert name in body
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, DailyMetric, QueryLog
+from app.services.metrics_rollup import aggregate, rollup, window_stats
+
+
+TODAY = date(2025, 11, 20)
+
+
+def setup_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    rows = [
+        # days ago, product, success, confirmation, ms, user, error
+        (2, "GT10S", True, False, 100, "a", None),
+        (2, None, False, False, 300, "b", "未找到匹配的产品。"),
+        (1, "GT10S", True, False, 200, "a", None),
+        (1, None, True, True, None, "a", None),
+        (0, "M1", True, False, 50, "c", None),
+        (0, None, False, False, 70, "c", "未找到匹配的产品。"),
+    ]
+    for ago, product, ok, confirm, ms, user, err in rows:
+        db.add(
+            QueryLog(
+                query_text="q",
+                selected_product=product,
+                success=ok,
+                confirmation_required=confirm,
+                execution_time_ms=ms,
+                user_session=user,
+                error_message=err,
+                timestamp=datetime.combine(TODAY - timedelta(days=ago), datetime.min.time()) + timedelta(hours=9),
+            )
+        )
+    db.commit()
+    return db
+
+
+def test_rollup_fills_daily_metrics_idempotently():
+    db = setup_db()
+    assert rollup(db, today=TODAY) == [TODAY - timedelta(days=2), TODAY - timedelta(days=1), TODAY]
+    db.commit()
+    m = db.get(DailyMetric, TODAY - timedelta(days=2))
+    assert (m.total_queries, m.successful_queries, m.failed_queries) == (2, 1, 1)
+    assert m.avg_response_time_ms == 200 and m.unique_users == 2
+    assert m.top_products == {"GT10S": 1} and m.error_counts == {"未找到匹配的产品。": 1}
+    # only the newest stored day onward is re-aggregated
+    assert rollup(db, today=TODAY) == [TODAY]
+    db.commit()
+    assert db.query(DailyMetric).count() == 3
+
+
+def test_window_stats_combine_rollups_with_live_today():
+    db = setup_db()
+    rollup(db, today=TODAY)
+    db.commit()
+    agg, sources = window_stats(db, days=3, today=TODAY)
+    # the two past days were rolled up after they ended; today is always live
+    assert sources == {"rollup_days": 2, "live_ranges": 1}
+    live = aggregate(db, datetime(2025, 1, 1), datetime(2026, 1, 1))
+    assert (agg.total, agg.successful, agg.confirmations) == (live.total, live.successful, live.confirmations)
+    assert agg.avg_response_time_ms == live.avg_response_time_ms == 144
+    assert agg.products.most_common(1) == [("GT10S", 2)]
+    assert agg.errors == {"未找到匹配的产品。": 2}
+
+
+def test_window_stats_without_rollups_is_one_live_range():
+    db = setup_db()
+    agg, sources = window_stats(db, days=3, today=TODAY)
+    assert sources == {"rollup_days": 0, "live_ranges": 1} and agg.total == 6
@@ -90,7 +90,7 @@ def test_fuzzy_match_path_forces_confirmation(monkeypatch):
 
     monkeypatch.setattr(qp, "fuzzy_string_match", fake_fuzzy)
     # Ensure a product_code is present to avoid early missing_product_code error
-    monkeypatch.setattr(DeepSeekClient, "extract_query_params", lambda self, q: {"product_code": "AB12"})
+    monkeypatch.setattr(DeepSeekClient, "extract_query_params", lambda self, q, deadline=None: {"product_code": "AB12"})
     r = process_query("AB12", db)
     assert r["status"] == "needs_confirmation"
     codes = {o.get("product_code") for o in r.get("options", [])}
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+
+from app.services.page_cache import PageCache, PageWords
+
+
+def _words(n: int) -> list[dict]:
+    return [{"text": f"W{i}", "x0": i, "x1": i + 1.5, "top": 10.0, "bottom": 20.0} for i in range(n)]
+
+
+def test_page_words_round_trip():
+    pw = PageWords(_words(3))
+    assert len(pw) == 3
+    assert list(pw)[1] == {"text": "W1", "x0": 1.0, "x1": 2.5, "top": 10.0, "bottom": 20.0}
+
+
+def test_cache_hits_and_invalidates_on_file_change(tmp_path):
+    pdf = tmp_path / "list.pdf"
+    pdf.write_bytes(b"%PDF")
+    calls: list[tuple] = []
+
+    def extract(path, page):
+        calls.append((path.name, page))
+        return _words(5)
+
+    cache = PageCache(max_bytes=1 << 20, pdf_dir=tmp_path, extract=extract)
+    first = cache.get("list.pdf", 2)
+    assert cache.get("list.pdf", 2) is first
+    assert calls == [("list.pdf", 2)]
+    assert cache.get("missing.pdf", 1) is None
+
+    st = os.stat(pdf)
+    os.utime(pdf, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.get("list.pdf", 2) is not first
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["invalidations"] == 1
+
+
+def test_cache_evicts_least_recent_pages_over_byte_budget(tmp_path):
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+    page_size = PageWords(_words(50)).nbytes
+    cache = PageCache(max_bytes=int(page_size * 2.5), pdf_dir=tmp_path, extract=lambda p, n: _words(50))
+    cache.get("a.pdf", 1)
+    cache.get("b.pdf", 1)
+    cache.get("a.pdf", 1)  # a is now most recent
+    cache.get("c.pdf", 1)  # evicts b
+    stats = cache.stats()
+    assert stats["pages"] == 2 and stats["evictions"] == 1
+    assert stats["bytes"] <= cache.max_bytes
+    cache.get("a.pdf", 1)
+    assert cache.stats()["hits"] == 2
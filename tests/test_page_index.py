@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import random
+
+from app.services.page_cache import PageWords
+from app.services.page_index import PageIndex, alnum_key, ascii_code_key, parse_number
+
+
+def _page(seed: int = 7, n: int = 400) -> list[dict]:
+    rnd = random.Random(seed)
+    words = []
+    for i in range(n):
+        top = rnd.uniform(0, 800)
+        text = rnd.choice(["GT10S", "款号", f"{rnd.randint(5, 300) / 100:.2f}", f"X{i}"])
+        words.append({"text": text, "x0": rnd.uniform(0, 500), "x1": 0.0, "top": top, "bottom": top + 8})
+    return words
+
+
+def test_row_and_value_lookups_match_a_full_scan():
+    words = _page()
+    index = PageIndex(words)
+    for y in (4.0, 120.5, 400.0, 799.0):
+        expected = [w for w in words if abs((w["top"] + w["bottom"]) / 2 - y) <= 3.5]
+        assert index.row(y, 3.5) == expected
+    for value in (0.05, 0.9, 1.5, 2.99):
+        expected = [w for w in words if parse_number(w["text"]) is not None and abs(parse_number(w["text"]) - value) < 1e-6]
+        assert index.with_value(value) == expected
+
+
+def test_find_text_returns_first_word_in_page_order():
+    words = [
+        {"text": "GT-10S", "x0": 5, "x1": 9, "top": 50, "bottom": 60},
+        {"text": "GT10S款", "x0": 1, "x1": 9, "top": 10, "bottom": 20},
+    ]
+    assert PageIndex(words).find_text("GT10S") is words[0]
+    assert PageIndex(words).find_text(alnum_key("gt10s款")) is words[1]
+    # the extractors' normalization drops non-ASCII characters
+    assert PageIndex(words[1:], normalize=ascii_code_key).find_text("GT10S") is words[1]
+    assert PageIndex(words).find_text("GT20S") is None
+
+
+def test_page_words_index_matches_dict_index():
+    # whole-number coordinates survive the float32 columns unchanged
+    words = [dict(w, x0=float(round(w["x0"])), top=float(round(w["top"])), bottom=float(round(w["top"]) + 8)) for w in _page(11)]
+    from_dicts = PageIndex(words)
+    from_arrays = PageIndex(PageWords(words))
+    assert len(from_arrays) == len(from_dicts)
+    for y in (4.0, 120.5, 400.0, 799.0):
+        assert from_arrays.row(y, 3.5) == from_dicts.row(y, 3.5)
+    for value in (0.05, 0.9, 1.5, 2.99):
+        assert from_arrays.with_value(value) == from_dicts.with_value(value)
+    assert from_arrays.find_text("GT10S") == from_dicts.find_text("GT10S")
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models import Base, Product, PricingTier
+from app.services.catalog import bump_catalog_version, get_catalog, invalidate_catalog
+from app.services.price_matrix import effective_price, get_price_matrix
+from app.services.wide_search import detect_wide_query, run_wide_search
+
+
+def setup_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    rows = [
+        # code, category, {(tier, color): price}
+        ("GT10S", "泳镜", {("C级", "标准色"): 0.9}),
+        ("GT20S", "泳镜", {("C级", "定制色"): 1.5}),  # same tier, other color
+        ("GT30S", "泳镜", {("A级", "标准色"): 1.2, ("B级", "标准色"): 1.1}),  # B级 before A级
+        ("GT40S", "泳镜", {("C级", "标准色"): 0.0}),  # zero price never listed
+        ("M1", "潜水镜", {("C级", "标准色"): 2.0}),
+        ("N1", "潜水镜", {}),
+    ]
+    for code, cat, prices in rows:
+        p = Product(
+            product_code=code,
+            base_code=code.rstrip("S"),
+            product_name_cn=f"{cat}{code}",
+            category=cat,
+            material_type="SILICONE",
+            base_cost=0.5,
+            source_pdf="x.pdf",
+            source_page=1,
+        )
+        db.add(p)
+        db.flush()
+        for (tier, color), price in prices.items():
+            db.add(PricingTier(product_id=p.product_id, tier=tier, color_type=color, price=price))
+    db.commit()
+    return db
+
+
+def _codes(result):
+    return [r["product_code"] for r in result["data"]["results"]]
+
+
+def test_effective_price_follows_pick_price_fallback():
+    db = setup_db()
+    cat = get_catalog(db)
+    pid = lambda code: cat.by_code(code).product_id
+    assert effective_price(cat, pid("GT10S"), "C级", "标准色") == 0.9
+    assert effective_price(cat, pid("GT20S"), "C级", "标准色") == 1.5
+    assert effective_price(cat, pid("GT30S"), "C级", "标准色") == 1.1
+    assert effective_price(cat, pid("N1"), "C级", "标准色") is None
+
+
+def test_memory_backend_answers_all_modes(monkeypatch):
+    monkeypatch.setattr(settings, "WIDE_SEARCH_BACKEND", "memory")
+    db = setup_db()
+
+    r = run_wide_search(db, detect_wide_query("最便宜 前3"))
+    assert _codes(r) == ["GT10S", "GT30S", "GT20S"]
+    r = run_wide_search(db, detect_wide_query("最贵 泳镜 前2"))
+    assert _codes(r) == ["GT20S", "GT30S"]
+    assert r["data"]["results"][0] == {
+        "product_code": "GT20S",
+        "category": "泳镜",
+        "material": "SILICONE",
+        "screenshot_url": None,
+        "price": 1.5,
+        "tier": "C级",
+        "color_type": "标准色",
+    }
+
+    r = run_wide_search(db, detect_wide_query("比 GT30S 贵的"))
+    assert _codes(r) == ["M1", "GT20S"] and r["data"]["ref_price"] == 1.1
+    assert r["data"]["results"][1]["delta"] == 1.5 - 1.1
+    r = run_wide_search(db, detect_wide_query("比 GT30 便宜的泳镜"))  # base code resolves to GT30S
+    assert _codes(r) == ["GT10S"]
+
+    r = run_wide_search(db, detect_wide_query("价格 0.9~1.5"))
+    assert _codes(r) == ["GT10S", "GT30S", "GT20S"]
+
+
+def test_matrix_rebuilt_when_catalog_version_changes(monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_SECONDS", 0.0)
+    db = setup_db()
+    before = get_price_matrix(db)
+    assert before is get_price_matrix(db)
+    pid = get_catalog(db).by_code("N1").product_id
+    db.add(PricingTier(product_id=pid, tier="C级", color_type="标准色", price=3.0))
+    bump_catalog_version(db)
+    db.commit()
+    after = get_price_matrix(db)
+    assert after is not before
+    assert [p.product_code for p, _ in after.top("C级", "标准色", "潜水镜", 1, descending=True)] == ["N1"]
+    invalidate_catalog(db)
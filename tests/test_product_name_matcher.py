@@ -215,6 +215,106 @@ def test_search_by_description_no_matches():
     assert len(results) == 0
 
 
+def test_description_index_dedupes_shared_names():
+    """GT10P and 2321P share a name; it is indexed (and scored) once."""
+    from app.services.catalog import get_catalog
+    from app.services.product_name_matcher import DescriptionIndex
+
+    db = setup_mem_db()
+    seed_test_products(db)
+
+    index = DescriptionIndex(get_catalog(db))
+    assert len(index.names) == 2
+    results = index.search(normalize_chinese_text("儿童分体简易"), material="PVC")
+    assert sorted(p.product_code for p, _ in results) == ["2321P", "GT10P"]
+
+
+def test_description_index_prunes_candidates_by_characters():
+    from app.services.catalog import get_catalog
+    from app.services.product_name_matcher import DescriptionIndex
+
+    db = setup_mem_db()
+    seed_test_products(db)
+    db.add(Product(
+        product_code="M100",
+        base_code="M100",
+        product_name_cn="成人大框潜水镜",
+        category="潜水镜",
+        subcategory="成人款",
+        material_type="SILICONE",
+        base_cost=1.2,
+        source_pdf="2025.10.28 潜水镜.pdf",
+        source_page=1,
+    ))
+    db.commit()
+
+    index = DescriptionIndex(get_catalog(db))
+    kid = [index.names[i] for i in index.candidates(normalize_chinese_text("儿童分体简易"))]
+    assert kid and all("儿童" in n for n in kid)
+    adult = [index.names[i] for i in index.candidates("成人款")]
+    assert adult == ["成人大框潜水镜"]
+    # only names are scored, so subcategories are not indexed
+    assert index.candidates("款") == []
+    assert index.candidates("不存在的产品描述") == []
+
+
+def test_description_index_finds_single_character():
+    from app.services.catalog import get_catalog
+    from app.services.product_name_matcher import DescriptionIndex
+
+    db = setup_mem_db()
+    seed_test_products(db)
+
+    index = DescriptionIndex(get_catalog(db))
+    assert len(index.candidates("儿")) == len(index.names)
+    results = search_by_description(db, "儿", material="SILICONE")
+    assert [p.product_code for p, _ in results] == ["GT10S"]
+    assert len(index.candidates("a儿")) == len(index.names)
+
+
+def test_description_index_matches_full_scan():
+    """Pruning never changes results compared with scoring every product."""
+    from rapidfuzz import fuzz
+
+    from app.services.catalog import get_catalog
+    from app.services.product_name_matcher import DescriptionIndex
+
+    db = setup_mem_db()
+    seed_test_products(db)
+    db.add(Product(
+        product_code="M100",
+        base_code="M100",
+        product_name_cn="成人大框潜水镜",
+        category="潜水镜",
+        subcategory="成人款",
+        material_type="SILICONE",
+        base_cost=1.2,
+        source_pdf="2025.10.28 潜水镜.pdf",
+        source_page=1,
+    ))
+    db.commit()
+    catalog = get_catalog(db)
+    index = DescriptionIndex(catalog)
+
+    def full_scan(desc, material, threshold):
+        out = []
+        for p in catalog.products:
+            if material and (p.material_type or "").upper() != material:
+                continue
+            name = normalize_chinese_text(p.product_name_cn or "")
+            score = max(fuzz.token_set_ratio(desc, name), fuzz.partial_ratio(desc, name)) / 100.0
+            if name and score >= threshold:
+                out.append((p.product_code, round(score, 6)))
+        return sorted(out)
+
+    # "儿分童体" shares no bigram with any name but still scores 0.75
+    for desc in ("儿童分体简易", "儿分童体", "儿", "a儿", "成人", "潜水镜 silicone", "pvc", "不存在的产品描述"):
+        for material in (None, "PVC", "SILICONE"):
+            for threshold in (0.5, 0.7, 0.9):
+                got = sorted((p.product_code, round(s, 6)) for p, s in index.search(desc, material, threshold))
+                assert got == full_scan(desc, material, threshold), (desc, material, threshold)
+
+
 # === Tests for match_product_by_description ===
 
 def test_match_product_by_description_full_flow():
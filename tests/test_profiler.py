@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import time
+from pathlib import Path
+
+import httpx
+
+from app.api.routes import query as query_route
+from app.core.config import settings
+from app.core.database import get_db
+from app.main import app
+from app.utils.profiler import SamplingProfiler
+
+from tests.test_api_endpoints import make_sqlite_session, override_dep, seed_basic
+
+
+def _spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profiler_collapses_stacks():
+    with SamplingProfiler(interval=0.001) as prof:
+        _spin(0.05)
+    assert prof.samples > 0
+    lines = prof.collapsed().splitlines()
+    assert sum(int(l.rsplit(" ", 1)[1]) for l in lines) == prof.samples
+    top = lines[0].rsplit(" ", 1)[0].split(";")
+    # root first, leaf last
+    assert top[-1].startswith("_spin (") and "test_sampling_profiler_collapses_stacks" in top[-2]
+
+
+def test_query_profile_requires_admin_and_returns_folded_stacks(tmp_path, monkeypatch):
+    Session = make_sqlite_session(str(tmp_path / "profile.sqlite"))
+    seed_basic(Session)
+    app.dependency_overrides[get_db] = override_dep(Session)
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_INTERVAL_MS", 1.0)
+    real = query_route.process_query
+    seen = {}
+
+    def slow_process_query(query, db, **kwargs):
+        seen.update(kwargs)
+        _spin(0.05)
+        return real(query, db, **kwargs)
+
+    monkeypatch.setattr(query_route, "process_query", slow_process_query)
+    auth = "Basic " + base64.b64encode(f"{settings.ADMIN_USERNAME}:{settings.ADMIN_PASSWORD}".encode()).decode()
+    transport = httpx.ASGITransport(app=app)
+    async def _run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            denied = await client.post("/api/query?profile=1", json={"query": "GT10S C级 标准色"})
+            plain = await client.post("/api/query", json={"query": "GT10S C级 标准色"})
+            plain_kwargs = dict(seen)
+            profiled = await client.post(
+                "/api/query", json={"query": "GT10S C级 标准色"}, headers={"X-Profile": "1", "Authorization": auth}
+            )
+            return denied, plain, plain_kwargs, profiled
+    denied, plain, plain_kwargs, profiled = asyncio.get_event_loop().run_until_complete(_run())
+    assert denied.status_code == 401
+    assert "profile" not in plain.json() and plain_kwargs["use_cache"] is True
+    assert profiled.status_code == 200 and seen["use_cache"] is False
+    prof = profiled.json()["profile"]
+    assert prof["samples"] > 0
+    assert "query_endpoint (app/api/routes/query.py:" in prof["collapsed"]
+    assert "slow_process_query" in prof["collapsed"]
+    assert Path(prof["file"]).read_text(encoding="utf-8").strip() == prof["collapsed"]
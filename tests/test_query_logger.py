@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, LatencyBucket, QueryLog
+from app.services.logger import QueryLogWriter, log_query, query_log_record
+
+
+def setup_db():
+    # one shared connection so the writer thread sees the same in-memory DB
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    return engine, Session()
+
+
+def _record(i: int, success: bool = True) -> dict:
+    return {"query_text": f"q{i}", "success": success, "execution_time_ms": i}
+
+
+def test_writer_bulk_inserts_batches_and_flushes_on_stop():
+    engine, db = setup_db()
+    inserts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, params, context, executemany):
+        if statement.startswith("INSERT INTO query_logs"):
+            inserts.append(executemany)
+
+    writer = QueryLogWriter(max_queue=100, batch_size=10, flush_seconds=60.0)
+    writer.start()
+    for i in range(25):
+        assert writer.submit(engine, _record(i))
+    writer.stop()
+    assert db.query(QueryLog).count() == 25
+    # 10 + 10 by size, the last 5 flushed on stop
+    assert writer.stats()["batches"] == 3 and all(inserts)
+
+
+def test_writer_samples_then_drops_under_overload():
+    engine, db = setup_db()
+    writer = QueryLogWriter(max_queue=4, batch_size=100, flush_seconds=60.0, overload_sample_rate=0.0)
+    writer._thread = type("_Alive", (), {"is_alive": lambda self: True})()  # queue without draining
+    assert writer.submit(engine, _record(1)) and writer.submit(engine, _record(2))
+    assert not writer.submit(engine, _record(3))  # half full: successes sampled out
+    assert writer.submit(engine, _record(4, success=False)) and writer.submit(engine, _record(5, success=False))
+    assert not writer.submit(engine, _record(6, success=False))  # full: dropped
+    stats = writer.stats()
+    assert stats["sampled_out"] == 1 and stats["dropped"] == 1 and stats["queued"] == 4
+    writer._thread = None
+    writer.flush()
+    assert sorted(r.query_text for r in db.query(QueryLog).all()) == ["q1", "q2", "q4", "q5"]
+    # latency buckets still count every request, shed or not
+    assert sum(b.count for b in db.query(LatencyBucket).all()) == 6
+
+
+def test_log_query_writes_inline_when_writer_not_running():
+    _, db = setup_db()
+    result = {"status": "success", "data": {"product_code": "GT10S"}, "execution_time_ms": 12, "confidence": 1.0}
+    assert log_query(db, query_log_record("GT10S C级", result, user_session="wework:u1"))
+    row = db.query(QueryLog).one()
+    assert row.selected_product == "GT10S" and row.success and row.user_session == "wework:u1"
+    assert row.timestamp is not None
@@ -55,6 +55,8 @@ def test_success_with_tier_and_color():
     assert r["data"]["tier"] == "C级"
     assert r["data"]["color_type"] == "标准色"
     assert abs(float(r["data"]["price"]) - 0.9) < 1e-9
+    # code, tier and color are all explicit -> answered without the LLM
+    assert r["extraction_path"] == "heuristic"
 
 
 def test_all_pricing_returned_when_no_tier():
@@ -88,3 +90,54 @@ def test_missing_product_code_error():
     assert r["status"] == "error"
     assert r["error_type"] == "missing_product_code"
 
+
+
+def _count_resolutions(monkeypatch):
+    import app.services.query_processor as qp
+
+    codes: list[str] = []
+    real = qp._resolve_code
+
+    def counting(db, norm):
+        codes.append(norm)
+        return real(db, norm)
+
+    monkeypatch.setattr(qp, "_resolve_code", counting)
+    return codes
+
+
+def test_speculative_resolution_reused_when_llm_agrees(monkeypatch):
+    from app.core.config import settings
+    from app.services.deepseek import DeepSeekClient
+    from app.services.extraction_cache import extraction_cache
+
+    db = setup_db()
+    extraction_cache.clear()
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(
+        DeepSeekClient, "_call_api", lambda self, q, timeout=None: {"product_code": "GT10S", "tier": "C级"}
+    )
+    codes = _count_resolutions(monkeypatch)
+    r = process_query("GT10S 的C级价格是多少", db)
+    assert r["status"] == "success" and r["data"]["product_code"] == "GT10S"
+    assert r["extraction_path"] == "llm"
+    assert codes == ["GT10S"]  # resolved once, while the LLM call was in flight
+    extraction_cache.clear()
+
+
+def test_speculative_resolution_redone_on_disagreement(monkeypatch):
+    from app.core.config import settings
+    from app.services.deepseek import DeepSeekClient
+    from app.services.extraction_cache import extraction_cache
+
+    db = setup_db()
+    extraction_cache.clear()
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(
+        DeepSeekClient, "_call_api", lambda self, q, timeout=None: {"product_code": "GT10P", "tier": "C级"}
+    )
+    codes = _count_resolutions(monkeypatch)
+    r = process_query("GT10S 的C级价格是多少", db)
+    assert r["status"] == "success" and r["data"]["product_code"] == "GT10P"
+    assert codes == ["GT10S", "GT10P"]
+    extraction_cache.clear()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models import Base, Product, PricingTier
+from app.services import query_processor as qp
+from app.services.catalog import bump_catalog_version
+from app.services.response_cache import get_response_cache, response_cache_stats
+
+
+def setup_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    for code, material in (("GT10S", "SILICONE"), ("GT10P", "PVC")):
+        db.add(
+            Product(
+                product_code=code,
+                base_code="GT10",
+                product_name_cn="儿童分体简易带扣",
+                category="泳镜",
+                material_type=material,
+                base_cost=0.5,
+                source_pdf="2025.10.28 泳镜.pdf",
+                source_page=2,
+            )
+        )
+    db.commit()
+    db.add(PricingTier(product_id=1, tier="C级", color_type="标准色", price=0.9))
+    db.commit()
+    return db
+
+
+def _count_resolutions(monkeypatch):
+    calls = []
+    real = qp._resolve_code
+
+    def counting(db, norm):
+        calls.append(norm)
+        return real(db, norm)
+
+    monkeypatch.setattr(qp, "_resolve_code", counting)
+    return calls
+
+
+def test_repeated_query_is_served_from_cache(monkeypatch):
+    db = setup_db()
+    calls = _count_resolutions(monkeypatch)
+    first = qp.process_query("GT10S C级 标准色", db)
+    first["data"]["price"] = -1  # callers may mutate their copy
+    second = qp.process_query(" gt10s  c级 标准色 ", db)
+    assert len(calls) == 1
+    assert second["cached"] is True and second["data"]["price"] == 0.9
+    stats = response_cache_stats(db)["current"]
+    assert stats["top"][0] == {"query": "GT10S C级 标准色", "hits": 1, "status": "success"}
+
+
+def test_catalog_version_bump_invalidates(monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_SECONDS", 0.0)
+    db = setup_db()
+    assert qp.process_query("GT10S C级 标准色", db)["data"]["price"] == 0.9
+    db.add(PricingTier(product_id=1, tier="C级", color_type="标准色", price=1.3, effective_date=date(2099, 1, 1)))
+    bump_catalog_version(db)
+    db.commit()
+    r = qp.process_query("GT10S C级 标准色", db)
+    assert "cached" not in r and r["data"]["price"] == 1.3
+
+
+def test_version_bump_is_seen_without_waiting_for_refresh(monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_SECONDS", 3600.0)
+    db = setup_db()
+    qp.process_query("GT10S C级 标准色", db)
+    assert qp.process_query("GT10S C级 标准色", db)["cached"] is True
+    db.add(PricingTier(product_id=1, tier="C级", color_type="标准色", price=1.3, effective_date=date(2099, 1, 1)))
+    bump_catalog_version(db)
+    db.commit()
+    r = qp.process_query("GT10S C级 标准色", db)
+    assert "cached" not in r and r["data"]["price"] == 1.3
+
+
+def test_answer_computed_across_a_bump_is_not_stored(monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_SECONDS", 3600.0)
+    db = setup_db()
+    real = qp._answer_query
+
+    def bumping(*args, **kwargs):
+        result = real(*args, **kwargs)
+        bump_catalog_version(db)  # the seeder commits while this answer was computed
+        db.commit()
+        return result
+
+    monkeypatch.setattr(qp, "_answer_query", bumping)
+    qp.process_query("GT10S C级 标准色", db)
+    monkeypatch.setattr(qp, "_answer_query", real)
+    assert "cached" not in qp.process_query("GT10S C级 标准色", db)
+
+
+def test_caller_extracted_fallback_uses_negative_ttl(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_NEGATIVE_TTL_SECONDS", 0.0)
+    db = setup_db()
+    params = {"product_code": "GT10S", "tier": "C级", "color_type": "标准色", "material": None}
+    r = qp.process_query("GT10S C级 标准色", db, params=params, extraction_path="heuristic_fallback")
+    assert r["extraction_path"] == "heuristic_fallback"
+    # not kept for the full TTL: the LLM may parse it differently once it is back
+    assert len(get_response_cache(db)._memory) == 0
+    qp.process_query("GT10S C级 标准色", db, params=params, extraction_path="llm")
+    assert len(get_response_cache(db)._memory) == 1
+
+
+def test_confirmations_not_cached_and_misses_use_negative_ttl(monkeypatch):
+    db = setup_db()
+    calls = _count_resolutions(monkeypatch)
+    a = qp.process_query("GT10 C级", db)
+    b = qp.process_query("GT10 C级", db)
+    assert a["status"] == b["status"] == "needs_confirmation"
+    assert len(calls) == 2
+
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_NEGATIVE_TTL_SECONDS", 0.0)
+    assert qp.process_query("ZZ99 C级", db)["error_type"] == "product_not_found"
+    assert qp.process_query("ZZ99 C级", db)["error_type"] == "product_not_found"
+    assert len(calls) == 4
+    assert len(get_response_cache(db)._memory) == 0
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import get_db
+from app.main import app
+from app.models import Base, PricingHistory, PricingTier, Product, ProductHighlight, QueryLog
+from app.utils.sql_stats import instrument_engine, track_sql
+
+from tests.test_api_endpoints import make_sqlite_session, override_dep, seed_basic
+
+
+def test_track_sql_counts_statements_and_nests():
+    engine = create_engine("sqlite:///:memory:")
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        with track_sql(record=True) as outer:
+            conn.execute(text("SELECT 1"))
+            with track_sql() as inner:
+                conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 3"))  # not tracked
+    assert inner.statements == 1
+    assert outer.statements == 2 and outer.recorded == ["SELECT 1", "SELECT 2"]
+    assert outer.time_ms >= inner.time_ms >= 0
+
+
+def _post(Session, body):
+    app.dependency_overrides[get_db] = override_dep(Session)
+    transport = httpx.ASGITransport(app=app)
+    async def _run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/query", json=body)
+    return asyncio.get_event_loop().run_until_complete(_run())
+
+
+def test_query_reports_db_statements(tmp_path, statement_budget):
+    Session = make_sqlite_session(str(tmp_path / "sql_stats.sqlite"))
+    seed_basic(Session)
+    # catalog snapshot load, code resolution from the snapshot, inline log write
+    with statement_budget(12):
+        r = _post(Session, {"query": "GT10S C级 标准色", "debug": True})
+    db_debug = r.json()["debug"]["db"]
+    assert r.headers["x-db-statements"] == str(db_debug["statements"]) and db_debug["statements"] > 0
+    assert "x-db-time-ms" in r.headers
+    # answered from the snapshot and the response cache: only the version check
+    with statement_budget(3):
+        r = _post(Session, {"query": "GT10S C级 标准色"})
+    assert "x-db-statements" not in r.headers
+    db = Session()
+    try:
+        logs = db.query(QueryLog).order_by(QueryLog.query_id).all()
+    finally:
+        db.close()
+    assert logs[0].db_statements == db_debug["statements"]
+    assert logs[1].db_statements is not None and logs[1].db_statements <= logs[0].db_statements
+
+
+def test_statement_budget_fails_when_exceeded(statement_budget):
+    engine = create_engine("sqlite:///:memory:")
+    with pytest.raises(pytest.fail.Exception, match="3 SQL statements, budget is 2"):
+        with statement_budget(2):
+            with engine.connect() as conn:
+                for i in range(3):
+                    conn.execute(text(f"SELECT {i}"))
+
+
+def test_seeder_loads_existing_rows_once(tmp_path, monkeypatch, statement_budget):
+    from scripts import seed_database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.sqlite'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    monkeypatch.setattr(seed_database, "SessionLocal", Session)
+    monkeypatch.chdir(tmp_path)
+    reports = tmp_path / "data" / "reports"
+    reports.mkdir(parents=True)
+    keys = [f"{t}级_{c}" for t in "ABCD" for c in ("标准", "定制")]
+    prices = {k: 1.0 + i for i, k in enumerate(keys)}  # increasing, so no seed warnings
+    records = [
+        {"product_code": f"GT{n}S", "category": "泳镜", "source_pdf": "a.pdf", "source_page": 1, **prices}
+        for n in range(10, 20)
+    ]
+    (reports / "products.jsonl").write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in records))
+    # one product INSERT per record (its id is needed), one executemany for
+    # all tiers and a fixed cost for the highlight rebuild, never a SELECT per
+    # record or per tier
+    with statement_budget(len(records) + 13):
+        seed_database.main()
+    db = Session()
+    try:
+        before = {h.highlight_id for h in db.query(ProductHighlight).filter(ProductHighlight.product_id == 1)}
+    finally:
+        db.close()
+    records[0]["A级_标准"] = 0.5
+    (reports / "products.jsonl").write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in records))
+    with statement_budget(17):
+        seed_database.main()
+    db = Session()
+    try:
+        assert db.query(Product).count() == 10 and db.query(PricingTier).count() == 80
+        assert db.query(PricingHistory).count() == 1
+        # code row plus one per price for every product; the repriced one rebuilt
+        assert db.query(ProductHighlight).count() == 90
+        after = {h.highlight_id for h in db.query(ProductHighlight).filter(ProductHighlight.product_id == 1)}
+        assert len(after) == 9 and not before & after
+    finally:
+        db.close()
@@ -67,7 +67,7 @@ def test_wework_post_fast_path(monkeypatch):
     monkeypatch.setattr(r, "get_wework_service", lambda: stub)
 
     # Force fast result
-    async def _fast(query: str) -> str:
+    async def _fast(query: str, user_id=None) -> str:
         return "RESULT"
 
     monkeypatch.setattr(r, "_process_query_in_thread", _fast)
@@ -100,10 +100,15 @@ def test_wework_post_timeout_active(monkeypatch):
 
     monkeypatch.setattr(r.asyncio, "wait_for", _raise_timeout)
 
+    async def _slow(query: str, user_id=None) -> str:
+        return "RESULT"
+
+    monkeypatch.setattr(r, "_process_query_in_thread", _slow)
+
     # Replace background task target with a stub that records invocation
     calls: list[tuple[str, str]] = []
 
-    def _bg(user_id: str, query: str) -> None:
+    def _bg(user_id: str, query: str, pending=None) -> None:
         calls.append((user_id, query))
 
     monkeypatch.setattr(r, "_send_active_result", _bg)
@@ -193,7 +198,7 @@ def test_wework_post_duplicate_ignored(monkeypatch):
     client = TestClient(app)
 
     # First request processes normally (fast path forced for determinism)
-    async def _fast(query: str) -> str:
+    async def _fast(query: str, user_id=None) -> str:
         return "RESULT"
 
     monkeypatch.setattr(r, "_process_query_in_thread", _fast)
@@ -213,3 +218,64 @@ def test_wework_post_duplicate_ignored(monkeypatch):
     )
     assert resp2.status_code == 200
     assert resp2.text == ""
+
+
+def test_wework_timeout_sends_inflight_result_without_recomputing(monkeypatch):
+    from app.api.routes import wework as r
+
+    stub = StubService()
+    monkeypatch.setattr(r, "get_wework_service", lambda: stub)
+    monkeypatch.setattr(r, "PASSIVE_REPLY_SECONDS", 0.05)
+
+    runs: list[str] = []
+
+    async def _slow(query: str, user_id=None) -> str:
+        runs.append(query)
+        await asyncio.sleep(0.2)
+        return "SLOW RESULT"
+
+    monkeypatch.setattr(r, "_process_query_in_thread", _slow)
+
+    class _NoDup:
+        def is_duplicate(self, msg_id: str) -> bool:
+            return False
+
+        def mark_processed(self, msg_id: str) -> None:
+            pass
+
+    monkeypatch.setattr(r, "message_cache", _NoDup())
+
+    client = TestClient(app)
+    resp = client.post(
+        "/wework/callback?msg_signature=s&timestamp=1&nonce=n",
+        data=b"ignored",
+        headers={"Content-Type": "text/xml"},
+    )
+    assert resp.status_code == 200 and resp.text == ""
+    # the computation started for the passive reply fed the active message
+    assert runs == ["GT10S 价格"]
+    assert stub.sent_messages == [("user1", "SLOW RESULT")]
+
+
+def test_repeated_query_skips_llm_extraction(monkeypatch, tmp_path):
+    from app.api.routes import wework as r
+    from app.services.deepseek import DeepSeekClient
+    from tests.test_api_endpoints import make_sqlite_session, seed_basic
+
+    Session = make_sqlite_session(str(tmp_path / "wework_cache.sqlite"))
+    seed_basic(Session)
+    monkeypatch.setattr(r, "SessionLocal", Session)
+    calls: list[str] = []
+
+    async def _extract(self, query, deadline=None):
+        calls.append(query)
+        self.last_path = DeepSeekClient.PATH_LLM
+        return {"product_code": "GT10S", "tier": "C级", "color_type": "标准色", "material": None}
+
+    monkeypatch.setattr(DeepSeekClient, "aextract_query_params", _extract)
+    run = asyncio.get_event_loop().run_until_complete
+    first = run(r._process_query_in_thread("GT10S C级 标准色 多少钱", user_id="u1"))
+    second = run(r._process_query_in_thread("GT10S C级 标准色 多少钱", user_id="u1"))
+    assert first == second and "GT10S" in first
+    # the second answer came from the response cache, before any LLM call
+    assert calls == ["GT10S C级 标准色 多少钱"]
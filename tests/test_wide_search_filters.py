@@ -83,3 +83,60 @@ def test_wide_search_top_asc_filters_zero_prices():
     # Only the non-zero row should remain
     assert all(p["price"] > 0 for p in products)
     assert any(p["product_code"] == "GT10S" for p in products)
+
+
+def test_wide_search_stops_when_deadline_expired():
+    from app.utils.deadline import Deadline
+
+    db = _DummyDB([("GT10S", "泳镜", "SILICONE", None, 0.9)])
+    params = detect_wide_query("最便宜 泳镜 前5")
+    result = run_wide_search(db, params, deadline=Deadline.after(0.0))
+    assert result["status"] == "error" and result["error_type"] == "timeout"
+
+
+def test_wide_search_reads_materialized_prices():
+    sqls = []
+
+    class _RecordingConnection(_FakeConnection):
+        def execute(self, sql, *args, **kwargs):
+            sqls.append(str(sql))
+            return super().execute(sql, *args, **kwargs)
+
+    db = _DummyDB([("GT10S", "泳镜", "SILICONE", None, 0.9)])
+    db._engine.connect = lambda: _RecordingConnection(db._engine._rows)
+    params = detect_wide_query("最便宜 泳镜 前5")
+    assert run_wide_search(db, params)["status"] == "success"
+    assert sqls and "effective_prices" in sqls[-1] and "pick_price" not in sqls[-1]
+
+
+def test_refresh_effective_prices_is_noop_on_sqlite():
+    from app.services.wide_search import refresh_effective_prices
+
+    db = make_sqlite_session()()
+    try:
+        assert refresh_effective_prices(db) is False
+    finally:
+        db.close()
+
+
+def test_pick_prices_is_one_statement_on_postgres():
+    from types import SimpleNamespace
+
+    from app.services.wide_search import pick_prices
+
+    calls = []
+
+    class _PgConnection(_FakeConnection):
+        dialect = SimpleNamespace(name="postgresql")
+
+        def execute(self, sql, params=None):
+            calls.append((str(sql), params))
+            return super().execute(sql, params)
+
+    conn = _PgConnection([(1, 0.9), (3, 1.2)])
+    prices = pick_prices(conn, [1, 2, 3, 1], "C级", "标准色")
+    assert prices == {1: 0.9, 3: 1.2}
+    assert len(calls) == 1
+    sql, params = calls[0]
+    assert "ANY(:ids)" in sql and params["ids"] == [1, 2, 3]
+    assert pick_prices(conn, [], "C级", "标准色") == {} and len(calls) == 1